@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from backend.database.db import Admin, Merchant, Support
 from backend.config.crypto import hash_password
 from backend.config.logger import get_logger
+from backend.database.utils import get_db
 from backend.database.db import Base
 from backend.shemas_enums import admin_schemas
 from backend.database import db
@@ -10,16 +11,6 @@ from backend.database import db
 router = APIRouter()
 logger = get_logger("admin_register")
 
-# Dependency для получения сессии БД
-
-def get_db():
-    from backend.database.db import SessionLocal
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/register/merchant", status_code=201)
 def register_merchant(data: admin_schemas.MerchantRegister, db: Session = Depends(get_db)):
     if db.query(Merchant).filter_by(email=data.email).first():
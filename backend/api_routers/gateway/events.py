@@ -0,0 +1,128 @@
+"""API Router pushing order status changes to gateway clients (SSE and long-poll).
+
+Checkout pages subscribe here instead of polling /payin/status in a loop. Updates
+come from the in-process OrderStatusBroker, so waiting clients cost no DB queries;
+the status cache (and on a miss, the DB) is read once per subscription when no
+event is known yet.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+try:
+    from backend.database.utils import open_async_read_session
+    from backend.services.order_events import broker, TERMINAL_STATUSES
+    from backend.services.order_status_cache import get_status_projection_async
+    from backend.utils.exceptions import JivaPayException, OrderNotFound
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for gateway events router: {e}")
+
+logger = logging.getLogger(__name__)
+
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_MAX_STREAM_SECONDS = float(os.getenv("SSE_MAX_STREAM_SECONDS", "900"))
+LONG_POLL_MAX_TIMEOUT_SECONDS = 60.0
+
+router = APIRouter()
+
+
+async def _current_status_event(order_identifier: str) -> Dict[str, Any]:
+    """Latest known status: from the broker if an event was seen, else the status cache."""
+    known = broker.last_event(order_identifier)
+    if known is not None:
+        return known
+    # Short-lived session: the connection goes back to the pool before the client starts waiting
+    async with await open_async_read_session() as db:
+        projection = await get_status_projection_async(order_identifier, db)
+    if projection is None:
+        raise OrderNotFound(f"Order with identifier {order_identifier} not found.")
+    return projection
+
+
+def _sse(event_name: str, data: Dict[str, Any]) -> str:
+    return f"event: {event_name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get(
+    "/status/{order_identifier}/stream",
+    summary="Stream Order Status Changes (Server-Sent Events)",
+    tags=["Gateway Status"]
+)
+async def stream_order_status(
+    request: Request,
+    order_identifier: str = Path(..., description="OrderHistory hash_id or IncomingOrder ID"),
+):
+    """Sends the current status, then one `status` event per change, until a terminal status."""
+    try:
+        current = await _current_status_event(order_identifier)
+    except JivaPayException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    async def events() -> AsyncIterator[str]:
+        async with broker.subscribe(order_identifier) as queue:
+            last_status = current.get("status")
+            yield _sse("status", current)
+            # A change that arrived between the initial read and subscribing is in the broker's last-event map
+            gap = broker.last_event(order_identifier)
+            if gap is not None and gap.get("status") != last_status:
+                last_status = gap.get("status")
+                yield _sse("status", gap)
+            deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+            while last_status not in TERMINAL_STATUSES and time.monotonic() < deadline:
+                try:
+                    evt = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if evt.get("status") == last_status:
+                    continue
+                last_status = evt.get("status")
+                yield _sse("status", evt)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/status/{order_identifier}/wait",
+    summary="Wait for an Order Status Change (long-poll)",
+    tags=["Gateway Status"]
+)
+async def wait_order_status(
+    order_identifier: str = Path(..., description="OrderHistory hash_id or IncomingOrder ID"),
+    known_status: Optional[str] = Query(None, description="Status the client already has; omit to get the current one"),
+    timeout: float = Query(25.0, gt=0, le=LONG_POLL_MAX_TIMEOUT_SECONDS, description="Seconds to wait for a change"),
+):
+    """Returns as soon as the status differs from `known_status`, or 204 after `timeout`."""
+    try:
+        async with broker.subscribe(order_identifier) as queue:
+            # Read once after subscribing, as the stream does: a change made before this
+            # process saw any event for the order is only in the status cache
+            current = await _current_status_event(order_identifier)
+            if known_status is None or current.get("status") != known_status:
+                return current
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return Response(status_code=status.HTTP_204_NO_CONTENT)
+                try:
+                    evt = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return Response(status_code=status.HTTP_204_NO_CONTENT)
+                if evt.get("status") != known_status:
+                    return evt
+    except JivaPayException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
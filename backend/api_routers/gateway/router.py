@@ -1,22 +1,35 @@
 """API Router for the public-facing Payment Gateway endpoints."""
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Awaitable
 from fastapi import APIRouter, Depends, HTTPException, status, Path, Body, Request, Response, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 import io
 
 # Attempt imports (adjusting paths based on new location)
 try:
-    from backend.database.utils import get_db_session
+    from backend.database.utils import get_async_db_session, get_async_read_db_session
     # !! Need Gateway specific Schemas (e.g., GatewayInitRequest, GatewayStatusResponse) !!
     # from backend.shemas_enums.gateway import GatewayInitRequest, GatewayStatusResponse, GatewayConfirmPayload
     from backend.shemas_enums.order import IncomingOrderCreate, IncomingOrderRead # Reuse or adapt
+    from backend.shemas_enums.gateway import (
+        GatewayInitResponse, GatewayBulkInitRequest, GatewayBulkInitResponse, OrderStatusProjection,
+        ReceiptUploadRequest, ReceiptUploadTicket, ReceiptUploadComplete
+    )
     # !! Need Gateway Service !!
-    from backend.services.gateway_service import handle_init_request, get_order_status, handle_client_confirmation
+    from backend.services.gateway_service import (
+        handle_init_request_async, handle_bulk_init_request_async,
+        handle_client_confirmation_async, issue_receipt_upload_async, complete_receipt_upload_async,
+        get_order_status_by_client_id_async
+    )
+    from backend.services.order_status_cache import get_status_projection_async, build_projection
+    from backend.services import idempotency
     from backend.utils.s3_client import upload_fileobj
     from backend.config.settings import settings
-    from backend.utils.exceptions import JivaPayException, OrderProcessingError
+    from backend.utils.exceptions import JivaPayException, OrderProcessingError, OrderNotFound
 except ImportError as e:
     raise ImportError(f"Could not import required modules for gateway router (in api_routers/gateway/router.py): {e}")
 
@@ -24,34 +37,79 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def _run_idempotent(
+    request: Request,
+    scope: str,
+    payload: Any,
+    produce: Callable[[], Awaitable[Any]],
+):
+    """Runs `produce` once per Idempotency-Key (if the header is present).
+
+    A retry of a finished request gets the stored response back (with the
+    Idempotent-Replayed header) straight from Redis; the DB is not touched.
+    """
+    idempotency_key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+    if idempotency_key is None:
+        return await produce()
+
+    claim, stored = await idempotency.begin(
+        request.headers.get("X-API-KEY") or "",
+        scope,
+        idempotency_key,
+        idempotency.request_fingerprint(payload),
+    )
+    if stored is not None:
+        return JSONResponse(
+            content=stored.body,
+            status_code=stored.status_code,
+            headers={idempotency.IDEMPOTENCY_REPLAY_HEADER: "true"},
+        )
+    try:
+        body = jsonable_encoder(await produce())
+    except BaseException:
+        # Failed requests are not stored; the merchant may retry with the same key
+        await idempotency.release(claim)
+        raise
+    await idempotency.complete(claim, idempotency.StoredResponse(status.HTTP_200_OK, body))
+    return body
+
+async def _init_order(request: Request, request_data: IncomingOrderCreate, direction: str, db: AsyncSession):
+    """Creates one IncomingOrder, deduplicating retries that carry an Idempotency-Key."""
+    async def produce():
+        created_order = await handle_init_request_async(request.headers.get("X-API-KEY"), request_data, direction, db)
+        return GatewayInitResponse.from_orm(created_order)
+    return await _run_idempotent(request, direction.lower(), request_data.dict(), produce)
+
+async def _bulk_init_orders(request: Request, request_data: GatewayBulkInitRequest, direction: str, db: AsyncSession):
+    """Creates a batch of IncomingOrders and reports the outcome per item."""
+    async def produce():
+        results = await handle_bulk_init_request_async(
+            request.headers.get("X-API-KEY"), request_data.orders, direction, db
+        )
+        created = sum(1 for item in results if item['success'])
+        return GatewayBulkInitResponse(created=created, failed=len(results) - created, results=results)
+    return await _run_idempotent(request, f"{direction.lower()}:bulk", request_data.dict(), produce)
+
 # --- Pay-In Endpoints --- #
 
 @router.post(
     "/payin/init",
-    # response_model=GatewayInitResponse, # Define specific response? Maybe redirect URL or just order ID?
-    response_model=IncomingOrderRead, # Example: return created order details
+    response_model=GatewayInitResponse,
     summary="Initialize a Pay-In Transaction",
     tags=["Gateway Pay-In"]
 )
-def initialize_payin(
+async def initialize_payin(
     # request_data: GatewayInitRequest, # Define specific input schema
     request_data: IncomingOrderCreate, # Reuse for now
     request: Request, # To get merchant identifier (e.g., API key from header)
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_async_db_session)
 ):
     """Receives initial Pay-In request from merchant site, creates IncomingOrder."""
     # TODO: Identify merchant (API key, domain?)
-    merchant_api_key = request.headers.get("X-API-KEY") # Example: Get key from header
-    logger.info(f"Gateway: Received Pay-In init request. Key: {merchant_api_key}. Data: {request_data.dict()}")
+    logger.info(f"Gateway: Received Pay-In init request. Data: {request_data.dict()}")
 
     try:
-        created_order = handle_init_request(
-            api_key=merchant_api_key,
-            request_data=request_data,
-            direction="PAYIN",
-            db=db
-        )
-        return created_order
+        return await _init_order(request, request_data, "PAYIN", db)
 
     except JivaPayException as e:
         logger.warning(f"Gateway Pay-In init failed: {e}")
@@ -60,22 +118,46 @@ def initialize_payin(
         logger.error(f"Unexpected error in Gateway Pay-In init: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
 
+@router.post(
+    "/payin/bulk-init",
+    response_model=GatewayBulkInitResponse,
+    summary="Initialize a batch of Pay-In Transactions",
+    tags=["Gateway Pay-In"]
+)
+async def bulk_initialize_payin(
+    request_data: GatewayBulkInitRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db_session)
+):
+    """Creates up to BULK_INIT_MAX_ITEMS Pay-In orders in one call; results are reported per item."""
+    logger.info(f"Gateway: Received bulk Pay-In init request with {len(request_data.orders)} items")
+    try:
+        return await _bulk_init_orders(request, request_data, "PAYIN", db)
+
+    except JivaPayException as e:
+        logger.warning(f"Gateway bulk Pay-In init failed: {e}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Unexpected error in Gateway bulk Pay-In init: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
+
 @router.get(
     "/payin/status/{order_identifier}",
-    # response_model=GatewayStatusResponse, # Define specific status response
-    response_model=IncomingOrderRead, # Example
+    response_model=OrderStatusProjection,
     summary="Get Pay-In Order Status",
     tags=["Gateway Pay-In"]
 )
-def get_payin_status(
-    order_identifier: str = Path(..., description="Unique identifier for the order (e.g., ID)"),
-    db: Session = Depends(get_db_session)
+async def get_payin_status(
+    order_identifier: str = Path(..., description="OrderHistory hash_id or IncomingOrder ID"),
+    db: AsyncSession = Depends(get_async_read_db_session)
 ):
     """Allows merchant/client to check the status of a Pay-In order."""
     logger.info(f"Gateway: Received status request for Pay-In order: {order_identifier}")
     try:
-        order = get_order_status(order_identifier, db)
-        return order
+        projection = await get_status_projection_async(order_identifier, db)
+        if projection is None:
+            raise OrderNotFound(f"Order not found: {order_identifier}", order_id=order_identifier)
+        return projection
 
     except OrderProcessingError as e:
          raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -86,19 +168,43 @@ def get_payin_status(
         logger.error(f"Unexpected error in Gateway Pay-In status: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
 
+@router.get(
+    "/payin/status/client/{client_id}",
+    response_model=OrderStatusProjection,
+    summary="Get Pay-In Order Status by Merchant Order ID",
+    tags=["Gateway Pay-In"]
+)
+async def get_payin_status_by_client_id(
+    request: Request,
+    client_id: str = Path(..., max_length=255, description="Merchant's own order id (client_id given at init)"),
+    db: AsyncSession = Depends(get_async_read_db_session)
+):
+    """Allows the merchant to check a Pay-In order by its own order id (requires X-API-KEY)."""
+    logger.info(f"Gateway: Received status request for Pay-In merchant order: {client_id}")
+    try:
+        return await get_order_status_by_client_id_async(request.headers.get("X-API-KEY"), client_id, db)
+    except JivaPayException as e:
+        logger.warning(f"Gateway Pay-In status check failed for merchant order {client_id}: {e}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Unexpected error in Gateway Pay-In status by merchant order id: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
+
 @router.post(
     "/payin/confirm/{order_identifier}",
     # response_model=GatewayConfirmResponse, # Define response
     status_code=status.HTTP_202_ACCEPTED, # Or 200 OK if returning final status
     summary="Confirm Pay-In Payment (Client Action)",
-    tags=["Gateway Pay-In"]
+    tags=["Gateway Pay-In"],
+    # Proxies the receipt through the API; use upload-url + complete instead
+    deprecated=True
 )
 async def confirm_payin_payment(
     order_identifier: str = Path(..., description="Unique identifier for the order (e.g., ID)"),
     # Define payload: GatewayConfirmPayload? Or handle form data?
     # payload: GatewayConfirmPayload = Body(None), # Example with JSON body
     receipt_file: Optional[UploadFile] = File(None, description="Optional payment receipt upload"),
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_async_db_session)
 ):
     """Endpoint for the end-client to confirm they have made the payment (e.g., uploaded receipt)."""
     logger.info(f"Gateway: Received payment confirmation for Pay-In order: {order_identifier}. File provided: {receipt_file is not None}")
@@ -108,8 +214,9 @@ async def confirm_payin_payment(
             content = await receipt_file.read()
             buffer = io.BytesIO(content)
             key = f"receipts/{order_identifier}/{receipt_file.filename}"
-            uploaded_url = upload_fileobj(buffer, settings.S3_BUCKET_NAME, key)
-        updated = handle_client_confirmation(order_identifier, uploaded_url, db)
+            # boto3 is blocking; keep the event loop free while the receipt uploads
+            uploaded_url = await asyncio.to_thread(upload_fileobj, buffer, settings.S3_BUCKET_NAME, key)
+        updated = await handle_client_confirmation_async(order_identifier, uploaded_url, db)
         return updated
 
     except JivaPayException as e:
@@ -119,32 +226,68 @@ async def confirm_payin_payment(
         logger.error(f"Unexpected error in Gateway Pay-In confirmation: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
 
+@router.post(
+    "/payin/confirm/{order_identifier}/upload-url",
+    response_model=ReceiptUploadTicket,
+    summary="Get a Direct Upload Slot for the Pay-In Receipt",
+    tags=["Gateway Pay-In"]
+)
+async def issue_payin_receipt_upload(
+    order_identifier: str = Path(..., description="OrderHistory hash_id"),
+    payload: ReceiptUploadRequest = Body(...),
+    db: AsyncSession = Depends(get_async_db_session)
+):
+    """Returns a POST policy for uploading the receipt straight to object storage."""
+    try:
+        return await issue_receipt_upload_async(order_identifier, payload.filename, payload.content_type, db)
+    except JivaPayException as e:
+        logger.warning(f"Gateway receipt upload slot failed for {order_identifier}: {e}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Unexpected error issuing receipt upload: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
+
+@router.post(
+    "/payin/confirm/{order_identifier}/complete",
+    response_model=OrderStatusProjection,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Confirm Pay-In Payment after a Direct Receipt Upload",
+    tags=["Gateway Pay-In"]
+)
+async def complete_payin_receipt_upload(
+    order_identifier: str = Path(..., description="OrderHistory hash_id"),
+    payload: ReceiptUploadComplete = Body(...),
+    db: AsyncSession = Depends(get_async_db_session)
+):
+    """Records the uploaded receipt and confirms the payment on behalf of the client."""
+    try:
+        updated = await complete_receipt_upload_async(order_identifier, payload.object_key, db)
+        return build_projection(updated)
+    except JivaPayException as e:
+        logger.warning(f"Gateway receipt upload completion failed for {order_identifier}: {e}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Unexpected error completing receipt upload: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
+
 # --- Pay-Out Endpoints --- #
 
 @router.post(
     "/payout/init",
-    # response_model=GatewayInitResponse, # Define specific response
-    response_model=IncomingOrderRead, # Example
+    response_model=GatewayInitResponse,
     summary="Initialize a Pay-Out Transaction",
     tags=["Gateway Pay-Out"]
 )
-def initialize_payout(
+async def initialize_payout(
     # request_data: GatewayPayoutRequest, # Define specific input schema
     request_data: IncomingOrderCreate, # Reuse for now
     request: Request,
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_async_db_session)
 ):
     """Receives initial Pay-Out request from merchant site, creates IncomingOrder."""
-    merchant_api_key = request.headers.get("X-API-KEY") # Example
-    logger.info(f"Gateway: Received Pay-Out init request. Key: {merchant_api_key}. Data: {request_data.dict()}")
+    logger.info(f"Gateway: Received Pay-Out init request. Data: {request_data.dict()}")
     try:
-        created_order = handle_init_request(
-            api_key=merchant_api_key,
-            request_data=request_data,
-            direction="PAYOUT",
-            db=db
-        )
-        return created_order
+        return await _init_order(request, request_data, "PAYOUT", db)
 
     except JivaPayException as e:
         logger.warning(f"Gateway Pay-Out init failed: {e}")
@@ -153,22 +296,46 @@ def initialize_payout(
         logger.error(f"Unexpected error in Gateway Pay-Out init: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
 
+@router.post(
+    "/payout/bulk-init",
+    response_model=GatewayBulkInitResponse,
+    summary="Initialize a batch of Pay-Out Transactions",
+    tags=["Gateway Pay-Out"]
+)
+async def bulk_initialize_payout(
+    request_data: GatewayBulkInitRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db_session)
+):
+    """Creates up to BULK_INIT_MAX_ITEMS Pay-Out orders in one call; results are reported per item."""
+    logger.info(f"Gateway: Received bulk Pay-Out init request with {len(request_data.orders)} items")
+    try:
+        return await _bulk_init_orders(request, request_data, "PAYOUT", db)
+
+    except JivaPayException as e:
+        logger.warning(f"Gateway bulk Pay-Out init failed: {e}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Unexpected error in Gateway bulk Pay-Out init: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
+
 @router.get(
     "/payout/status/{order_identifier}",
-    # response_model=GatewayStatusResponse, # Define specific status response
-    response_model=IncomingOrderRead, # Example
+    response_model=OrderStatusProjection,
     summary="Get Pay-Out Order Status",
     tags=["Gateway Pay-Out"]
 )
-def get_payout_status(
-    order_identifier: str = Path(..., description="Unique identifier for the order (e.g., ID)"),
-    db: Session = Depends(get_db_session)
+async def get_payout_status(
+    order_identifier: str = Path(..., description="OrderHistory hash_id or IncomingOrder ID"),
+    db: AsyncSession = Depends(get_async_read_db_session)
 ):
     """Allows merchant/client to check the status of a Pay-Out order."""
     logger.info(f"Gateway: Received status request for Pay-Out order: {order_identifier}")
     try:
-        order = get_order_status(order_identifier, db)
-        return order
+        projection = await get_status_projection_async(order_identifier, db)
+        if projection is None:
+            raise OrderNotFound(f"Order not found: {order_identifier}", order_id=order_identifier)
+        return projection
 
     except OrderProcessingError as e:
          raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -177,4 +344,26 @@ def get_payout_status(
         raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         logger.error(f"Unexpected error in Gateway Pay-Out status: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.") 
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
+
+@router.get(
+    "/payout/status/client/{client_id}",
+    response_model=OrderStatusProjection,
+    summary="Get Pay-Out Order Status by Merchant Order ID",
+    tags=["Gateway Pay-Out"]
+)
+async def get_payout_status_by_client_id(
+    request: Request,
+    client_id: str = Path(..., max_length=255, description="Merchant's own order id (client_id given at init)"),
+    db: AsyncSession = Depends(get_async_read_db_session)
+):
+    """Allows the merchant to check a Pay-Out order by its own order id (requires X-API-KEY)."""
+    logger.info(f"Gateway: Received status request for Pay-Out merchant order: {client_id}")
+    try:
+        return await get_order_status_by_client_id_async(request.headers.get("X-API-KEY"), client_id, db)
+    except JivaPayException as e:
+        logger.warning(f"Gateway Pay-Out status check failed for merchant order {client_id}: {e}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Unexpected error in Gateway Pay-Out status by merchant order id: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Gateway processing error.")
@@ -1,23 +1,27 @@
 """API Router for Merchant operations."""
 
 import logging
-from typing import List, Optional, Any # Any for placeholder user model
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Body, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Body, UploadFile, File
 from sqlalchemy.orm import Session
 
 # Attempt imports (adjusting paths based on new location)
 try:
-    from backend.database.utils import get_db_session
-    from backend.shemas_enums.order import IncomingOrderCreate, IncomingOrderRead, OrderHistoryRead # Import schemas
+    from backend.database.utils import get_db, get_read_db_session
+    from backend.shemas_enums.order import IncomingOrderCreate, IncomingOrderRead, OrderHistoryRead, OrderHistoryPage # Import schemas
     # !! Need authentication dependency and user model !!
     # from backend.security import get_current_active_merchant # Assuming specific auth per role
     # from backend.database.models import MerchantUser, OrderHistory, IncomingOrder # Import models
     # !! Need services !!
     # from backend.services import order_service, gateway_service # Example service imports
-    from backend.utils.exceptions import JivaPayException, AuthorizationError, DatabaseError
-    from backend.security import get_current_active_user
-    from backend.database.db import Merchant, OrderHistory
+    from backend.utils.exceptions import JivaPayException, AuthorizationError, DatabaseError, InvalidCursor
+    from backend.database.pagination import MAX_PAGE_SIZE
+    from backend.services.order_queries import get_incoming_order_read, get_order_read, list_orders_page
+    from backend.security import get_current_active_principal
+    from backend.services.principal_cache import Principal
+    from backend.database.db import Merchant
     from backend.services.gateway_service import handle_init_request
     from backend.services.order_status_manager import confirm_payment_by_client as confirm_payment_service
 except ImportError as e:
@@ -27,14 +31,12 @@ except ImportError as e:
 logger = logging.getLogger(__name__)
 
 def get_current_active_merchant(
-    current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db_session)
-) -> Merchant:
-    """Retrieve the Merchant profile for the currently authenticated user."""
-    merchant = db.query(Merchant).filter_by(user_id=current_user.id).one_or_none()
-    if not merchant:
+    principal: Principal = Depends(get_current_active_principal)
+) -> Principal:
+    """Principal of the authenticated user, which must have a Merchant profile (`merchant_id`)."""
+    if principal.merchant_id is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is not a merchant")
-    return merchant
+    return principal
 
 router = APIRouter()
 
@@ -49,14 +51,15 @@ router = APIRouter()
 )
 def create_incoming_order(
     order_data: IncomingOrderCreate, # Use the creation schema for input
-    db: Session = Depends(get_db_session),
-    current_merchant: Any = Depends(get_current_active_merchant) # Use placeholder auth
+    db: Session = Depends(get_db),
+    current_merchant: Principal = Depends(get_current_active_merchant)
 ):
     """Endpoint for a merchant to initiate a new PayIn or PayOut order."""
-    logger.info(f"Merchant {current_merchant.id} creating order. Data: {order_data.dict()}")
+    logger.info(f"Merchant {current_merchant.merchant_id} creating order. Data: {order_data.dict()}")
     try:
         # Identify merchant's store (assumes single store per merchant)
-        merchant_store = current_merchant.stores[0]
+        merchant = db.get(Merchant, current_merchant.merchant_id)
+        merchant_store = merchant.stores[0]
         # Convert direction to gateway format (e.g., PAYIN or PAYOUT)
         direction_str = order_data.direction.value.replace('_', '').upper()
         # Delegate to gateway service
@@ -66,49 +69,61 @@ def create_incoming_order(
             direction=direction_str,
             db=db
         )
-        return created_order
+        return get_incoming_order_read(db, created_order.id)
 
     except AuthorizationError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except JivaPayException as e:
         # Handle known application errors (e.g., validation errors from service)
-        logger.warning(f"App error creating order for merchant {current_merchant.id}: {e}")
+        logger.warning(f"App error creating order for merchant {current_merchant.merchant_id}: {e}")
         raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
-        logger.error(f"Unexpected error creating order for merchant {current_merchant.id}: {e}", exc_info=True)
+        logger.error(f"Unexpected error creating order for merchant {current_merchant.merchant_id}: {e}", exc_info=True)
         # report_critical_error(e, context...)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An internal error occurred.")
 
 @router.get(
     "/orders",
-    response_model=List[OrderHistoryRead], # Return a list of orders
+    response_model=OrderHistoryPage, # One page of orders + cursor of the next one
     summary="List Merchant's Orders",
     tags=["Merchant Orders"] # Tags for OpenAPI docs
 )
 def list_merchant_orders(
-    skip: int = 0,
-    limit: int = 100,
-    status_filter: Optional[str] = None, # Example filter
-    db: Session = Depends(get_db_session),
-    current_merchant: Any = Depends(get_current_active_merchant)
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    status_filter: Optional[str] = None,
+    order_type: Optional[str] = None,
+    store_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_read_db_session),
+    current_merchant: Principal = Depends(get_current_active_merchant)
 ):
-    """Endpoint to list orders associated with the current merchant."""
-    logger.info(f"Merchant {current_merchant.id} listing orders. Skip: {skip}, Limit: {limit}, Status: {status_filter}")
+    """Endpoint to list orders associated with the current merchant, newest first (keyset pagination)."""
+    logger.info(f"Merchant {current_merchant.merchant_id} listing orders. Cursor: {cursor}, Limit: {limit}, Status: {status_filter}")
     try:
-        # Query OrderHistory for this merchant
-        query = db.query(OrderHistory).filter_by(merchant_id=current_merchant.id)
-        if status_filter:
-            query = query.filter(OrderHistory.status == status_filter)
-        orders = query.offset(skip).limit(limit).all()
-        return orders
+        orders, next_cursor = list_orders_page(
+            db,
+            merchant_id=current_merchant.merchant_id,
+            store_id=store_id,
+            status=status_filter,
+            order_type=order_type,
+            created_from=created_from,
+            created_to=created_to,
+            cursor=cursor,
+            limit=limit,
+        )
+        return {"items": orders, "next_cursor": next_cursor}
 
+    except InvalidCursor as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except AuthorizationError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except DatabaseError as e:
-         logger.error(f"DB error listing orders for merchant {current_merchant.id}: {e}", exc_info=True)
+         logger.error(f"DB error listing orders for merchant {current_merchant.merchant_id}: {e}", exc_info=True)
          raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error occurred.")
     except Exception as e:
-        logger.error(f"Unexpected error listing orders for merchant {current_merchant.id}: {e}", exc_info=True)
+        logger.error(f"Unexpected error listing orders for merchant {current_merchant.merchant_id}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An internal error occurred.")
 
 # --- Client Payment Confirmation Endpoint --- #
@@ -118,14 +133,17 @@ def list_merchant_orders(
     summary="Confirm payment by client and upload receipt",
     tags=["Merchant Orders"]
 )
-async def confirm_payment_by_client(
+def confirm_payment_by_client(
     order_id: int,
     receipt_file: UploadFile = File(...),
-    db: Session = Depends(get_db_session),
-    current_merchant: Any = Depends(get_current_active_merchant)
+    db: Session = Depends(get_db),
+    current_merchant: Principal = Depends(get_current_active_merchant)
 ) -> OrderHistoryRead:
-    """Merchant confirms client payment and uploads receipt for the order."""
-    content = await receipt_file.read()
+    """Merchant confirms client payment and uploads receipt for the order.
+
+    Sync on purpose: the S3 upload and the Session work run in FastAPI's threadpool.
+    """
+    content = receipt_file.file.read()
     try:
         updated_order = confirm_payment_service(
             order_id=order_id,
@@ -133,11 +151,11 @@ async def confirm_payment_by_client(
             filename=receipt_file.filename,
             db_session=db
         )
-        return updated_order
+        return get_order_read(db, updated_order.id)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error confirming payment for order {order_id} by merchant {current_merchant.id}: {e}", exc_info=True)
+        logger.error(f"Error confirming payment for order {order_id} by merchant {current_merchant.merchant_id}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 # TODO: Add other merchant endpoints:
@@ -0,0 +1,16 @@
+"""API Router exposing in-process service metrics."""
+
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse, JSONResponse
+
+from backend.utils import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", summary="Service metrics", include_in_schema=False)
+def read_metrics(format: str = Query("prometheus", regex="^(prometheus|json)$")):
+    """Returns counters/gauges in the Prometheus text format (or JSON with ?format=json)."""
+    if format == "json":
+        return JSONResponse(metrics.snapshot())
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
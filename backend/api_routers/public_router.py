@@ -1,18 +1,79 @@
 """API Router for public reference data."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
-from backend.database.utils import get_db_session
+from backend.database.utils import get_read_db_session
 from backend.services.reference_data import get_bank_details, get_payment_method_details, get_exchange_rate
+from backend.services.reference_catalog import CatalogSnapshot, get_catalog_snapshot
 from backend.shemas_enums.reference import BankDetails, PaymentMethodDetails, ExchangeRateDetails
 from backend.utils.exceptions import JivaPayException
 
 # Router for public reference data
 router = APIRouter(prefix="/reference", tags=["reference"])
 
+# Versioned URLs never change content; the unversioned one is revalidated with If-None-Match
+CATALOG_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+CATALOG_VERSIONED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110): W/"v" matches "v"
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def _catalog_response(snapshot: CatalogSnapshot, if_none_match: Optional[str], accept_encoding: Optional[str], cache_control: str) -> Response:
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+        "X-Catalog-Version": snapshot.version,
+    }
+    if _etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if accept_encoding and "gzip" in accept_encoding.lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@router.get("/catalog")
+def read_catalog(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Whole reference catalog (currencies, banks, payment methods, bank/method pairs) in one payload."""
+    try:
+        snapshot = get_catalog_snapshot()
+    except JivaPayException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return _catalog_response(snapshot, if_none_match, accept_encoding, CATALOG_CACHE_CONTROL)
+
+
+@router.get("/catalog/{version}")
+def read_catalog_version(
+    version: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Catalog by version (X-Catalog-Version); immutable, 404 once the version is superseded."""
+    try:
+        snapshot = get_catalog_snapshot()
+    except JivaPayException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    if snapshot.version != version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Catalog version not found")
+    return _catalog_response(snapshot, if_none_match, accept_encoding, CATALOG_VERSIONED_CACHE_CONTROL)
+
 @router.get("/banks/{bank_id}", response_model=BankDetails)
-def read_bank_details(bank_id: int, db: Session = Depends(get_db_session)):
+def read_bank_details(bank_id: int, db: Session = Depends(get_read_db_session)):
     """Get bank details by ID."""
     try:
         bank = get_bank_details(bank_id, db)
@@ -25,7 +86,7 @@ def read_bank_details(bank_id: int, db: Session = Depends(get_db_session)):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @router.get("/payment-methods/{method_id}", response_model=PaymentMethodDetails)
-def read_payment_method_details(method_id: int, db: Session = Depends(get_db_session)):
+def read_payment_method_details(method_id: int, db: Session = Depends(get_read_db_session)):
     """Get payment method details by ID."""
     try:
         method = get_payment_method_details(method_id, db)
@@ -37,11 +98,11 @@ def read_payment_method_details(method_id: int, db: Session = Depends(get_db_ses
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("/exchange-rates/{crypto_id}/{fiat_id}", response_model=ExchangeRateDetails)
-def read_exchange_rate(crypto_id: str, fiat_id: str, db: Session = Depends(get_db_session)):
-    """Get current exchange rate between crypto and fiat currency."""
+@router.get("/exchange-rates/{currency}/{fiat}", response_model=ExchangeRateDetails)
+def read_exchange_rate(currency: str, fiat: str, db: Session = Depends(get_read_db_session)):
+    """Get current exchange rate between crypto and fiat currency (by codes, e.g. USDT/RUB)."""
     try:
-        rate = get_exchange_rate(crypto_id, fiat_id, db)
+        rate = get_exchange_rate(currency, fiat, db)
         if not rate:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exchange rate not found")
         return rate
@@ -1 +1 @@
-from . import auth 
\ No newline at end of file
+from . import auth, archive
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Support lookups in the cold order archive."""
+
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from backend.database.db import Support
+from backend.database.utils import get_db
+from backend.security import get_current_active_principal
+from backend.services.principal_cache import Principal
+from backend.services.order_archive import read_archived_orders
+from backend.shemas_enums.order import ArchivedOrderRead
+from backend.utils.exceptions import JivaPayException
+
+logger = logging.getLogger(__name__)
+
+# Archive scans list one directory per month; keep a single request bounded
+MAX_ARCHIVE_RANGE_DAYS = 366
+
+router = APIRouter()
+
+
+def get_current_active_support(
+    principal: Principal = Depends(get_current_active_principal),
+    db: Session = Depends(get_db)
+) -> Support:
+    """Retrieve the Support profile (with order access) for the currently authenticated user."""
+    support = db.get(Support, principal.support_id) if principal.support_id is not None else None
+    if not support or not support.can_view_orders:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User cannot view orders")
+    return support
+
+
+@router.get(
+    "/archive/orders",
+    response_model=List[ArchivedOrderRead],
+    summary="Search archived orders by creation date range"
+)
+def list_archived_orders(
+    start: datetime,
+    end: datetime,
+    merchant_id: Optional[int] = None,
+    store_id: Optional[int] = None,
+    trader_id: Optional[int] = None,
+    order_status: Optional[str] = Query(None, alias="status"),
+    order_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_support: Support = Depends(get_current_active_support)
+):
+    """Orders moved out of Postgres by the archive job, newest first."""
+    if end <= start or (end - start).days > MAX_ARCHIVE_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range must be positive and at most {MAX_ARCHIVE_RANGE_DAYS} days."
+        )
+    try:
+        return read_archived_orders(
+            start, end,
+            merchant_id=merchant_id, store_id=store_id, trader_id=trader_id,
+            status=order_status, order_id=order_id, limit=limit
+        )
+    except JivaPayException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Archive lookup failed for support {current_support.id}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not read the order archive.")
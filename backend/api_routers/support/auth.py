@@ -1,26 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from backend.database.db import Support
-from backend.config.crypto import verify_password
 from backend.config.logger import get_logger
+from backend.database.utils import get_db
 from backend.shemas_enums import support_schemas
+from backend.services.user_service import authenticate_account
+from backend.services.login_throttle import resolve_client_ip
+from backend.utils.exceptions import AuthenticationError, LoginThrottled, PasswordHashingBusy
 
 router = APIRouter()
 logger = get_logger("support_auth")
 
-def get_db():
-    from backend.database.db import SessionLocal
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/auth/login")
-def login_support(data: support_schemas.SupportLogin, db: Session = Depends(get_db)):
-    user = db.query(Support).filter_by(email=data.email).first()
-    if not user or not verify_password(data.password, user.password_hash):
+def login_support(request: Request, data: support_schemas.SupportLogin, db: Session = Depends(get_db)):
+    client_ip = resolve_client_ip(request.client.host if request.client else None, request.headers.get("X-Forwarded-For"))
+    try:
+        user = authenticate_account(db, Support, data.email, data.password, client_ip)
+    except LoginThrottled as e:
+        logger.warning(f"Слишком много попыток входа саппорта: {data.email} с {client_ip}")
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers={"Retry-After": "1"})
+    except AuthenticationError:
         logger.warning(f"Неудачная попытка входа саппорта: {data.email}")
         raise HTTPException(status_code=401, detail="Неверные учетные данные")
+    # Сохраняет хэш, пересчитанный с текущей стоимостью bcrypt
+    db.commit()
     logger.info(f"Саппорт вошел: {user.email}")
     return {"id": user.id, "email": user.email} 
\ No newline at end of file
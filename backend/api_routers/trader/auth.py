@@ -1,28 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import timedelta
 
 from backend.database.db import Trader
-from backend.config.crypto import verify_password
 from backend.config.logger import get_logger
-from backend.database.utils import get_db_session
+from backend.database.utils import get_db
 from backend.security import create_access_token
+from backend.services.user_service import authenticate_account
+from backend.services.login_throttle import resolve_client_ip
+from backend.utils.exceptions import AuthenticationError, LoginThrottled, PasswordHashingBusy
 from backend.config.settings import settings
 
 router = APIRouter()
 logger = get_logger("trader_auth")
 
 
-def get_db():
-    db = next(get_db_session())
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -30,17 +24,27 @@ class Token(BaseModel):
 
 @router.post("/auth/token", response_model=Token)
 def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = db.query(Trader).filter_by(email=form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    client_ip = resolve_client_ip(request.client.host if request.client else None, request.headers.get("X-Forwarded-For"))
+    try:
+        user = authenticate_account(db, Trader, form_data.username, form_data.password, client_ip)
+    except LoginThrottled as e:
+        logger.warning(f"Throttled trader login attempt: {form_data.username} from {client_ip}")
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers={"Retry-After": "1"})
+    except AuthenticationError:
         logger.warning(f"Failed trader login attempt: {form_data.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Persists a hash upgraded to the current bcrypt cost
+    db.commit()
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
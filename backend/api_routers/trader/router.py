@@ -1,26 +1,28 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from sqlalchemy.orm import Session
 import logging
 
-from backend.database.utils import get_db_session
-from backend.security import get_current_active_user
-from backend.database.db import Trader, OrderHistory
+from backend.database.utils import get_db, get_read_db_session
+from backend.security import get_current_active_principal
+from backend.services.principal_cache import Principal
 from backend.services.order_status_manager import confirm_order_by_trader, cancel_order
-from backend.shemas_enums.order import OrderHistoryRead, OrderCancelPayload
+from backend.shemas_enums.order import OrderHistoryRead, OrderHistoryPage, OrderCancelPayload
+from backend.database.pagination import MAX_PAGE_SIZE
+from backend.services.order_queries import get_order_read, list_orders_page
+from backend.utils.exceptions import InvalidCursor
 
 logger = logging.getLogger(__name__)
 
 
 def get_current_active_trader(
-    current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db_session)
-) -> Trader:
-    """Retrieve the Trader profile for the currently authenticated user."""
-    trader = db.query(Trader).filter_by(user_id=current_user.id).one_or_none()
-    if not trader:
+    principal: Principal = Depends(get_current_active_principal)
+) -> Principal:
+    """Principal of the authenticated user, which must have a Trader profile (`trader_id`)."""
+    if principal.trader_id is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is not a trader")
-    return trader
+    return principal
 
 router = APIRouter(
     prefix="/trader",
@@ -29,22 +31,36 @@ router = APIRouter(
 
 @router.get(
     "/orders",
-    response_model=List[OrderHistoryRead],
+    response_model=OrderHistoryPage,
     summary="List Trader's Assigned Orders"
 )
 def list_trader_orders(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db_session),
-    current_trader: Trader = Depends(get_current_active_trader)
-) -> List[OrderHistory]:
-    """List orders assigned to the current trader."""
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    status_filter: Optional[str] = None,
+    order_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_read_db_session),
+    current_trader: Principal = Depends(get_current_active_trader)
+):
+    """List orders assigned to the current trader, newest first (keyset pagination)."""
     try:
-        query = db.query(OrderHistory).filter_by(trader_id=current_trader.id)
-        orders = query.offset(skip).limit(limit).all()
-        return orders
+        orders, next_cursor = list_orders_page(
+            db,
+            trader_id=current_trader.trader_id,
+            status=status_filter,
+            order_type=order_type,
+            created_from=created_from,
+            created_to=created_to,
+            cursor=cursor,
+            limit=limit,
+        )
+        return {"items": orders, "next_cursor": next_cursor}
+    except InvalidCursor as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
-        logger.error(f"Error listing orders for trader {current_trader.id}: {e}", exc_info=True)
+        logger.error(f"Error listing orders for trader {current_trader.trader_id}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not list orders.")
 
 @router.post(
@@ -52,27 +68,30 @@ def list_trader_orders(
     response_model=OrderHistoryRead,
     summary="Confirm order by trader (upload receipt)"
 )
-async def confirm_trader_order(
+def confirm_trader_order(
     order_id: int,
     receipt_file: UploadFile = File(...),
-    db: Session = Depends(get_db_session),
-    current_trader: Trader = Depends(get_current_active_trader)
-) -> OrderHistory:
-    """Trader confirms and uploads receipt for an order."""
-    content = await receipt_file.read()
+    db: Session = Depends(get_db),
+    current_trader: Principal = Depends(get_current_active_trader)
+) -> OrderHistoryRead:
+    """Trader confirms and uploads receipt for an order.
+
+    Sync on purpose: the S3 upload and the Session work run in FastAPI's threadpool.
+    """
+    content = receipt_file.file.read()
     try:
         updated = confirm_order_by_trader(
             order_id=order_id,
             receipt=content,
             filename=receipt_file.filename,
-            trader_id=current_trader.id,
+            trader_id=current_trader.trader_id,
             db_session=db
         )
-        return updated
+        return get_order_read(db, updated.id)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error confirming order {order_id} by trader {current_trader.id}: {e}", exc_info=True)
+        logger.error(f"Error confirming order {order_id} by trader {current_trader.trader_id}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.post(
@@ -83,9 +102,9 @@ async def confirm_trader_order(
 def cancel_trader_order(
     order_id: int,
     payload: OrderCancelPayload,
-    db: Session = Depends(get_db_session),
-    current_trader: Trader = Depends(get_current_active_trader)
-) -> OrderHistory:
+    db: Session = Depends(get_db),
+    current_trader: Principal = Depends(get_current_active_trader)
+) -> OrderHistoryRead:
     """Trader cancels an order with a reason."""
     try:
         updated = cancel_order(
@@ -94,9 +113,9 @@ def cancel_trader_order(
             reason=payload.reason,
             db=db
         )
-        return updated
+        return get_order_read(db, updated.id)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error canceling order {order_id} by trader {current_trader.id}: {e}", exc_info=True)
+        logger.error(f"Error canceling order {order_id} by trader {current_trader.trader_id}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) 
\ No newline at end of file
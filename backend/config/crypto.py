@@ -1,13 +1,125 @@
+"""Password hashing (bcrypt) on a bounded worker pool.
+
+bcrypt is deliberately CPU-heavy and releases the GIL while it works, so all
+hashing and verification runs on a small dedicated thread pool: a burst of
+logins can use at most PASSWORD_HASH_WORKERS cores, and once
+PASSWORD_HASH_MAX_PENDING calls are queued further ones fail fast with
+PasswordHashingBusy instead of piling up behind order traffic.
+
+The cost factor is BCRYPT_ROUNDS; hashes made with another cost are upgraded
+on the next successful login (see `verify_and_update`).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
 import bcrypt
 
+try:
+    from backend.utils.exceptions import PasswordHashingBusy
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for crypto: {e}")
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Calls running or queued on the pool; beyond that PasswordHashingBusy is raised
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def _submit(fn: Callable[..., T], *args) -> "Future[T]":
+    if not _slots.acquire(blocking=False):
+        metrics.increment("password_hash_rejected_total")
+        raise PasswordHashingBusy()
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
 # Хэширование пароля
 
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except ValueError:
+        # Malformed stored hash or a password over bcrypt's 72-byte limit
+        return False
+
+
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """bcrypt hash of `password` with BCRYPT_ROUNDS, computed on the hashing pool.
+
+    Raises:
+        PasswordHashingBusy: If the pool queue is full.
+    """
+    return _submit(_hash, password, BCRYPT_ROUNDS).result()
+
 
 # Проверка пароля
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8')) 
\ No newline at end of file
+    """Checks `password` against a bcrypt hash on the hashing pool.
+
+    Raises:
+        PasswordHashingBusy: If the pool queue is full.
+    """
+    return _submit(_check, password, hashed_password).result()
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a cost other than BCRYPT_ROUNDS (or is unreadable)."""
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifies `password` and, when the stored hash uses an outdated cost, rehashes it.
+
+    Returns:
+        (valid, new_hash): new_hash is set only when the caller should store it.
+
+    Raises:
+        PasswordHashingBusy: If the pool queue is full.
+    """
+    if not verify_password(password, hashed_password):
+        return False, None
+    if not needs_rehash(hashed_password):
+        return True, None
+    try:
+        new_hash = hash_password(password)
+    except PasswordHashingBusy:
+        # The login itself succeeded; upgrade the hash on a later login
+        return True, None
+    logger.info(f"Rehashing password with bcrypt cost {BCRYPT_ROUNDS}")
+    return True, new_hash
+
+
+async def hash_password_async(password: str) -> str:
+    """Event-loop variant of `hash_password`."""
+    return await asyncio.wrap_future(_submit(_hash, password, BCRYPT_ROUNDS))
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Event-loop variant of `verify_password`."""
+    return await asyncio.wrap_future(_submit(_check, password, hashed_password))
@@ -1,6 +1,9 @@
 from pydantic import BaseSettings, Field
 
 class Settings(BaseSettings):
+    # Debug mode: diagnostic response headers (e.g. X-DB-Query-Count)
+    DEBUG: bool = Field(False, env='DEBUG')
+
     # Database settings
     DATABASE_URL: str = Field(..., env='DATABASE_URL')
 
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, Text, Boolean, DECIMAL, TIMESTAMP, ForeignKey, Index, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DECIMAL, TIMESTAMP, ForeignKey, Index, JSON, Sequence
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
@@ -12,6 +12,22 @@ def utcnow():
     # Возвращает aware datetime в UTC (с tzinfo=timezone.utc)
     return datetime.now(timezone.utc)
 
+# Секционированные (RANGE по времени) таблицы: PK = (id, <ключ секции>), id по-прежнему
+# уникален (общий sequence) и остаётся первичным ключом для ORM. См. database/partitioning.py
+def _partitioned(key: str) -> dict:
+    return {"postgresql_partition_by": f"RANGE ({key})"}
+
+def _orm_only_foreign_keys(*columns) -> None:
+    """Keeps ForeignKey for ORM joins but emits no DB constraint.
+
+    PostgreSQL cannot reference a partitioned table by `id` alone (its unique
+    keys must include the partition key), so these links are enforced by the app.
+    """
+    for column in columns:
+        for fk in column.foreign_keys:
+            fk.constraint.info["orm_only"] = True
+            fk.constraint.ddl_if(callable_=lambda *args, **kwargs: False)
+
 # =====================
 # === РОЛИ ПОЛЬЗОВАТЕЛЕЙ (Roles)
 # =====================
@@ -31,8 +47,8 @@ class Role(Base):
 class AuditLog(Base):
     __tablename__ = 'audit_logs'
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    timestamp: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), index=True)
+    id: Mapped[int] = mapped_column(Integer, Sequence('audit_logs_id_seq'), server_default=Sequence('audit_logs_id_seq').next_value(), primary_key=True, insert_sentinel=True)
+    timestamp: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), primary_key=True, index=True)
     user_id: Mapped[Optional[int]] = mapped_column(ForeignKey('users.id', name='fk_audit_user_id'), nullable=True) # User might be null for system actions
     ip_address: Mapped[Optional[str]] = mapped_column(String(100))
     action: Mapped[str] = mapped_column(String(255), index=True)
@@ -44,7 +60,9 @@ class AuditLog(Base):
 
     __table_args__ = (
         Index('ix_audit_logs_target', 'target_entity', 'target_id'),
+        _partitioned('timestamp'),
     )
+    __mapper_args__ = {"primary_key": ["id"]}
 
 # =====================
 # === ПОЛЬЗОВАТЕЛИ (Users) - Общая таблица
@@ -87,7 +105,8 @@ class Merchant(Base):
     stores: Mapped[List["MerchantStore"]] = relationship(back_populates="merchant", cascade="all, delete-orphan")
     incoming_orders: Mapped[List["IncomingOrder"]] = relationship(back_populates="merchant")
     order_histories: Mapped[List["OrderHistory"]] = relationship(back_populates="merchant")
-    balance_stores: Mapped[List["BalanceStore"]] = relationship(back_populates="merchant") # Assuming relationship exists
+    # Balances are kept per store; this is a read-only view across all of the merchant's stores
+    balance_stores: Mapped[List["BalanceStore"]] = relationship(secondary="merchant_stores", viewonly=True)
     store_addresses: Mapped[List["StoreAddress"]] = relationship(back_populates="merchant") # Assuming relationship exists
 
 class MerchantStore(Base):
@@ -113,8 +132,8 @@ class MerchantStore(Base):
     gateway_require_amount_param: Mapped[bool] = mapped_column(Boolean, default=False)
 
     merchant: Mapped["Merchant"] = relationship(back_populates="stores")
-    crypto_currency: Mapped["CryptoCurrency"] = relationship()
-    fiat_currency: Mapped["FiatCurrency"] = relationship()
+    crypto_currency: Mapped["CryptoCurrency"] = relationship(back_populates="merchant_stores")
+    fiat_currency: Mapped["FiatCurrency"] = relationship(back_populates="merchant_stores")
     store_commissions: Mapped[List["StoreCommission"]] = relationship(back_populates="store", cascade="all, delete-orphan")
     store_gateways: Mapped[List["StoreGateway"]] = relationship(back_populates="store", cascade="all, delete-orphan")
     balance_stores: Mapped[List["BalanceStore"]] = relationship(back_populates="store", cascade="all, delete-orphan")
@@ -155,7 +174,7 @@ class BalanceStore(Base):
 
 class BalanceStoreHistory(Base):
     __tablename__ = "balance_store_history"
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, Sequence('balance_store_history_id_seq'), server_default=Sequence('balance_store_history_id_seq').next_value(), primary_key=True, index=True, insert_sentinel=True)
     store_id: Mapped[int] = mapped_column(ForeignKey('merchant_stores.id', ondelete='CASCADE'), nullable=False)
     crypto_currency_id: Mapped[int] = mapped_column(ForeignKey('crypto_currencies.id'), nullable=False)
     order_id: Mapped[Optional[int]] = mapped_column(ForeignKey('order_history.id')) # Link to order
@@ -163,12 +182,15 @@ class BalanceStoreHistory(Base):
     new_balance: Mapped[Decimal] = mapped_column(DECIMAL(20, 8), nullable=False)
     operation_type: Mapped[str] = mapped_column(String(50), nullable=False, index=True) # e.g., 'payout_completed', 'fee'
     description: Mapped[Optional[str]] = mapped_column(Text)
-    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), primary_key=True)
 
     store: Mapped["MerchantStore"] = relationship(back_populates="balance_store_history")
     crypto_currency: Mapped["CryptoCurrency"] = relationship(back_populates="balance_store_history")
     order: Mapped[Optional["OrderHistory"]] = relationship(back_populates="balance_store_history")
 
+    __table_args__ = (_partitioned('created_at'),)
+    __mapper_args__ = {"primary_key": ["id"]}
+
 class StoreAddress(Base):
     __tablename__ = "store_addresses"
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
@@ -259,7 +281,7 @@ class BalanceTrader(Base):
 
 class BalanceTraderFiatHistory(Base):
     __tablename__ = "balance_trader_fiat_history"
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, Sequence('balance_trader_fiat_history_id_seq'), server_default=Sequence('balance_trader_fiat_history_id_seq').next_value(), primary_key=True, index=True, insert_sentinel=True)
     trader_id: Mapped[int] = mapped_column(ForeignKey('traders.id', ondelete='CASCADE'), nullable=False)
     fiat_id: Mapped[int] = mapped_column(ForeignKey('fiat_currencies.id'), nullable=False)
     order_id: Mapped[Optional[int]] = mapped_column(ForeignKey('order_history.id')) # Link to order
@@ -267,18 +289,19 @@ class BalanceTraderFiatHistory(Base):
     network: Mapped[Optional[str]] = mapped_column(String(50))
     balance_change: Mapped[Decimal] = mapped_column(DECIMAL(20, 2), nullable=False)
     new_balance: Mapped[Decimal] = mapped_column(DECIMAL(20, 2), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), primary_key=True)
     description: Mapped[Optional[str]] = mapped_column(Text)
 
     trader: Mapped["Trader"] = relationship(back_populates="balance_trader_fiat_history")
     fiat: Mapped["FiatCurrency"] = relationship(foreign_keys=[fiat_id], back_populates="balance_trader_fiat_history")
     order: Mapped[Optional["OrderHistory"]] = relationship(back_populates="balance_trader_fiat_history")
 
-    __table_args__ = (Index('ix_balance_trader_fiat_history_op_type', 'operation_type'),)
+    __table_args__ = (Index('ix_balance_trader_fiat_history_op_type', 'operation_type'), _partitioned('created_at'))
+    __mapper_args__ = {"primary_key": ["id"]}
 
 class BalanceTraderCryptoHistory(Base):
     __tablename__ = "balance_trader_crypto_history"
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, Sequence('balance_trader_crypto_history_id_seq'), server_default=Sequence('balance_trader_crypto_history_id_seq').next_value(), primary_key=True, index=True, insert_sentinel=True)
     trader_id: Mapped[int] = mapped_column(ForeignKey('traders.id', ondelete='CASCADE'), nullable=False)
     crypto_currency_id: Mapped[int] = mapped_column(ForeignKey('crypto_currencies.id'), nullable=False)
     order_id: Mapped[Optional[int]] = mapped_column(ForeignKey('order_history.id')) # Link to order
@@ -286,14 +309,15 @@ class BalanceTraderCryptoHistory(Base):
     network: Mapped[str] = mapped_column(String(50), nullable=False) # Network mandatory for crypto
     balance_change: Mapped[Decimal] = mapped_column(DECIMAL(20, 8), nullable=False)
     new_balance: Mapped[Decimal] = mapped_column(DECIMAL(20, 8), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), primary_key=True)
     description: Mapped[Optional[str]] = mapped_column(Text)
 
     trader: Mapped["Trader"] = relationship(back_populates="balance_trader_crypto_history")
     crypto_currency: Mapped["CryptoCurrency"] = relationship(back_populates="trader_balance_history")
     order: Mapped[Optional["OrderHistory"]] = relationship(back_populates="balance_trader_crypto_history")
 
-    __table_args__ = (Index('ix_balance_trader_crypto_history_op_type', 'operation_type'),)
+    __table_args__ = (Index('ix_balance_trader_crypto_history_op_type', 'operation_type'), _partitioned('created_at'))
+    __mapper_args__ = {"primary_key": ["id"]}
 
 class ReqTrader(Base):
     __tablename__ = "req_traders"
@@ -349,12 +373,13 @@ class FullRequisitesSettings(Base):
 # =====================
 class OrderHistory(Base):
     __tablename__ = "order_history"
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    incoming_order_id: Mapped[Optional[int]] = mapped_column(ForeignKey('incoming_orders.id'), unique=True) # Made Optional, unique still valid
-    hash_id: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
-    trader_id: Mapped[int] = mapped_column(ForeignKey('traders.id'), nullable=False, index=True)
+    id: Mapped[int] = mapped_column(Integer, Sequence('order_history_id_seq'), server_default=Sequence('order_history_id_seq').next_value(), primary_key=True, index=True, insert_sentinel=True)
+    # Unique per order, but not enforceable globally on a partitioned table; order_processor re-checks under the IncomingOrder row lock
+    incoming_order_id: Mapped[Optional[int]] = mapped_column(ForeignKey('incoming_orders.id'), index=True)
+    hash_id: Mapped[str] = mapped_column(String(255), index=True, nullable=False) # uuid4, unique by construction
+    trader_id: Mapped[int] = mapped_column(ForeignKey('traders.id'), nullable=False) # Indexed by ix_order_history_trader_created_id
     requisite_id: Mapped[int] = mapped_column(ForeignKey('req_traders.id'), nullable=False)
-    merchant_id: Mapped[int] = mapped_column(ForeignKey('merchants.id'), nullable=False, index=True)
+    merchant_id: Mapped[int] = mapped_column(ForeignKey('merchants.id'), nullable=False) # Indexed by ix_order_history_merchant_created_id
     gateway_id: Mapped[Optional[int]] = mapped_column(ForeignKey('store_gateways.id')) # Made Optional
     store_id: Mapped[int] = mapped_column(ForeignKey('merchant_stores.id'), nullable=False, index=True)
     method_id: Mapped[int] = mapped_column(ForeignKey('payment_methods.id'), nullable=False)
@@ -370,7 +395,7 @@ class OrderHistory(Base):
     store_commission: Mapped[Decimal] = mapped_column(DECIMAL(20, 2), nullable=False)
     trader_commission: Mapped[Decimal] = mapped_column(DECIMAL(20, 2), nullable=False)
     status: Mapped[str] = mapped_column(String(50), nullable=False, default='pending', index=True)
-    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), index=True)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), primary_key=True, index=True)
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
     client_id: Mapped[Optional[str]] = mapped_column(String(255), index=True) # Added from description
     customer_id: Mapped[Optional[str]] = mapped_column(String(255)) # Added from incoming order
@@ -400,12 +425,22 @@ class OrderHistory(Base):
     # Relationship to uploaded documents
     uploaded_documents: Mapped[List["UploadedDocument"]] = relationship("UploadedDocument", back_populates="order", cascade="all, delete-orphan")
 
-    __table_args__ = (Index('ix_order_history_created_at', 'created_at'), Index('ix_order_history_client_id', 'client_id'),)
+    __table_args__ = (
+        Index('ix_order_history_created_at', 'created_at'),
+        Index('ix_order_history_client_id', 'client_id'),
+        # Turnover window in requisite_selector: pruned to recent partitions, then this index
+        Index('ix_order_history_requisite_created', 'requisite_id', 'created_at'),
+        # Keyset pagination of merchant/trader order lists (database/pagination.py)
+        Index('ix_order_history_merchant_created_id', 'merchant_id', 'created_at', 'id'),
+        Index('ix_order_history_trader_created_id', 'trader_id', 'created_at', 'id'),
+        _partitioned('created_at'),
+    )
+    __mapper_args__ = {"primary_key": ["id"]}
 
 class IncomingOrder(Base):
     __tablename__ = "incoming_orders"
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, Sequence('incoming_orders_id_seq'), server_default=Sequence('incoming_orders_id_seq').next_value(), primary_key=True, index=True, insert_sentinel=True)
 
     # --- Request Details ---
     merchant_id: Mapped[int] = mapped_column(ForeignKey('merchants.id'), nullable=False) # Removed cascade
@@ -441,7 +476,7 @@ class IncomingOrder(Base):
     assigned_order_rel: Mapped[Optional["OrderHistory"]] = relationship(back_populates="incoming_order") # Renamed relationship
 
     # --- Timestamps ---
-    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False, primary_key=True)
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # --- Relationships (Define explicitly if needed for direct access) ---
@@ -458,7 +493,9 @@ class IncomingOrder(Base):
         Index('ix_incoming_orders_status_created', 'status', 'created_at'),
         Index('ix_incoming_orders_merchant_store', 'merchant_id', 'store_id'),
         Index('ix_incoming_orders_client_id', 'client_id'),
+        _partitioned('created_at'),
     )
+    __mapper_args__ = {"primary_key": ["id"]}
 
 # =====================
 # === ПОДДЕРЖКА и АДМИНЫ (Support & Admins)
@@ -568,7 +605,7 @@ class FiatCurrency(Base):
     balance_trader_fiat_history: Mapped[List["BalanceTraderFiatHistory"]] = relationship(foreign_keys="[BalanceTraderFiatHistory.fiat_id]", back_populates="fiat")
     balance_traders: Mapped[List["BalanceTrader"]] = relationship(back_populates="fiat_currency")
     store_addresses: Mapped[List["StoreAddress"]] = relationship(back_populates="fiat_currency")
-    merchant_stores: Mapped[List["MerchantStore"]] = relationship(foreign_keys="[MerchantStore.fiat_currency_id]") # Removed back_populates if only one relationship needed
+    merchant_stores: Mapped[List["MerchantStore"]] = relationship(foreign_keys="[MerchantStore.fiat_currency_id]", back_populates="fiat_currency")
 
     country: Mapped["Country"] = relationship(back_populates="fiat_currencies")
 
@@ -581,7 +618,7 @@ class CryptoCurrency(Base):
     description: Mapped[Optional[str]] = mapped_column(String(255))
     access: Mapped[bool] = mapped_column(Boolean, default=True)
 
-    merchant_stores: Mapped[List["MerchantStore"]] = relationship(foreign_keys="[MerchantStore.crypto_currency_id]")
+    merchant_stores: Mapped[List["MerchantStore"]] = relationship(foreign_keys="[MerchantStore.crypto_currency_id]", back_populates="crypto_currency")
     balance_stores: Mapped[List["BalanceStore"]] = relationship(back_populates="crypto_currency")
     balance_store_history: Mapped[List["BalanceStoreHistory"]] = relationship(back_populates="crypto_currency")
     trader_balance_history: Mapped[List["BalanceTraderCryptoHistory"]] = relationship(back_populates="crypto_currency")
@@ -658,4 +695,12 @@ class UploadedDocument(Base):
 
     order: Mapped["OrderHistory"] = relationship(back_populates="uploaded_documents")
 
-    
\ No newline at end of file
+# Ссылки на секционированные order_history / incoming_orders - только на уровне ORM
+_orm_only_foreign_keys(
+    OrderHistory.__table__.c.incoming_order_id,
+    BalanceStoreHistory.__table__.c.order_id,
+    BalanceTraderFiatHistory.__table__.c.order_id,
+    BalanceTraderCryptoHistory.__table__.c.order_id,
+    UploadedDocument.__table__.c.order_id,
+)
+
@@ -1,8 +1,17 @@
 import os
-from sqlalchemy import create_engine
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
 
+from backend.utils import metrics
+
 # Загрузка переменных окружения
 load_dotenv()
 
@@ -12,7 +21,190 @@ POSTGRES_DB = os.getenv("POSTGRES_DB")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 
-SQLALCHEMY_DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+# DATABASE_URL (как в config/settings.py) имеет приоритет над POSTGRES_*; драйвер подставляем сами
+_BASE_DATABASE_URL = make_url(
+    os.getenv("DATABASE_URL")
+    or f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+SQLALCHEMY_DATABASE_URL = _BASE_DATABASE_URL.set(drivername="postgresql+psycopg2").render_as_string(hide_password=False)
+# Асинхронный движок (asyncpg) для gateway: запросы не занимают поток из threadpool
+ASYNC_SQLALCHEMY_DATABASE_URL = _BASE_DATABASE_URL.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+# Роль процесса (gateway, trader, merchant, admin, support, worker) выбирает профиль пула
+SERVICE_ROLE = os.getenv("SERVICE_ROLE", "default")
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """Connection pool and session settings for one process role.
+
+    Pool sizes are per engine and per process: with N uvicorn/celery processes
+    a role holds up to N * (pool_size + max_overflow) connections.
+    """
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0        # seconds to wait for a free connection
+    pool_recycle: int = 1800          # seconds; drop connections before server/proxy idle cutoffs
+    pool_pre_ping: bool = True        # detect connections killed by failover/restarts
+    statement_timeout_ms: int = 30000
+    lock_timeout_ms: int = 10000
+    idle_in_transaction_timeout_ms: int = 60000
+    async_pool_size: int = 5
+    async_max_overflow: int = 10
+
+
+ENGINE_PROFILES: Dict[str, EngineProfile] = {
+    "default": EngineProfile(),
+    # Gateway: requests go through the async engine; short timeouts so a slow query fails fast
+    "gateway": EngineProfile(pool_size=2, max_overflow=3, pool_timeout=5.0,
+                             statement_timeout_ms=5000, lock_timeout_ms=2000, idle_in_transaction_timeout_ms=15000,
+                             async_pool_size=20, async_max_overflow=10),
+    "trader": EngineProfile(pool_size=10, max_overflow=10, pool_timeout=10.0,
+                            statement_timeout_ms=15000, lock_timeout_ms=5000),
+    "merchant": EngineProfile(pool_size=10, max_overflow=10, pool_timeout=10.0,
+                              statement_timeout_ms=15000, lock_timeout_ms=5000),
+    "admin": EngineProfile(pool_size=5, max_overflow=5, statement_timeout_ms=60000),
+    "support": EngineProfile(pool_size=5, max_overflow=5, statement_timeout_ms=60000),
+    # Prefork worker: one task at a time per child process, so a tiny pool per child
+    "worker": EngineProfile(pool_size=2, max_overflow=2, statement_timeout_ms=30000, lock_timeout_ms=5000,
+                            async_pool_size=1, async_max_overflow=1),
+}
+
+# Переопределения через окружение: DB_POOL_SIZE, DB_STATEMENT_TIMEOUT_MS, ...
+_ENV_OVERRIDES = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v.lower() in ("1", "true", "yes")),
+    "statement_timeout_ms": ("DB_STATEMENT_TIMEOUT_MS", int),
+    "lock_timeout_ms": ("DB_LOCK_TIMEOUT_MS", int),
+    "idle_in_transaction_timeout_ms": ("DB_IDLE_IN_TX_TIMEOUT_MS", int),
+    "async_pool_size": ("DB_ASYNC_POOL_SIZE", int),
+    "async_max_overflow": ("DB_ASYNC_MAX_OVERFLOW", int),
+}
+
+
+def get_engine_profile(role: str = SERVICE_ROLE) -> EngineProfile:
+    """Returns the profile for `role` with DB_* environment overrides applied."""
+    profile = ENGINE_PROFILES.get(role, ENGINE_PROFILES["default"])
+    overrides: Dict[str, Any] = {}
+    for field, (env_name, cast) in _ENV_OVERRIDES.items():
+        raw = os.getenv(env_name)
+        if raw:
+            overrides[field] = cast(raw)
+    return replace(profile, **overrides) if overrides else profile
+
+
+class _InstrumentedPoolMixin:
+    """Records how long callers wait for a connection and how often the pool runs dry."""
+    metrics_labels: Dict[str, str] = {}
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.increment("db_pool_timeouts_total", **self.metrics_labels)
+            raise
+        finally:
+            metrics.observe("db_pool_checkout_seconds", time.perf_counter() - start, **self.metrics_labels)
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep the labels of this one
+        pool = super().recreate()
+        pool.metrics_labels = self.metrics_labels
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    metrics_labels = {"role": SERVICE_ROLE, "engine": "sync", "db": "primary"}
+
+
+class InstrumentedAsyncPool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_labels = {"role": SERVICE_ROLE, "engine": "async", "db": "primary"}
+
+
+def _session_settings(profile: EngineProfile) -> Dict[str, str]:
+    return {
+        "application_name": f"jivapay-{SERVICE_ROLE}",
+        "statement_timeout": str(profile.statement_timeout_ms),
+        "lock_timeout": str(profile.lock_timeout_ms),
+        "idle_in_transaction_session_timeout": str(profile.idle_in_transaction_timeout_ms),
+    }
+
+
+def _driver_url(url: str, drivername: str) -> str:
+    return make_url(url).set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def create_sync_engine(profile: EngineProfile, url: str = SQLALCHEMY_DATABASE_URL, name: str = "primary"):
+    session_settings = _session_settings(profile)
+    options = " ".join(f"-c {key}={value}" for key, value in session_settings.items() if key != "application_name")
+    sync_engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=profile.pool_recycle,
+        pool_pre_ping=profile.pool_pre_ping,
+        connect_args={"application_name": session_settings["application_name"], "options": options},
+    )
+    sync_engine.pool.metrics_labels = {"role": SERVICE_ROLE, "engine": "sync", "db": name}
+    return sync_engine
+
+
+def create_async_db_engine(profile: EngineProfile, url: str = ASYNC_SQLALCHEMY_DATABASE_URL, name: str = "primary"):
+    aengine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=profile.async_pool_size,
+        max_overflow=profile.async_max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=profile.pool_recycle,
+        pool_pre_ping=profile.pool_pre_ping,
+        connect_args={"server_settings": _session_settings(profile)},
+    )
+    aengine.sync_engine.pool.metrics_labels = {"role": SERVICE_ROLE, "engine": "async", "db": name}
+    return aengine
+
+
+engine_profile = get_engine_profile()
+
+engine = create_sync_engine(engine_profile)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_db_engine(engine_profile)
+# expire_on_commit=False: объекты остаются читаемыми после commit без повторного запроса
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Реплики только для чтения (через запятую); маршрутизация - в database/utils.py
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+replica_engines = [
+    create_sync_engine(engine_profile, _driver_url(url, "postgresql+psycopg2"), name=f"replica{i}")
+    for i, url in enumerate(REPLICA_DATABASE_URLS)
+]
+async_replica_engines = [
+    create_async_db_engine(engine_profile, _driver_url(url, "postgresql+asyncpg"), name=f"replica{i}")
+    for i, url in enumerate(REPLICA_DATABASE_URLS)
+]
+
+
+def all_sync_engines():
+    """Primary and replica sync engines (async engines expose theirs via .sync_engine)."""
+    return [engine, async_engine.sync_engine] + replica_engines + [e.sync_engine for e in async_replica_engines]
+
+
+def _collect_pool_metrics() -> None:
+    for sync_engine in all_sync_engines():
+        pool = sync_engine.pool
+        labels = pool.metrics_labels
+        metrics.set_gauge("db_pool_size", pool.size(), **labels)
+        metrics.set_gauge("db_pool_checked_out", pool.checkedout(), **labels)
+        metrics.set_gauge("db_pool_checked_in", pool.checkedin(), **labels)
+        # Negative while the pool is not yet full; positive = connections beyond pool_size
+        metrics.set_gauge("db_pool_overflow", pool.overflow(), **labels)
+
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) 
\ No newline at end of file
+metrics.register_collector(_collect_pool_metrics)
@@ -1,5 +1,6 @@
 from logging.config import fileConfig
 import os
+import re
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -59,6 +60,19 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+# Monthly partitions (<table>_p202506, <table>_default, <table>_legacy) are managed by
+# backend/database/partitioning.py, and FKs marked orm_only exist only in the models.
+_PARTITION_CHILD_RE = re.compile(r"_(p\d{6}|default|legacy)$")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and reflected and compare_to is None and name and _PARTITION_CHILD_RE.search(name):
+        return False
+    if type_ == "foreign_key_constraint" and object.info.get("orm_only"):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -83,6 +97,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -111,7 +126,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
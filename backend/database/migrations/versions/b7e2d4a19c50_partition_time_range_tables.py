@@ -0,0 +1,241 @@
+"""partition time range tables
+
+Converts the append-heavy tables to monthly RANGE partitioning on their time
+column (see backend/database/partitioning.py). Existing rows are not copied:
+the old table is renamed to `<table>_legacy` and attached as a single
+partition covering everything before the first day of next month (the
+cutover; later if the table already holds rows dated past that), so the migration only holds locks for catalog changes, index builds
+and constraint validation. Monthly partitions start at the cutover.
+
+Tradeoffs (PostgreSQL requires the partition key in every unique constraint):
+- primary keys become (id, <key>); ids still come from the original sequence;
+- unique indexes that do not include the key are recreated as plain indexes
+  (order_history.hash_id / incoming_order_id are unique by construction);
+- foreign keys pointing *to* these tables are dropped and kept ORM-only.
+
+Downgrade detaches the legacy partition, copies the rows written since the
+upgrade back into it (only the newer partitions are rewritten), restores the
+original table name, index names and `id` primary key, and re-adds the
+foreign keys declared in the models as NOT VALID (validated where existing
+rows allow it).
+
+Revision ID: b7e2d4a19c50
+Revises: 968cc15566f6
+Create Date: 2025-06-02 10:00:00.000000
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+from alembic.util import CommandError
+import sqlalchemy as sa
+
+from backend.database.db import Base
+from backend.database.partitioning import PARTITIONED_TABLES, ensure_partitions, is_partitioned, month_start
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4a19c50'
+down_revision: Union[str, None] = '968cc15566f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows with a NULL partition key are moved to the legacy range
+NULL_KEY_FILL = '1970-01-01'
+
+# Indexes declared by the models that the legacy tables may not have yet
+NEW_INDEXES = {
+    'order_history': [
+        ('ix_order_history_incoming_order_id', ['incoming_order_id']),
+        ('ix_order_history_requisite_created', ['requisite_id', 'created_at']),
+    ],
+}
+
+
+def _table_exists(bind, table: str) -> bool:
+    return bind.execute(sa.text("SELECT to_regclass(:name)"), {"name": table}).scalar() is not None
+
+
+def _cutover(bind, table: str, key: str, today: date) -> date:
+    """First day of the month after both today and the newest row (rows of the current month exist already)."""
+    newest = bind.execute(sa.text(f'SELECT max("{key}") FROM "{table}"')).scalar()
+    if newest is not None and newest.date() > today:
+        today = newest.date()
+    return month_start(today, 1)
+
+
+def _partition_table(bind, table: str, key: str, cutover: date) -> None:
+    legacy = f"{table}_legacy"
+    params = {"table": table}
+
+    # 1. Foreign keys referencing this table cannot survive (no unique index on id alone)
+    for referencing, name in bind.execute(sa.text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = CAST(:table AS regclass) AND conparentid = 0"
+    ), params).all():
+        op.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT "{name}"')
+
+    outbound_fks = bind.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = CAST(:table AS regclass)"
+    ), params).all()
+    indexes = bind.execute(sa.text(
+        "SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique, i.indisprimary, "
+        "       EXISTS (SELECT 1 FROM unnest(i.indkey) k JOIN pg_attribute a "
+        "               ON a.attrelid = i.indrelid AND a.attnum = k WHERE a.attname = :key) "
+        "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = CAST(:table AS regclass)"
+    ), {**params, "key": key}).all()
+
+    # 2. The partition key must be NOT NULL
+    op.execute(f'UPDATE "{table}" SET "{key}" = \'{NULL_KEY_FILL}\' WHERE "{key}" IS NULL')
+    op.execute(f'ALTER TABLE "{table}" ALTER COLUMN "{key}" SET NOT NULL')
+
+    # 3. Move the old table (and its index names) out of the way. The old primary key goes:
+    # the parent's (id, key) key needs its own index on every partition, and a table has only one.
+    for name, _, _, primary, _ in indexes:
+        if primary:
+            op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+        else:
+            op.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_legacy"')
+    for name, _ in outbound_fks:
+        op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+    op.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+
+    # 4. Lets ATTACH skip the full-table range scan
+    op.execute(f'ALTER TABLE "{legacy}" ADD CONSTRAINT "{legacy}_range" CHECK ("{key}" < \'{cutover.isoformat()}\') NOT VALID')
+    op.execute(f'ALTER TABLE "{legacy}" VALIDATE CONSTRAINT "{legacy}_range"')
+
+    # 5. New partitioned parent with the same columns and defaults (id keeps using <table>_id_seq)
+    op.execute(f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE ("{key}")')
+    op.execute(f'ALTER SEQUENCE IF EXISTS "{table}_id_seq" OWNED BY "{table}".id')
+    op.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{legacy}" FOR VALUES FROM (MINVALUE) TO (\'{cutover.isoformat()}\')')
+    op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "{key}")')
+
+    # 6. Secondary indexes; matching legacy indexes are attached instead of rebuilt.
+    # A unique index without the key degrades to a plain one unless that would duplicate another index.
+    created = set()
+    for name, definition, unique, primary, has_key in sorted(indexes, key=lambda row: row[2]):
+        method = definition[definition.index(" USING "):]
+        if primary or method in created:
+            continue
+        if unique and not has_key:
+            definition = definition.replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1)
+        op.execute(definition)
+        created.add(method)
+    for name, columns in NEW_INDEXES.get(table, []):
+        if f" USING btree ({', '.join(columns)})" not in created:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+    # 7. Outbound foreign keys, now on the parent (validated once across the legacy partition)
+    for name, definition in outbound_fks:
+        op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    today = datetime.now(timezone.utc).date()
+
+    for table, key in PARTITIONED_TABLES.items():
+        if not _table_exists(bind, table) or is_partitioned(bind, table):
+            continue
+        _partition_table(bind, table, key, _cutover(bind, table, key, today))
+
+    # Months from the cutover onwards + DEFAULT partition
+    ensure_partitions(bind, today=today)
+
+
+def _unpartition_table(bind, table: str, key: str) -> None:
+    legacy = f"{table}_legacy"
+    params = {"table": table, "legacy": legacy}
+
+    # 1. Foreign keys on the parent (cascade to the partitions); re-added on the plain table below
+    outbound_fks = bind.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = CAST(:table AS regclass) AND conparentid = 0"
+    ), params).all()
+    for name, _ in outbound_fks:
+        op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+    for referencing, name in bind.execute(sa.text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = CAST(:table AS regclass) AND conparentid = 0"
+    ), params).all():
+        op.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT "{name}"')
+
+    # 2. Keep the id sequence alive when the parent is dropped
+    op.execute(f'ALTER SEQUENCE IF EXISTS "{table}_id_seq" OWNED BY "{legacy}".id')
+
+    # 3. Fold the rows written since the upgrade back into the legacy table
+    op.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{legacy}"')
+    op.execute(f'ALTER TABLE "{legacy}" DROP CONSTRAINT IF EXISTS "{legacy}_range"')
+    op.execute(f'INSERT INTO "{legacy}" SELECT * FROM "{table}"')
+    op.execute(f'DROP TABLE "{table}"')
+
+    # 4. Original name, index names and primary key
+    for (name,) in bind.execute(sa.text(
+        "SELECT conname FROM pg_constraint WHERE contype = 'p' AND conrelid = CAST(:legacy AS regclass)"
+    ), params).all():
+        op.execute(f'ALTER TABLE "{legacy}" DROP CONSTRAINT "{name}"')
+    op.execute(f'ALTER TABLE "{legacy}" RENAME TO "{table}"')
+    for (name,) in bind.execute(sa.text(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = CAST(:table AS regclass) AND c.relname LIKE '%\\_legacy'"
+    ), params).all():
+        op.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:-len("_legacy")]}"')
+    op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id)')
+    op.execute(f'ALTER TABLE "{table}" ALTER COLUMN "{key}" DROP NOT NULL')
+
+    for name, definition in outbound_fks:
+        op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+
+
+def _restore_inbound_foreign_keys(bind) -> None:
+    """Re-adds the model FKs that point at the (now plain) tables; upgrade dropped them.
+
+    Rows written while the tables were partitioned were not checked, so each FK
+    is added NOT VALID and validated in a savepoint; orphans leave it NOT VALID.
+    """
+    existing = {
+        (referencing, name) for referencing, name in bind.execute(sa.text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f'"
+        )).all()
+    }
+    for table in Base.metadata.sorted_tables:
+        if not _table_exists(bind, table.name):
+            continue
+        for fk in table.foreign_key_constraints:
+            target = fk.referred_table.name
+            if target not in PARTITIONED_TABLES or not _table_exists(bind, target):
+                continue
+            columns = [column.name for column in fk.columns]
+            name = fk.name or f"{table.name}_{'_'.join(columns)}_fkey"
+            if (table.name, name) in existing:
+                continue
+            referred = [element.column.name for element in fk.elements]
+            on_delete = f" ON DELETE {fk.ondelete}" if fk.ondelete else ""
+            op.execute(
+                f'ALTER TABLE "{table.name}" ADD CONSTRAINT "{name}" FOREIGN KEY ({", ".join(columns)}) '
+                f'REFERENCES "{target}" ({", ".join(referred)}){on_delete} NOT VALID'
+            )
+            try:
+                with bind.begin_nested():
+                    bind.execute(sa.text(f'ALTER TABLE "{table.name}" VALIDATE CONSTRAINT "{name}"'))
+            except sa.exc.DBAPIError as e:
+                print(f"WARNING: {table.name}.{name} left NOT VALID (rows without a parent): {e.orig}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    for table, key in reversed(list(PARTITIONED_TABLES.items())):
+        if not _table_exists(bind, table) or not is_partitioned(bind, table):
+            continue
+        if not _table_exists(bind, f"{table}_legacy"):
+            # Created partitioned from the start (fresh database): there is no plain table to go back to
+            raise CommandError(
+                f"Cannot downgrade '{table}': it has no {table}_legacy partition to restore as a plain table."
+            )
+        _unpartition_table(bind, table, key)
+    _restore_inbound_foreign_keys(bind)
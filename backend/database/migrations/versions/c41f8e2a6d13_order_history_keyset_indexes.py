@@ -0,0 +1,39 @@
+"""order history keyset indexes
+
+Composite indexes for keyset pagination of merchant and trader order lists
+(ORDER BY created_at DESC, id DESC after an equality filter on the owner).
+
+Revision ID: c41f8e2a6d13
+Revises: b7e2d4a19c50
+Create Date: 2025-06-09 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8e2a6d13'
+down_revision: Union[str, None] = 'b7e2d4a19c50'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # On a partitioned table this creates the index on every partition
+    op.create_index('ix_order_history_merchant_created_id', 'order_history', ['merchant_id', 'created_at', 'id'], if_not_exists=True)
+    op.create_index('ix_order_history_trader_created_id', 'order_history', ['trader_id', 'created_at', 'id'], if_not_exists=True)
+    # Superseded by the composite indexes (same leading column)
+    op.drop_index('ix_order_history_merchant_id', table_name='order_history', if_exists=True)
+    op.drop_index('ix_order_history_trader_id', table_name='order_history', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_order_history_trader_id', 'order_history', ['trader_id'], if_not_exists=True)
+    op.create_index('ix_order_history_merchant_id', 'order_history', ['merchant_id'], if_not_exists=True)
+    op.drop_index('ix_order_history_trader_created_id', table_name='order_history', if_exists=True)
+    op.drop_index('ix_order_history_merchant_created_id', table_name='order_history', if_exists=True)
@@ -0,0 +1,77 @@
+"""Keyset (cursor) pagination over (created_at, id).
+
+Pages are ordered newest first by `(created_at DESC, id DESC)` (or oldest
+first with `ascending=True`) and continue from the last row of the previous
+page with a row comparison, so page N costs
+one index range scan of `limit` rows like page 1, and rows inserted while a
+client pages through the list do not shift or duplicate results. Pair it with
+a composite index `(<filter column>, created_at, id)`.
+
+The cursor is opaque to clients: urlsafe base64 of the last row's key.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import Select, tuple_
+
+from backend.utils.exceptions import InvalidCursor
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    payload = json.dumps({"t": created_at.isoformat(), "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Returns (created_at, id) of the row the cursor points after.
+
+    Raises:
+        InvalidCursor: If the cursor was not produced by `encode_cursor`.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload["t"]), int(payload["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor() from e
+
+
+def keyset_page(
+    statement: Select,
+    created_at_column: Any,
+    id_column: Any,
+    cursor: Optional[str],
+    limit: int,
+    ascending: bool = False
+) -> Tuple[Select, int]:
+    """Applies ordering, the cursor condition and LIMIT (one extra row to detect a next page).
+
+    Cursors are only meaningful with the `ascending` value that produced them.
+
+    Returns:
+        The paged statement and the effective page size.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = tuple_(created_at_column, id_column)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        after = tuple_(created_at, row_id)
+        statement = statement.where(key > after if ascending else key < after)
+    if ascending:
+        statement = statement.order_by(created_at_column.asc(), id_column.asc())
+    else:
+        statement = statement.order_by(created_at_column.desc(), id_column.desc())
+    return statement.limit(limit + 1), limit
+
+
+def split_page(rows: List[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trims the extra row and builds the cursor for the next page (None on the last page)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
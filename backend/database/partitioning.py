@@ -0,0 +1,134 @@
+"""Monthly range partitions for the append-heavy tables.
+
+The tables below are declared `PARTITION BY RANGE (<key>)` (see database/db.py
+and the `partition_time_range_tables` migration). This module creates the
+monthly partitions ahead of time, plus a DEFAULT partition per table as a safety
+net so an insert never fails if maintenance falls behind.
+
+Queries filtering on the partition key (e.g. the turnover window
+`OrderHistory.created_at >= window_start`) only touch the matching partitions.
+
+Usage:
+    python -m backend.database.partitioning [--months-ahead 3]
+"""
+
+import argparse
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# table -> partition key column
+PARTITIONED_TABLES: Dict[str, str] = {
+    "order_history": "created_at",
+    "incoming_orders": "created_at",
+    "audit_logs": "timestamp",
+    "balance_store_history": "created_at",
+    "balance_trader_fiat_history": "created_at",
+    "balance_trader_crypto_history": "created_at",
+}
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """First day of the month `offset` months after the month of `day`."""
+    index = day.year * 12 + (day.month - 1) + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, start: date) -> str:
+    return f"{table}_p{start:%Y%m}"
+
+
+def monthly_ranges(today: date, months_ahead: int) -> List[Tuple[date, date]]:
+    """[start, end) bounds from the current month through `months_ahead` months ahead."""
+    return [(month_start(today, i), month_start(today, i + 1)) for i in range(months_ahead + 1)]
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    return bool(connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+             "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"),
+        {"table": table},
+    ).scalar())
+
+
+def legacy_upper_bound(connection: Connection, table: str) -> Optional[date]:
+    """Exclusive upper bound of `<table>_legacy` (the pre-partitioning rows), if it is attached."""
+    bound = connection.execute(
+        text("SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_class c "
+             "WHERE c.relname = :name AND c.relispartition AND pg_table_is_visible(c.oid)"),
+        {"name": f"{table}_legacy"},
+    ).scalar()
+    match = re.search(r"TO \('(\d{4}-\d{2}-\d{2})", bound or "")
+    return date.fromisoformat(match.group(1)) if match else None
+
+
+def ensure_partitions(
+    connection: Connection,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    today: Optional[date] = None
+) -> List[str]:
+    """Creates missing monthly partitions (and the DEFAULT partition) for every partitioned table.
+
+    Tables that are not partitioned yet (migration not applied) are skipped.
+    Each partition is created in its own savepoint, so one failure (e.g. rows for
+    that month already sitting in the DEFAULT partition) does not stop the rest.
+    Months still covered by the legacy partition are skipped.
+
+    Returns:
+        Names of the partitions created.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    created: List[str] = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            logger.warning(f"Table '{table}' is not partitioned; skipping partition maintenance.")
+            continue
+        statements = [(f"{table}_default", f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT')]
+        legacy_end = legacy_upper_bound(connection, table)
+        for start, end in monthly_ranges(today, months_ahead):
+            if legacy_end is not None and start < legacy_end:
+                continue
+            name = partition_name(table, start)
+            statements.append((name, (
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )))
+        for name, statement in statements:
+            exists = connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+            if exists:
+                continue
+            try:
+                with connection.begin_nested():
+                    connection.execute(text(statement))
+                created.append(name)
+                logger.info(f"Created partition {name}")
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to create partition {name}: {e}")
+    return created
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create upcoming monthly partitions.")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from backend.database.engine import engine
+
+    with engine.begin() as connection:
+        created = ensure_partitions(connection, args.months_ahead)
+    logger.info(f"Partition maintenance done, {len(created)} partition(s) created.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Per-request / per-task SQL accounting.
+
+Engine-level cursor events (all engines: sync, async, replicas) add every
+statement to the `QueryStats` bound to the current context. An HTTP middleware
+(middleware/query_stats.py) and Celery task signals (worker/lifecycle.py) open
+a scope around each unit of work and report the totals.
+
+Pool checkouts are counted too: a request sharing one Session (database/utils
+`get_db`) should check out a single connection per database it touches.
+
+Repeated statements are grouped by a normalized pattern (literals and IN-lists
+collapsed), so a lazy load run once per row of a list - the N+1 pattern -
+shows up as one pattern with a high count.
+"""
+
+import heapq
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Dict, Generator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from backend.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Same pattern this many times in one scope is reported as a potential N+1
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+SQL_SLOWEST_KEPT = int(os.getenv("SQL_SLOWEST_KEPT", "3"))
+# Scopes running more statements than this are logged with their top patterns
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "50"))
+
+# psycopg2 %(name)s, asyncpg $1 (+ ::TYPE casts), sqlite ?
+_PARAM_RE = re.compile(r"%\(\w+\)s|\$\d+")
+_CAST_RE = re.compile(r"::[A-Z_]+(?:\s+WITH(?:OUT)?\s+TIME\s+ZONE)?(?:\(\d+(?:,\s*\d+)?\))?")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Statement shape without parameters/literals, e.g. `... WHERE id IN (?...)`."""
+    shape = _PARAM_RE.sub("?", _CAST_RE.sub("", statement))
+    shape = _LITERAL_RE.sub("?", shape)
+    shape = _PARAM_LIST_RE.sub("(?...)", shape)
+    return _WHITESPACE_RE.sub(" ", shape).strip()
+
+
+@dataclass
+class QueryStats:
+    """Statements executed within one scope (request or task)."""
+    name: str
+    count: int = 0
+    total_seconds: float = 0.0
+    checkouts: int = 0
+    patterns: Counter = field(default_factory=Counter)
+    # min-heap of (seconds, statement) keeping the slowest SQL_SLOWEST_KEPT
+    _slowest: List[Tuple[float, str]] = field(default_factory=list)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.patterns[normalize_statement(statement)] += 1
+        entry = (seconds, statement)
+        if len(self._slowest) < SQL_SLOWEST_KEPT:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self) -> List[Tuple[float, str]]:
+        return sorted(self._slowest, reverse=True)
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> Dict[str, int]:
+        """Patterns executed at least `threshold` times (N+1 suspects)."""
+        return {pattern: n for pattern, n in self.patterns.most_common() if n >= threshold}
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def start_tracking(name: str) -> Tuple[QueryStats, Token]:
+    """Binds a new QueryStats to the current context; pass the token to `stop_tracking`."""
+    stats = QueryStats(name=name)
+    return stats, _current.set(stats)
+
+
+def stop_tracking(token: Token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def track_queries(name: str) -> Generator[QueryStats, None, None]:
+    """Collects the statements run in this context (and tasks/threads copying it) into a QueryStats."""
+    stats, token = start_tracking(name)
+    try:
+        yield stats
+    finally:
+        stop_tracking(token)
+
+
+def report(stats: QueryStats, kind: str) -> None:
+    """Exports the scope totals as metrics and logs N+1 suspects / budget overruns."""
+    metrics.observe("db_queries_per_scope", stats.count, kind=kind, scope=stats.name)
+    metrics.observe("db_time_per_scope_seconds", stats.total_seconds, kind=kind, scope=stats.name)
+    metrics.observe("db_checkouts_per_scope", stats.checkouts, kind=kind, scope=stats.name)
+    repeated = stats.repeated()
+    if repeated:
+        metrics.increment("db_repeated_statement_scopes_total", kind=kind, scope=stats.name)
+        pattern, n = next(iter(repeated.items()))
+        logger.warning(f"Possible N+1 in {kind} '{stats.name}': {n}x {pattern[:300]}")
+    if stats.count > SQL_QUERY_BUDGET:
+        top = "; ".join(f"{n}x {pattern[:120]}" for pattern, n in stats.patterns.most_common(3))
+        logger.warning(f"{kind} '{stats.name}' ran {stats.count} statements ({stats.total_seconds * 1000:.1f}ms): {top}")
+
+
+# --- Engine / pool events (registered for every Engine and Pool, including the async ones) --- #
+
+_START_KEY = "query_stats_start"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    starts = conn.info.get(_START_KEY)
+    if stats is None or not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context) -> None:
+    # Failed statements never reach after_cursor_execute; drop their start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get(_START_KEY):
+        conn.info[_START_KEY].pop()
+
+
+@event.listens_for(Pool, "checkout")
+def _pool_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.checkouts += 1
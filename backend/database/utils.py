@@ -1,26 +1,41 @@
 """Database utility functions for session management, transactions, and basic CRUD operations."""
 
+import asyncio
+import hashlib
+import itertools
 import logging
+import os
+import threading
+import time
 from contextlib import contextmanager
-from typing import Generator, TypeVar, Type, Optional, Dict, Any
+from contextvars import ContextVar, Token
+from typing import Generator, AsyncGenerator, Callable, TypeVar, Type, Optional, Dict, Any, List, FrozenSet
 
+from cachetools import TTLCache
+from redis import RedisError
+from sqlalchemy import event, insert, inspect, text, update
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, NoResultFound
 
 # Attempt to import SessionLocal and Base
 try:
-    from backend.database.engine import SessionLocal
-    from backend.database.models import Base # Assuming Base is defined here
+    from backend.database.engine import SessionLocal, AsyncSessionLocal, replica_engines, async_replica_engines
+    from backend.database.db import Base
 except ImportError:
     # Adjust relative path if needed for different execution contexts
-    from .engine import SessionLocal
-    from .models import Base
+    from .engine import SessionLocal, AsyncSessionLocal, replica_engines, async_replica_engines
+    from .db import Base
 
 # Attempt to import custom exceptions
 try:
     from backend.utils.exceptions import DatabaseError, JivaPayException
+    from backend.utils.redis_client import get_redis_client, get_async_redis_client
+    from backend.utils import metrics
 except ImportError:
     from ..utils.exceptions import DatabaseError, JivaPayException # Adjust relative path
+    from ..utils.redis_client import get_redis_client, get_async_redis_client
+    from ..utils import metrics
 
 logger = logging.getLogger(__name__) # Use standard logging
 
@@ -43,6 +58,317 @@ def get_db_session() -> Generator[Session, None, None]:
         logger.debug(f"DB Session {id(db)} closed.")
         db.close()
 
+def get_db() -> Generator[Session, None, None]:
+    """FastAPI dependency providing the request's primary Session.
+
+    FastAPI resolves a dependency once per request, so the auth dependencies
+    (`security.get_current_user`, `get_current_active_merchant`/`_trader`/
+    `_support`) and the endpoint all share this Session - the principal stays
+    attached to it and the request holds a single pool connection until the
+    first commit. Use `get_db_session()` outside of requests.
+
+    Yields:
+        A SQLAlchemy Session object.
+    Ensures:
+        The session is closed after the request (uncommitted work is rolled back).
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency providing an AsyncSession on the asyncpg engine.
+
+    Yields:
+        A SQLAlchemy AsyncSession object.
+    Ensures:
+        The session is closed after the request (uncommitted work is rolled back).
+    """
+    async with AsyncSessionLocal() as db:
+        logger.debug(f"Async DB Session {id(db)} opened.")
+        try:
+            yield db
+        finally:
+            logger.debug(f"Async DB Session {id(db)} closed.")
+
+# --- Read replica routing --- #
+#
+# Read-only endpoints opt in with `Depends(get_read_db_session)` (or the async
+# variant). Their session is bound to a replica whose replication lag is within
+# REPLICA_MAX_LAG_SECONDS; otherwise, and for clients that committed a write in
+# the last READ_YOUR_WRITES_SECONDS, it is bound to the primary as usual.
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_LAG_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL_SECONDS", "5"))
+# Should exceed the usual replication lag, so a client sees its own writes
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+_RECENT_WRITE_PREFIX = "db_recent_write:"
+
+# 0 when the replica has replayed everything it received (an idle primary is not lag)
+_REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+# Hash of the caller's credential, bound per request by ReadYourWritesMiddleware
+_client_key: ContextVar[Optional[str]] = ContextVar("db_client_key", default=None)
+_recent_writes: TTLCache = TTLCache(maxsize=100_000, ttl=READ_YOUR_WRITES_SECONDS)
+
+
+def bind_client_key(credential: Optional[str]) -> Token:
+    """Binds the current request to a client for read-your-writes tracking."""
+    key = hashlib.sha256(credential.encode("utf-8")).hexdigest()[:32] if credential else None
+    return _client_key.set(key)
+
+
+def reset_client_key(token: Token) -> None:
+    _client_key.reset(token)
+
+
+def call_off_loop(fn: Callable[..., Any], *args: Any) -> None:
+    """Calls `fn(*args)` now, or in the default executor when on an event loop thread.
+
+    Meant for blocking I/O in session hooks: `after_commit` of an AsyncSession
+    runs on the loop thread, where a sync Redis call would stall every request.
+    `fn` must handle its own errors; its result is discarded.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        fn(*args)
+        return
+    loop.run_in_executor(None, fn, *args)
+
+
+def _mark_recent_write() -> None:
+    key = _client_key.get()
+    if key is None:
+        return
+    _recent_writes[key] = True
+    # The key is read here: context variables do not follow the call into the executor
+    call_off_loop(_share_recent_write, key)
+
+
+def _share_recent_write(key: str) -> None:
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        # Shared, so other API processes also route this client to the primary
+        client.set(_RECENT_WRITE_PREFIX + key, 1, ex=max(1, int(READ_YOUR_WRITES_SECONDS)))
+    except RedisError as e:
+        logger.warning(f"Failed to record recent write for read-your-writes: {e}")
+
+
+def _has_recent_write(key: Optional[str]) -> bool:
+    if key is None:
+        return False
+    if key in _recent_writes:
+        return True
+    client = get_redis_client()
+    if client is None:
+        return False
+    try:
+        return bool(client.exists(_RECENT_WRITE_PREFIX + key))
+    except RedisError:
+        # Cannot tell: the primary is always correct
+        return True
+
+
+async def _has_recent_write_async(key: Optional[str]) -> bool:
+    """`_has_recent_write` for the event loop: the shared check goes through the asyncio client."""
+    if key is None:
+        return False
+    if key in _recent_writes:
+        return True
+    client = get_async_redis_client()
+    if client is None:
+        return False
+    try:
+        return bool(await client.exists(_RECENT_WRITE_PREFIX + key))
+    except (RedisError, OSError):
+        return True
+
+
+# Statement-level writes (INSERT/UPDATE ... RETURNING, see CRUD functions below) bypass the unit of work, so
+# flush listeners never see them. Listeners registered here get the written objects instead:
+# listener(session, objects, changed_keys), changed_keys is None for inserts.
+BulkWriteListener = Callable[[Session, List[Any], Optional[FrozenSet[str]]], None]
+_bulk_write_listeners: List[BulkWriteListener] = []
+
+
+def register_bulk_write_listener(listener: BulkWriteListener) -> None:
+    """Registers a callback for objects written by `create_objects_bulk` / `update_where`."""
+    _bulk_write_listeners.append(listener)
+
+
+def _notify_bulk_write(db: Session, objects: List[Any], changed: Optional[FrozenSet[str]]) -> None:
+    for listener in _bulk_write_listeners:
+        try:
+            listener(db, objects, changed)
+        except Exception as e:
+            logger.error(f"Bulk write listener {listener} failed: {e}", exc_info=True)
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_replica_writes(session: Session, flush_context, instances) -> None:
+    if session.info.get("replica") and (session.new or session.dirty or session.deleted):
+        raise DatabaseError("Attempted to write through a read-replica session.")
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_primary_write(session: Session, flush_context) -> None:
+    if not session.info.get("replica"):
+        session.info["has_writes"] = True
+
+
+def _flag_primary_bulk_write(session: Session, objects, changed) -> None:
+    if objects and not session.info.get("replica"):
+        session.info["has_writes"] = True
+
+
+register_bulk_write_listener(_flag_primary_bulk_write)
+
+
+@event.listens_for(Session, "after_commit")
+def _record_primary_write(session: Session) -> None:
+    if session.info.pop("has_writes", False):
+        _mark_recent_write()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_primary_write(session: Session) -> None:
+    session.info.pop("has_writes", None)
+
+
+class ReplicaRouter:
+    """Picks a replica whose last measured lag is within bounds (round robin).
+
+    Lag is measured at most every REPLICA_LAG_CHECK_INTERVAL_SECONDS per replica;
+    a replica that cannot be checked is skipped until the next check.
+    """
+
+    def __init__(self, sync_engines: List[Any], async_engines: List[Any]):
+        self.sync_engines = sync_engines
+        self.async_engines = async_engines
+        self._lag: List[Optional[float]] = [None] * len(sync_engines)
+        self._checked_at: List[float] = [0.0] * len(sync_engines)
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.sync_engines)
+
+    def _due_for_check(self) -> List[int]:
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for i, checked_at in enumerate(self._checked_at):
+                if now - checked_at >= REPLICA_LAG_CHECK_INTERVAL_SECONDS:
+                    # Claim the check so concurrent requests do not repeat it
+                    self._checked_at[i] = now
+                    due.append(i)
+        return due
+
+    def _record_lag(self, index: int, lag: Optional[float]) -> None:
+        self._lag[index] = lag
+        if lag is not None:
+            metrics.set_gauge("db_replica_lag_seconds", lag, replica=index)
+
+    def _choose(self) -> Optional[int]:
+        healthy = [i for i, lag in enumerate(self._lag) if lag is not None and lag <= REPLICA_MAX_LAG_SECONDS]
+        if not healthy:
+            metrics.increment("db_read_routing_total", target="primary", reason="replica_lag")
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def pick_sync(self) -> Optional[Any]:
+        """Returns a replica sync engine, or None to use the primary."""
+        for i in self._due_for_check():
+            try:
+                with self.sync_engines[i].connect() as conn:
+                    self._record_lag(i, float(conn.execute(_REPLICA_LAG_QUERY).scalar()))
+            except SQLAlchemyError as e:
+                logger.warning(f"Replica {i} lag check failed: {e}")
+                self._record_lag(i, None)
+        index = self._choose()
+        return self.sync_engines[index] if index is not None else None
+
+    async def pick_async(self) -> Optional[Any]:
+        """Returns a replica async engine, or None to use the primary."""
+        for i in self._due_for_check():
+            try:
+                async with self.async_engines[i].connect() as conn:
+                    self._record_lag(i, float((await conn.execute(_REPLICA_LAG_QUERY)).scalar()))
+            except SQLAlchemyError as e:
+                logger.warning(f"Replica {i} lag check failed: {e}")
+                self._record_lag(i, None)
+        index = self._choose()
+        return self.async_engines[index] if index is not None else None
+
+
+replica_router = ReplicaRouter(replica_engines, async_replica_engines)
+
+
+def _mark_replica_session(db: Session | AsyncSession) -> None:
+    db.info["replica"] = True
+    # Data read here may be this old; status caches stamp it accordingly
+    db.info["max_staleness"] = REPLICA_MAX_LAG_SECONDS
+
+
+def _use_replica() -> bool:
+    if not replica_router:
+        return False
+    if _has_recent_write(_client_key.get()):
+        metrics.increment("db_read_routing_total", target="primary", reason="recent_write")
+        return False
+    return True
+
+
+async def _use_replica_async() -> bool:
+    if not replica_router:
+        return False
+    if await _has_recent_write_async(_client_key.get()):
+        metrics.increment("db_read_routing_total", target="primary", reason="recent_write")
+        return False
+    return True
+
+
+def get_read_db_session() -> Generator[Session, None, None]:
+    """FastAPI dependency for read-only endpoints: a replica session when safe, else the primary.
+
+    Yields:
+        A SQLAlchemy Session; flushing changes through a replica session raises DatabaseError.
+    """
+    replica = replica_router.pick_sync() if _use_replica() else None
+    db = SessionLocal(bind=replica) if replica is not None else SessionLocal()
+    if replica is not None:
+        _mark_replica_session(db)
+        metrics.increment("db_read_routing_total", target="replica", reason="ok")
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def open_async_read_session() -> AsyncSession:
+    """Async counterpart of `get_read_db_session` for code outside dependencies."""
+    replica = await replica_router.pick_async() if await _use_replica_async() else None
+    db = AsyncSessionLocal(bind=replica) if replica is not None else AsyncSessionLocal()
+    if replica is not None:
+        _mark_replica_session(db)
+        metrics.increment("db_read_routing_total", target="replica", reason="ok")
+    return db
+
+
+async def get_async_read_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency: async read-only session (replica when safe)."""
+    async with await open_async_read_session() as db:
+        yield db
+
 @contextmanager
 def atomic_transaction(db_session: Session) -> Generator[None, None, None]:
     """Provides a context manager for atomic database transactions.
@@ -104,34 +430,130 @@ def atomic_transaction(db_session: Session) -> Generator[None, None, None]:
 
 # --- Basic CRUD Functions --- #
 
-def create_object(db: Session, model: Type[ModelType], data: Dict[str, Any]) -> ModelType:
-    """Creates and saves a new object in the database.
+def _insert_returning(model: Type[ModelType]):
+    # sort_by_parameter_order keeps RETURNING rows aligned with the input rows
+    return insert(model).returning(model, sort_by_parameter_order=True)
+
+
+def create_objects_bulk(db: Session, model: Type[ModelType], rows: List[Dict[str, Any]]) -> List[ModelType]:
+    """Inserts one or many rows with a single INSERT ... RETURNING and returns the persistent objects.
+
+    Multi-row inserts are batched by the dialect (insertmanyvalues), so N rows
+    cost one round trip per batch instead of a flush and a refresh per object.
+    The returned objects carry every column, including server defaults.
 
     Args:
         db: The SQLAlchemy session.
         model: The SQLAlchemy model class.
-        data: A dictionary containing the object's data.
+        rows: Column values per row (columns only, no relationships).
 
     Returns:
-        The newly created object.
+        The created objects, in the order of `rows`.
 
     Raises:
         DatabaseError: If an IntegrityError or other SQLAlchemyError occurs.
     """
+    if not rows:
+        return []
     try:
-        obj = model(**data)
-        db.add(obj)
-        db.flush() # Flush to catch potential errors like IntegrityError early
-        db.refresh(obj) # Refresh to get DB-generated values like IDs
-        logger.info(f"Created {model.__name__} object with PK: {getattr(obj, 'id', 'N/A')}") # Assumes 'id' pk
-        return obj
+        objects = list(db.scalars(_insert_returning(model), rows))
+        _notify_bulk_write(db, objects, None)
+        logger.info(f"Created {len(objects)} {model.__name__} object(s), first PK: {getattr(objects[0], 'id', 'N/A')}")
+        return objects
     except IntegrityError as e:
-        logger.warning(f"Failed to create {model.__name__}: Integrity constraint violated. Data: {data}. Error: {e}")
+        logger.warning(f"Failed to create {model.__name__}: Integrity constraint violated. Rows: {len(rows)}. Error: {e}")
         raise DatabaseError(f"Could not create {model.__name__}, data conflict: {e}") from e
     except SQLAlchemyError as e:
-        logger.error(f"Failed to create {model.__name__}. Data: {data}. Error: {e}", exc_info=True)
+        logger.error(f"Failed to create {len(rows)} {model.__name__} row(s). Error: {e}", exc_info=True)
         raise DatabaseError(f"Database error while creating {model.__name__}: {e}") from e
 
+
+async def create_objects_bulk_async(db: AsyncSession, model: Type[ModelType], rows: List[Dict[str, Any]]) -> List[ModelType]:
+    """Async variant of `create_objects_bulk`."""
+    if not rows:
+        return []
+    try:
+        objects = list(await db.scalars(_insert_returning(model), rows))
+        _notify_bulk_write(db.sync_session, objects, None)
+        logger.info(f"Created {len(objects)} {model.__name__} object(s), first PK: {getattr(objects[0], 'id', 'N/A')}")
+        return objects
+    except IntegrityError as e:
+        logger.warning(f"Failed to create {model.__name__}: Integrity constraint violated. Rows: {len(rows)}. Error: {e}")
+        raise DatabaseError(f"Could not create {model.__name__}, data conflict: {e}") from e
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to create {len(rows)} {model.__name__} row(s). Error: {e}", exc_info=True)
+        raise DatabaseError(f"Database error while creating {model.__name__}: {e}") from e
+
+
+def update_where(
+    db: Session,
+    model: Type[ModelType],
+    values: Dict[str, Any],
+    *criteria: Any,
+    **filters: Any
+) -> List[ModelType]:
+    """Updates all matching rows with a single UPDATE ... RETURNING.
+
+    Objects of the updated rows already present in the session are refreshed
+    from the returned values; others are loaded from them, so no extra SELECT
+    is issued. Values may be SQL expressions (e.g. `Model.counter + 1`).
+    Pending ORM changes are flushed first so they are not overwritten.
+
+    Args:
+        db: The SQLAlchemy session.
+        model: The SQLAlchemy model class.
+        values: Column values to set.
+        *criteria: WHERE clauses (e.g. `Model.status == 'pending'`).
+        **filters: Equality filters by attribute name.
+
+    Returns:
+        The updated objects (empty if nothing matched).
+
+    Raises:
+        DatabaseError: If an IntegrityError or other SQLAlchemyError occurs.
+    """
+    statement = (
+        update(model)
+        .where(*criteria)
+        .filter_by(**filters)
+        .values(**values)
+        .returning(model)
+        .execution_options(populate_existing=True, synchronize_session=False)
+    )
+    try:
+        db.flush()
+        objects = list(db.scalars(statement))
+        if objects:
+            _notify_bulk_write(db, objects, frozenset(values))
+        logger.info(f"Updated {len(objects)} {model.__name__} object(s). Fields: {sorted(values)}")
+        return objects
+    except IntegrityError as e:
+        logger.warning(f"Failed to update {model.__name__}: Integrity constraint violated. Data: {values}. Error: {e}")
+        raise DatabaseError(f"Could not update {model.__name__}, data conflict: {e}") from e
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to update {model.__name__}. Data: {values}. Error: {e}", exc_info=True)
+        raise DatabaseError(f"Database error while updating {model.__name__}: {e}") from e
+
+
+def create_object(db: Session, model: Type[ModelType], data: Dict[str, Any]) -> ModelType:
+    """Creates and saves a new object in the database.
+
+    Issues one INSERT ... RETURNING (see `create_objects_bulk`), which also
+    returns DB-generated values like IDs and server defaults.
+
+    Args:
+        db: The SQLAlchemy session.
+        model: The SQLAlchemy model class.
+        data: A dictionary containing the object's data.
+
+    Returns:
+        The newly created object.
+
+    Raises:
+        DatabaseError: If an IntegrityError or other SQLAlchemyError occurs.
+    """
+    return create_objects_bulk(db, model, [data])[0]
+
 def get_object_or_none(db: Session, model: Type[ModelType], **kwargs) -> Optional[ModelType]:
     """Retrieves an object by its attributes or returns None if not found.
 
@@ -165,6 +587,10 @@ def get_object_or_none(db: Session, model: Type[ModelType], **kwargs) -> Optiona
 def update_object_db(db: Session, obj: ModelType, data: Dict[str, Any]) -> ModelType:
     """Updates an existing database object with new data.
 
+    Persistent objects are updated with one UPDATE ... RETURNING by primary key
+    (see `update_where`); the full table key is used, so partitioned tables are
+    pruned to a single partition. Transient/detached objects fall back to a flush.
+
     Args:
         db: The SQLAlchemy session.
         obj: The SQLAlchemy object instance to update.
@@ -174,30 +600,46 @@ def update_object_db(db: Session, obj: ModelType, data: Dict[str, Any]) -> Model
         The updated object.
 
     Raises:
-        DatabaseError: If an IntegrityError or other SQLAlchemyError occurs.
+        DatabaseError: If an IntegrityError or other SQLAlchemyError occurs, or the row no longer exists.
     """
-    try:
-        pk_name = obj.__mapper__.primary_key[0].name # Get primary key column name
-        pk_value = getattr(obj, pk_name, 'N/A')
-        logger.debug(f"Attempting to update {obj.__class__.__name__} with PK {pk_value}. Data: {data}")
+    model = type(obj)
+    mapper = inspect(model)
+    pk_value = getattr(obj, mapper.primary_key[0].key, 'N/A')
+    logger.debug(f"Attempting to update {model.__name__} with PK {pk_value}. Data: {data}")
+
+    values = {}
+    for key, value in data.items():
+        if hasattr(obj, key):
+            values[key] = value
+        else:
+            logger.warning(f"Attribute '{key}' not found on {model.__name__} during update. Skipping.")
 
-        for key, value in data.items():
-            if hasattr(obj, key):
-                setattr(obj, key, value)
-            else:
-                logger.warning(f"Attribute '{key}' not found on {obj.__class__.__name__} during update. Skipping.")
+    state = inspect(obj)
+    if state.persistent and state.session is db:
+        if not values:
+            return obj
+        key_criteria = [
+            column == getattr(obj, mapper.get_property_by_column(column).key)
+            for column in mapper.local_table.primary_key.columns
+        ]
+        updated = update_where(db, model, values, *key_criteria)
+        if not updated:
+            raise DatabaseError(f"Could not update {model.__name__} (PK: {pk_value}): row no longer exists.")
+        return updated[0]
 
+    try:
+        for key, value in values.items():
+            setattr(obj, key, value)
         db.add(obj) # Add the modified object back to the session (important if it was detached)
         db.flush()  # Flush to catch potential errors
-        db.refresh(obj) # Refresh to get any DB-level changes
-        logger.info(f"Updated {obj.__class__.__name__} object with PK: {pk_value}")
+        logger.info(f"Updated {model.__name__} object with PK: {pk_value}")
         return obj
     except IntegrityError as e:
-        logger.warning(f"Failed to update {obj.__class__.__name__} (PK: {pk_value}): Integrity constraint violated. Data: {data}. Error: {e}")
-        raise DatabaseError(f"Could not update {obj.__class__.__name__}, data conflict: {e}") from e
+        logger.warning(f"Failed to update {model.__name__} (PK: {pk_value}): Integrity constraint violated. Data: {data}. Error: {e}")
+        raise DatabaseError(f"Could not update {model.__name__}, data conflict: {e}") from e
     except SQLAlchemyError as e:
-        logger.error(f"Failed to update {obj.__class__.__name__} (PK: {pk_value}). Data: {data}. Error: {e}", exc_info=True)
-        raise DatabaseError(f"Database error while updating {obj.__class__.__name__}: {e}") from e
+        logger.error(f"Failed to update {model.__name__} (PK: {pk_value}). Data: {data}. Error: {e}", exc_info=True)
+        raise DatabaseError(f"Database error while updating {model.__name__}: {e}") from e
 
 # Add more specific CRUD or query functions as needed, e.g.:
 # def get_active_users(db: Session) -> List[User]: ... 
\ No newline at end of file
@@ -0,0 +1,39 @@
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from backend.config.settings import settings
+from backend.database.query_stats import report, start_tracking, stop_tracking
+
+
+def _endpoint_name(request: Request) -> str:
+    endpoint = request.scope.get("endpoint")
+    return getattr(endpoint, "__name__", None) or "unmatched"
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    """Counts the SQL statements and DB time of each request.
+
+    Totals and N+1 suspects go to metrics/logs (database/query_stats.py). With
+    DEBUG enabled they are also returned as X-DB-* response headers.
+    """
+    async def dispatch(self, request: Request, call_next):
+        stats, token = start_tracking("request")
+        try:
+            response: Response = await call_next(request)
+        finally:
+            stop_tracking(token)
+        # Endpoint is resolved by the router during call_next
+        stats.name = _endpoint_name(request)
+        report(stats, kind="http")
+        if settings.DEBUG:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+            response.headers["X-DB-Time-Ms"] = f"{stats.total_seconds * 1000:.1f}"
+            response.headers["X-DB-Checkouts"] = str(stats.checkouts)
+            slowest = stats.slowest
+            if slowest:
+                response.headers["X-DB-Slowest-Ms"] = f"{slowest[0][0] * 1000:.1f}"
+            repeated = stats.repeated()
+            if repeated:
+                response.headers["X-DB-Repeated"] = str(max(repeated.values()))
+        return response
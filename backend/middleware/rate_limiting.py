@@ -10,8 +10,7 @@ from slowapi.middleware import SlowAPIMiddleware
 from slowapi.extension import RateLimitExceeded  # Re-export for clarity in main.py
 from starlette.requests import Request
 from starlette.responses import JSONResponse
-from backend.database.utils import get_db_session
-from backend.utils.config_loader import get_typed_config_value
+from backend.utils.config_loader import get_setting
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +30,9 @@ else:
 
 # Read default rate limit from DB configuration
 def get_default_rate_limit() -> str:
-    """Fetch the default rate limit from DB (RATE_LIMIT_DEFAULT key)."""
-    with get_db_session() as db:
-        # default format: "100/minute"
-        limit = get_typed_config_value("RATE_LIMIT_DEFAULT", db, str, default="100/minute")
-    return limit
+    """Fetch the default rate limit from the config snapshot (RATE_LIMIT_DEFAULT key)."""
+    # default format: "100/minute"
+    return get_setting("RATE_LIMIT_DEFAULT")
 
 # Configure limiter without default_limits, use get_limiter instead
 # limiter = Limiter(key_func=get_remote_address, storage_uri=storage_uri)
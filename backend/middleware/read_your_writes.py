@@ -0,0 +1,18 @@
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from backend.database.utils import bind_client_key, reset_client_key
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """Binds each request to its caller (bearer token or gateway API key).
+
+    A client that just committed a write is routed to the primary by the
+    read-only DB dependencies until replicas have caught up.
+    """
+    async def dispatch(self, request: Request, call_next):
+        token = bind_client_key(request.headers.get("Authorization") or request.headers.get("X-API-KEY"))
+        try:
+            return await call_next(request)
+        finally:
+            reset_client_key(token)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for merchant callback delivery.
+
+Starts the local merchant simulator in-process, drives the production delivery
+path `callback_service.send_merchant_callback` (payload building, signing and
+POST) against it at a fixed target rate (open loop) and reports delivery
+latency percentiles, retries and throughput. Orders and the store are transient
+ORM objects, so no database (or DATABASE_URL) and no external network is needed.
+
+Usage:
+    python -m backend.scripts.callback_benchmark --rate 200 --duration 30 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List, Optional
+
+import httpx
+import uvicorn
+
+from backend.database.db import FiatCurrency, IncomingOrder, MerchantStore
+from backend.services import callback_service
+from backend.utils.exceptions import NotificationError
+from backend.scripts.merchant_simulator import create_simulator_app, add_simulator_arguments, config_from_args
+
+logger = logging.getLogger(__name__)
+
+BENCH_SECRET_KEY = "benchmark-secret"
+
+
+@dataclass
+class DeliveryResult:
+    order_id: int
+    delivered: bool
+    attempts: int
+    latency_s: float                  # From scheduled send time to final outcome
+    attempt_latencies_s: List[float] = field(default_factory=list)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; returns None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _build_store() -> MerchantStore:
+    return MerchantStore(id=1, secret_key=BENCH_SECRET_KEY)
+
+
+def _build_order(order_id: int, callback_url: str, fiat: FiatCurrency) -> IncomingOrder:
+    """Transient IncomingOrder carrying every field the callback payload reads."""
+    return IncomingOrder(
+        id=order_id,
+        client_id=f"bench-{order_id}",
+        status="completed",
+        amount_fiat=Decimal("1000.00"),
+        fiat_currency=fiat,
+        customer_id=f"bench-customer-{order_id % 100}",
+        callback_url=callback_url,
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+async def _deliver(
+    order_id: int,
+    callback_url: str,
+    store: MerchantStore,
+    fiat: FiatCurrency,
+    client: httpx.AsyncClient,
+    scheduled_at: float,
+    max_retries: int,
+    retry_delay: float,
+) -> DeliveryResult:
+    """Sends one callback, retrying failed attempts up to `max_retries` times."""
+    result = DeliveryResult(order_id=order_id, delivered=False, attempts=0, latency_s=0.0)
+    order = _build_order(order_id, callback_url, fiat)
+    for attempt in range(max_retries + 1):
+        result.attempts += 1
+        attempt_start = time.perf_counter()
+        try:
+            await callback_service.send_merchant_callback(order, store, client=client)
+            result.attempt_latencies_s.append(time.perf_counter() - attempt_start)
+            result.delivered = True
+            break
+        except NotificationError:
+            result.attempt_latencies_s.append(time.perf_counter() - attempt_start)
+            if attempt < max_retries:
+                # Same exponential backoff shape as the worker retries, scaled down for the benchmark
+                await asyncio.sleep(retry_delay * (2 ** attempt))
+    result.latency_s = time.perf_counter() - scheduled_at
+    return result
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    sim_app = create_simulator_app(config_from_args(args, secret_key=BENCH_SECRET_KEY))
+    server = uvicorn.Server(uvicorn.Config(sim_app, host="127.0.0.1", port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    callback_url = f"http://127.0.0.1:{args.port}/callback"
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    total = int(args.rate * args.duration)
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    store = _build_store()
+    fiat = FiatCurrency(id=1, currency_code="RUB", currency_name="Russian ruble")
+    results: List[DeliveryResult] = []
+
+    async def scheduled_delivery(order_id: int, scheduled_at: float):
+        async with in_flight:
+            results.append(await _deliver(
+                order_id, callback_url, store, fiat, client, scheduled_at, args.max_retries, args.retry_delay,
+            ))
+
+    async with httpx.AsyncClient(timeout=args.callback_timeout, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled_at = start + i / args.rate
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(scheduled_delivery(i + 1, scheduled_at)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    server.should_exit = True
+    await server_task
+
+    delivered = [r for r in results if r.delivered]
+    latencies_ms = [r.latency_s * 1000 for r in delivered]
+    attempt_ms = [a * 1000 for r in results for a in r.attempt_latencies_s]
+    stats = sim_app.state.stats
+    return {
+        "target_rate": args.rate,
+        "scheduled": total,
+        "delivered": len(delivered),
+        "failed": len(results) - len(delivered),
+        "retries": sum(r.attempts - 1 for r in results),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(delivered) / elapsed, 2) if elapsed else None,
+        "delivery_p50_ms": _round(percentile(latencies_ms, 50)),
+        "delivery_p99_ms": _round(percentile(latencies_ms, 99)),
+        "attempt_p50_ms": _round(percentile(attempt_ms, 50)),
+        "attempt_p99_ms": _round(percentile(attempt_ms, 99)),
+        "merchant_received": stats.received,
+        "merchant_errors": stats.errored,
+        "merchant_hung": stats.hung,
+        "merchant_bad_signature": stats.bad_signature,
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merchant callback delivery against a local simulator.")
+    parser.add_argument("--rate", type=float, default=100.0, help="Target callbacks per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Benchmark duration in seconds")
+    parser.add_argument("--port", type=int, default=9100, help="Port for the in-process merchant simulator")
+    parser.add_argument("--callback-timeout", type=float, default=callback_service.CALLBACK_TIMEOUT_SECONDS,
+                        help="Per-attempt HTTP timeout in seconds")
+    parser.add_argument("--max-retries", type=int, default=callback_service.CALLBACK_MAX_RETRIES,
+                        help="Retries per callback after the first attempt")
+    parser.add_argument("--retry-delay", type=float, default=0.1,
+                        help="Base retry delay in seconds (production uses CALLBACK_RETRY_DELAY)")
+    parser.add_argument("--max-connections", type=int, default=100, help="HTTP connection pool size")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Cap on concurrently running deliveries")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    add_simulator_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # Per-callback INFO/ERROR lines would dominate the run time at high rates
+    logging.getLogger(callback_service.__name__).setLevel(logging.CRITICAL)
+
+    report = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the sync (psycopg2 + threadpool) and async (asyncpg) gateway stacks.
+
+Serves the gateway order-status path twice, once through `get_order_status` in
+a `def` handler (runs on Starlette's threadpool) and once through
+`get_order_status_async` in an `async def` handler, and drives both with the
+same number of concurrent clients. `--db-latency-ms` adds a `pg_sleep` per
+request to model slow queries / slow clients holding a request open, which is
+where the threadpool becomes the bottleneck.
+
+Needs a reachable PostgreSQL configured through POSTGRES_* (see database/engine.py);
+the schema does not need any rows, unknown identifiers exercise the same queries.
+
+Usage:
+    python -m backend.scripts.gateway_benchmark --concurrency 200 --requests 2000 --db-latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+import anyio
+import httpx
+import uvicorn
+from fastapi import FastAPI, Depends, HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from backend.database.engine import SQLALCHEMY_DATABASE_URL, ASYNC_SQLALCHEMY_DATABASE_URL
+from backend.services.gateway_service import get_order_status, get_order_status_async
+from backend.utils.exceptions import JivaPayException
+from backend.scripts.callback_benchmark import percentile
+
+logger = logging.getLogger(__name__)
+
+
+def create_sync_app(args: argparse.Namespace) -> FastAPI:
+    """Gateway status endpoint on the blocking engine (as before the async stack)."""
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_size=args.pool_size, max_overflow=0)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    app = FastAPI()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/status/{order_identifier}")
+    def read_status(order_identifier: str, db: Session = Depends(get_db)):
+        if args.db_latency_ms:
+            db.execute(text("SELECT pg_sleep(:s)"), {"s": args.db_latency_ms / 1000})
+        try:
+            return {"id": get_order_status(order_identifier, db).id}
+        except JivaPayException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    app.state.dispose = engine.dispose
+    return app
+
+
+def create_async_app(args: argparse.Namespace) -> FastAPI:
+    """Gateway status endpoint on the asyncpg engine."""
+    engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=args.pool_size, max_overflow=0)
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    app = FastAPI()
+
+    async def get_db():
+        async with session_factory() as db:
+            yield db
+
+    @app.get("/status/{order_identifier}")
+    async def read_status(order_identifier: str, db: AsyncSession = Depends(get_db)):
+        if args.db_latency_ms:
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": args.db_latency_ms / 1000})
+        try:
+            return {"id": (await get_order_status_async(order_identifier, db)).id}
+        except JivaPayException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    async def dispose():
+        await engine.dispose()
+
+    app.state.dispose = dispose
+    return app
+
+
+async def _run_load(base_url: str, args: argparse.Namespace) -> Dict[str, Optional[float]]:
+    latencies_ms: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(f"bench-{i}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    identifier = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f"/status/{identifier}")
+                    # Unknown identifiers are expected to answer 404
+                    if response.status_code not in (200, 404):
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "completed": len(latencies_ms),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies_ms) / elapsed, 2) if elapsed else None,
+        "p50_ms": _round(percentile(latencies_ms, 50)),
+        "p99_ms": _round(percentile(latencies_ms, 99)),
+    }
+
+
+async def _bench_stack(name: str, app: FastAPI, args: argparse.Namespace) -> Dict[str, Optional[float]]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    # Same threadpool size for both runs; only the sync stack actually uses it
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threadpool_size
+    try:
+        report = await _run_load(f"http://127.0.0.1:{args.port}", args)
+    finally:
+        server.should_exit = True
+        await server_task
+        dispose = app.state.dispose
+        if asyncio.iscoroutinefunction(dispose):
+            await dispose()
+        else:
+            dispose()
+    report["stack"] = name
+    return report
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[dict]:
+    results = []
+    if args.stack in ("sync", "both"):
+        results.append(await _bench_stack("sync", create_sync_app(args), args))
+    if args.stack in ("async", "both"):
+        results.append(await _bench_stack("async", create_async_app(args), args))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync and async gateway stacks under concurrent load.")
+    parser.add_argument("--stack", choices=("sync", "async", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests per stack")
+    parser.add_argument("--concurrency", type=int, default=200, help="Concurrent clients")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Extra pg_sleep per request")
+    parser.add_argument("--pool-size", type=int, default=50, help="DB connection pool size for both stacks")
+    parser.add_argument("--threadpool-size", type=int, default=40, help="Starlette threadpool size (default 40)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client timeout in seconds")
+    parser.add_argument("--port", type=int, default=9200, help="Port for the in-process server")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for report in results:
+            print(f"--- {report.pop('stack')} ---")
+            for key, value in report.items():
+                print(f"{key:>18}: {value}")
+
+
+if __name__ == "__main__":
+    main()
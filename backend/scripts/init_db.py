@@ -7,6 +7,7 @@ Usage:
 
 from backend.database.engine import engine
 from backend.database.db import Base
+from backend.database.partitioning import ensure_partitions
 import logging
 
 
@@ -15,6 +16,8 @@ def init_db():
     logger = logging.getLogger(__name__)
     logger.info("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_partitions(connection)
     logger.info("Database initialization complete.")
 
 
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a merchant callback endpoint.
+
+Accepts JivaPay callbacks on POST /callback and answers them with configurable
+latency, error rate and hanging (timed-out) responses, so callback delivery can
+be exercised without real merchants or network access.
+
+Usage:
+    python -m backend.scripts.merchant_simulator --port 9100 --latency-ms 50 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any
+
+import uvicorn
+from fastapi import FastAPI, Request, Response, status
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour of the simulated merchant endpoint."""
+    latency_ms: float = 20.0          # Base response latency
+    jitter_ms: float = 5.0            # Uniform +/- jitter applied to latency
+    error_rate: float = 0.0           # Share of requests answered with HTTP 500
+    timeout_rate: float = 0.0         # Share of requests that hang for `hang_seconds`
+    hang_seconds: float = 30.0        # How long a "timed out" request hangs
+    secret_key: Optional[str] = None  # If set, X-JivaPay-Signature is verified
+    seed: Optional[int] = None        # Seed for reproducible error/timeout patterns
+
+
+@dataclass
+class SimulatorStats:
+    """Counters collected by the simulated endpoint."""
+    received: int = 0
+    succeeded: int = 0
+    errored: int = 0
+    hung: int = 0
+    bad_signature: int = 0
+    by_order: Dict[str, int] = field(default_factory=dict)
+
+
+def create_simulator_app(config: SimulatorConfig) -> FastAPI:
+    """Builds the FastAPI app that plays the role of a merchant server."""
+    app = FastAPI(title="Merchant Callback Simulator")
+    stats = SimulatorStats()
+    rng = random.Random(config.seed)
+    app.state.config = config
+    app.state.stats = stats
+
+    if config.secret_key:
+        # Imported lazily so the simulator itself stays usable without backend settings
+        from backend.services.callback_service import _generate_signature
+    else:
+        _generate_signature = None
+
+    @app.post("/callback")
+    async def receive_callback(request: Request) -> Response:
+        payload: Dict[str, Any] = await request.json()
+        stats.received += 1
+        order_key = str(payload.get("order_id") or payload.get("incoming_order_id"))
+        stats.by_order[order_key] = stats.by_order.get(order_key, 0) + 1
+
+        if _generate_signature is not None:
+            expected = _generate_signature(payload, config.secret_key)
+            if request.headers.get("X-JivaPay-Signature") != expected:
+                stats.bad_signature += 1
+                return Response(status_code=status.HTTP_401_UNAUTHORIZED)
+
+        roll = rng.random()
+        if roll < config.timeout_rate:
+            stats.hung += 1
+            await asyncio.sleep(config.hang_seconds)
+            return Response(status_code=status.HTTP_504_GATEWAY_TIMEOUT)
+
+        delay_ms = max(0.0, config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms))
+        await asyncio.sleep(delay_ms / 1000)
+
+        if roll < config.timeout_rate + config.error_rate:
+            stats.errored += 1
+            return Response(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        stats.succeeded += 1
+        return Response(status_code=status.HTTP_200_OK)
+
+    @app.get("/stats")
+    async def read_stats() -> Dict[str, Any]:
+        data = asdict(stats)
+        data.pop("by_order")
+        data["unique_orders"] = len(stats.by_order)
+        return data
+
+    return app
+
+
+def add_simulator_arguments(parser: argparse.ArgumentParser) -> None:
+    """Registers the simulator options on a CLI parser (shared with the benchmark)."""
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Base merchant response latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Uniform latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of HTTP 500 responses (0..1)")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Share of hanging responses (0..1)")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="Duration of a hanging response")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+
+
+def config_from_args(args: argparse.Namespace, secret_key: Optional[str] = None) -> SimulatorConfig:
+    return SimulatorConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang_seconds,
+        secret_key=secret_key,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local merchant callback endpoint simulator.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--secret-key", default=None, help="Verify callback signatures with this secret")
+    add_simulator_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    app = create_simulator_app(config_from_args(args, secret_key=args.secret_key))
+    logger.info(f"Merchant simulator listening on http://{args.host}:{args.port}/callback")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,11 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
 from backend.config.settings import settings
-from backend.database.utils import get_db_session
+from backend.database.utils import get_db
 from backend.database.db import User
+from backend.services.principal_cache import Principal, get_principal
 
 # OAuth2 scheme for bearer token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/merchant/auth/token")
@@ -27,25 +29,51 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    username: Optional[str] = payload.get("sub")
+    if username is None:
+        raise _credentials_exception()
+    return username
+
+
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Principal of the bearer token; served from services/principal_cache.py, the DB only on a miss."""
+    principal = get_principal(_token_subject(token), db)
+    if principal is None:
+        raise _credentials_exception()
+    return principal
+
+
+def get_current_active_principal(principal: Principal = Depends(get_current_principal)) -> Principal:
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """User of the bearer token as an ORM object, for endpoints that modify it.
+
+    Prefer `get_current_principal`, which does not hit the DB on a cache hit.
+    """
+    credentials_exception = _credentials_exception()
+    username = _token_subject(token)
     # Retrieve user from DB
-    with get_db_session() as session:
-        user = session.query(User).filter_by(email=username).one_or_none()
-        if user is None:
-            raise credentials_exception
-        return user
+    user = db.query(User).filter_by(email=username).one_or_none()
+    if user is None:
+        raise credentials_exception
+    return user
 
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
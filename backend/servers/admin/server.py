@@ -1,8 +1,19 @@
+import os
+# Selects the DB engine profile; must be set before backend.database.engine is imported
+os.environ.setdefault("SERVICE_ROLE", "admin")
+
 from fastapi import FastAPI
 from backend.api_routers.admin import register
+from backend.api_routers.metrics_router import router as metrics_router
 from backend.config.logger import get_logger
+from backend.middleware.query_stats import QueryStatsMiddleware
 
 app = FastAPI(title="Admin API")
 logger = get_logger("admin_server")
 
-app.include_router(register.router, prefix="/admin", tags=["admin"]) 
\ No newline at end of file
+# SQL statement count / DB time per request (X-DB-* headers in DEBUG)
+app.add_middleware(QueryStatsMiddleware)
+
+app.include_router(register.router, prefix="/admin", tags=["admin"])
+# Expose pool/service metrics for scraping
+app.include_router(metrics_router, tags=["metrics"])
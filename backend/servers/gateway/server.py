@@ -1,23 +1,57 @@
+import asyncio
+import os
+# Selects the DB engine profile; must be set before backend.database.engine is imported
+os.environ.setdefault("SERVICE_ROLE", "gateway")
+
 from fastapi import FastAPI
 from backend.api_routers.gateway.router import router as gateway_router
+from backend.api_routers.gateway.events import router as gateway_events_router
 from backend.api_routers.public_router import router as public_router
+from backend.api_routers.metrics_router import router as metrics_router
 from backend.config.logger import get_logger
 from backend.middleware.rate_limiting import get_limiter, get_rate_limit_exceeded_handler, RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from backend.middleware.request_logging import RequestLoggingMiddleware
+from backend.middleware.query_stats import QueryStatsMiddleware
+from backend.middleware.read_your_writes import ReadYourWritesMiddleware
+from backend.services.order_events import broker as order_status_broker
+from backend.services.reference_catalog import preload_catalog
+from backend.services.rate_book import preload_rate_book
 
 app = FastAPI(title="Gateway API")
 logger = get_logger("gateway_server")
 
 # Mount gateway endpoints
 app.include_router(gateway_router, prefix="/gateway", tags=["gateway"])
+# Push-based order status (SSE / long-poll)
+app.include_router(gateway_events_router, prefix="/gateway", tags=["gateway"])
 # Mount reference data endpoints
 app.include_router(public_router, prefix="/reference", tags=["reference"])
+# Expose cache/service metrics for scraping
+app.include_router(metrics_router, tags=["metrics"])
 
 app.state.limiter = get_limiter()
 app.add_exception_handler(RateLimitExceeded, get_rate_limit_exceeded_handler())
 # Log each request
 app.add_middleware(RequestLoggingMiddleware)
+# SQL statement count / DB time per request (X-DB-* headers in DEBUG)
+app.add_middleware(QueryStatsMiddleware)
+# Route clients that just wrote to the primary (read replicas)
+app.add_middleware(ReadYourWritesMiddleware)
 app.add_middleware(SlowAPIMiddleware)
 
+@app.on_event("startup")
+async def preload_reference_catalog():
+    # Built off the event loop so a slow DB does not block startup of the other handlers
+    await asyncio.to_thread(preload_catalog)
+
+@app.on_event("startup")
+async def preload_exchange_rates():
+    # Order creation converts with the in-memory book only, so load it before traffic arrives
+    await asyncio.to_thread(preload_rate_book)
+
+@app.on_event("shutdown")
+async def stop_order_status_broker():
+    await order_status_broker.stop()
+
 logger.info("Gateway API server configured.") 
\ No newline at end of file
@@ -1,10 +1,17 @@
+import os
+# Selects the DB engine profile; must be set before backend.database.engine is imported
+os.environ.setdefault("SERVICE_ROLE", "merchant")
+
 from fastapi import FastAPI
 from backend.api_routers.merchant.auth import router as auth_router
 from backend.api_routers.merchant.router import router as merchant_router
+from backend.api_routers.metrics_router import router as metrics_router
 from backend.config.logger import get_logger
 from backend.middleware.rate_limiting import get_limiter, get_rate_limit_exceeded_handler, RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from backend.middleware.request_logging import RequestLoggingMiddleware
+from backend.middleware.query_stats import QueryStatsMiddleware
+from backend.middleware.read_your_writes import ReadYourWritesMiddleware
 
 app = FastAPI(title="Merchant API")
 logger = get_logger("merchant_server")
@@ -12,7 +19,13 @@ logger = get_logger("merchant_server")
 app.state.limiter = get_limiter()
 app.add_exception_handler(RateLimitExceeded, get_rate_limit_exceeded_handler())
 app.add_middleware(RequestLoggingMiddleware)
+# SQL statement count / DB time per request (X-DB-* headers in DEBUG)
+app.add_middleware(QueryStatsMiddleware)
+# Route clients that just wrote to the primary (read replicas)
+app.add_middleware(ReadYourWritesMiddleware)
 app.add_middleware(SlowAPIMiddleware)
 
 app.include_router(auth_router, prefix="/merchant", tags=["merchant"])
-app.include_router(merchant_router, prefix="/merchant", tags=["merchant"]) 
\ No newline at end of file
+app.include_router(merchant_router, prefix="/merchant", tags=["merchant"])
+# Expose pool/service metrics for scraping
+app.include_router(metrics_router, tags=["metrics"])
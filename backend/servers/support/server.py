@@ -1,10 +1,21 @@
+import os
+# Selects the DB engine profile; must be set before backend.database.engine is imported
+os.environ.setdefault("SERVICE_ROLE", "support")
+
 from fastapi import FastAPI
-from backend.api_routers.support import auth
+from backend.api_routers.support import auth, archive
+from backend.api_routers.metrics_router import router as metrics_router
 from backend.config.logger import get_logger
 from backend.middleware.request_logging import RequestLoggingMiddleware
+from backend.middleware.query_stats import QueryStatsMiddleware
 
 app = FastAPI(title="Support API")
 logger = get_logger("support_server")
 
 app.add_middleware(RequestLoggingMiddleware)
-app.include_router(auth.router, prefix="/support", tags=["support"]) 
\ No newline at end of file
+# SQL statement count / DB time per request (X-DB-* headers in DEBUG)
+app.add_middleware(QueryStatsMiddleware)
+app.include_router(auth.router, prefix="/support", tags=["support"])
+app.include_router(archive.router, prefix="/support", tags=["support"])
+# Expose pool/service metrics for scraping
+app.include_router(metrics_router, tags=["metrics"])
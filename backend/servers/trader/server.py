@@ -1,10 +1,17 @@
+import os
+# Selects the DB engine profile; must be set before backend.database.engine is imported
+os.environ.setdefault("SERVICE_ROLE", "trader")
+
 from fastapi import FastAPI
 from backend.api_routers.trader.auth import router as auth_router
 from backend.api_routers.trader.router import router as trader_router
+from backend.api_routers.metrics_router import router as metrics_router
 from backend.config.logger import get_logger
 from backend.middleware.rate_limiting import get_limiter, get_rate_limit_exceeded_handler, RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from backend.middleware.request_logging import RequestLoggingMiddleware
+from backend.middleware.query_stats import QueryStatsMiddleware
+from backend.middleware.read_your_writes import ReadYourWritesMiddleware
 
 app = FastAPI(title="Trader API")
 logger = get_logger("trader_server")
@@ -16,4 +23,10 @@ app.state.limiter = get_limiter()
 app.add_exception_handler(RateLimitExceeded, get_rate_limit_exceeded_handler())
 # Log each request
 app.add_middleware(RequestLoggingMiddleware)
-app.add_middleware(SlowAPIMiddleware) 
\ No newline at end of file
+# SQL statement count / DB time per request (X-DB-* headers in DEBUG)
+app.add_middleware(QueryStatsMiddleware)
+# Route clients that just wrote to the primary (read replicas)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(SlowAPIMiddleware)
+# Expose pool/service metrics for scraping
+app.include_router(metrics_router, tags=["metrics"])
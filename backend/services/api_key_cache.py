@@ -0,0 +1,368 @@
+"""Cache of merchant store authentication data keyed by public API key.
+
+Every gateway call authenticates by `public_api_key`; this module keeps a small
+projection of the store (no secrets) in a `TieredCache` so the hot path does not
+hit the database. Entries are invalidated after commit whenever a store's key
+is rotated or its `access` / `pay_in_enabled` / `pay_out_enabled` flags change,
+through the unit of work or through `update_where` / `update_object_db`. Every
+cached key is also indexed by store id, so a key rotated by a bulk UPDATE (which
+keeps no history of the old value) is still evicted.
+Invalidations are broadcast on API_KEY_EVENTS_CHANNEL; every process runs a
+listener thread that drops its local copies, so a revoked key stops working
+everywhere within the pub/sub latency instead of the local TTL.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set
+
+from cachetools import TTLCache
+from redis import RedisError
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    from backend.database.db import MerchantStore
+    from backend.utils.tiered_cache import TieredCache
+    from backend.database.utils import register_bulk_write_listener
+    from backend.utils.exceptions import DatabaseError
+    from backend.utils.redis_client import get_redis_client, REDIS_URL
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for api_key_cache: {e}")
+
+logger = logging.getLogger(__name__)
+
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "30"))
+API_KEY_CACHE_MAXSIZE = int(os.getenv("API_KEY_CACHE_MAXSIZE", "10000"))
+API_KEY_CACHE_REDIS_TTL_SECONDS = int(os.getenv("API_KEY_CACHE_REDIS_TTL_SECONDS", "300"))
+API_KEY_CACHE_USE_REDIS = os.getenv("API_KEY_CACHE_USE_REDIS", "true").lower() in ("1", "true", "yes")
+API_KEY_EVENTS_CHANNEL = os.getenv("API_KEY_EVENTS_CHANNEL", "api_key_invalidations")
+
+# Attributes whose change must evict the cached projection
+_INVALIDATING_ATTRS = ("public_api_key", "access", "pay_in_enabled", "pay_out_enabled")
+_PENDING_KEY = "api_key_cache_pending"
+
+
+@dataclass(frozen=True)
+class StoreAuthInfo:
+    """Read-only projection of a MerchantStore used for gateway authentication."""
+    id: int
+    merchant_id: int
+    access: bool
+    pay_in_enabled: bool
+    pay_out_enabled: bool
+    gateway_require_customer_id_param: bool
+    gateway_require_amount_param: bool
+    crypto_currency_id: int
+    fiat_currency_id: int
+    lower_limit: Decimal
+    upper_limit: Decimal
+
+
+def _to_cache(info: StoreAuthInfo) -> dict:
+    data = asdict(info)
+    data["lower_limit"] = str(info.lower_limit)
+    data["upper_limit"] = str(info.upper_limit)
+    return data
+
+
+def _from_cache(data: dict) -> StoreAuthInfo:
+    data = dict(data)
+    data["lower_limit"] = Decimal(data["lower_limit"])
+    data["upper_limit"] = Decimal(data["upper_limit"])
+    return StoreAuthInfo(**data)
+
+
+_cache = TieredCache(
+    name="api_key",
+    maxsize=API_KEY_CACHE_MAXSIZE,
+    ttl=API_KEY_CACHE_TTL_SECONDS,
+    redis_ttl=API_KEY_CACHE_REDIS_TTL_SECONDS,
+    redis_prefix="api_key:",
+    use_redis=API_KEY_CACHE_USE_REDIS,
+    serializer=_to_cache,
+    deserializer=_from_cache,
+)
+
+
+# store id -> cache keys cached for that store (this process; Redis holds the shared copy)
+_store_keys: TTLCache = TTLCache(maxsize=API_KEY_CACHE_MAXSIZE, ttl=API_KEY_CACHE_REDIS_TTL_SECONDS)
+_store_keys_lock = threading.Lock()
+
+
+def _cache_key(api_key: str) -> str:
+    # Raw API keys never end up in Redis or in process dumps
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _store_index_key(store_id: int) -> str:
+    return f"{_cache.redis_prefix}store:{store_id}"
+
+
+def _remember(key: str, info: StoreAuthInfo, token) -> None:
+    """Caches `info` under `key` unless it was invalidated since `token`, and indexes the key by store id."""
+    with _store_keys_lock:
+        keys = _store_keys.get(info.id) or set()
+        _store_keys[info.id] = keys | {key}
+    client = get_redis_client() if API_KEY_CACHE_USE_REDIS else None
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.sadd(_store_index_key(info.id), key)
+            pipe.expire(_store_index_key(info.id), API_KEY_CACHE_REDIS_TTL_SECONDS)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to index cached API key by store id: {e}")
+    # Indexed first, so an invalidation racing this write always finds the key
+    _cache.set_if_current(key, info, token)
+
+
+def _keys_for_stores(store_ids: Iterable[int]) -> Set[str]:
+    """Cache keys indexed for `store_ids`, removing the index entries."""
+    keys: Set[str] = set()
+    store_ids = sorted(set(store_ids))
+    with _store_keys_lock:
+        for store_id in store_ids:
+            keys.update(_store_keys.pop(store_id, None) or ())
+    client = get_redis_client() if API_KEY_CACHE_USE_REDIS else None
+    if client is None or not store_ids:
+        return keys
+    try:
+        pipe = client.pipeline(transaction=False)
+        for store_id in store_ids:
+            pipe.smembers(_store_index_key(store_id))
+        for members in pipe.execute():
+            keys.update(members)
+        client.delete(*(_store_index_key(store_id) for store_id in store_ids))
+    except RedisError as e:
+        logger.warning(f"Failed to read the API key store index: {e}")
+    return keys
+
+
+def _store_auth_query(api_key: str):
+    return select(
+        MerchantStore.id,
+        MerchantStore.merchant_id,
+        MerchantStore.access,
+        MerchantStore.pay_in_enabled,
+        MerchantStore.pay_out_enabled,
+        MerchantStore.gateway_require_customer_id_param,
+        MerchantStore.gateway_require_amount_param,
+        MerchantStore.crypto_currency_id,
+        MerchantStore.fiat_currency_id,
+        MerchantStore.lower_limit,
+        MerchantStore.upper_limit,
+    ).where(MerchantStore.public_api_key == api_key)
+
+
+def get_store_auth(api_key: str, db: Session) -> Optional[StoreAuthInfo]:
+    """Returns the auth projection for `api_key`, loading it from the DB on a miss.
+
+    Unknown keys are not cached, so a newly created store is visible immediately.
+
+    Raises:
+        DatabaseError: If the lookup query fails.
+    """
+    ensure_invalidation_listener()
+    key = _cache_key(api_key)
+    info = _cache.get(key)
+    if info is not None:
+        return info
+
+    token = _cache.load_token(key)
+    try:
+        row = db.execute(_store_auth_query(api_key)).one_or_none()
+    except Exception as e:
+        logger.error(f"Error loading merchant store by API key: {e}", exc_info=True)
+        raise DatabaseError(f"Error loading merchant store by API key: {e}") from e
+
+    if row is None:
+        return None
+    info = StoreAuthInfo(**row._asdict())
+    _remember(key, info, token)
+    return info
+
+
+async def get_store_auth_async(api_key: str, db: AsyncSession) -> Optional[StoreAuthInfo]:
+    """Async variant of `get_store_auth` for the asyncpg gateway stack.
+
+    The local tier is checked inline; the (blocking) Redis tier runs in a worker
+    thread so the event loop is never stalled by Redis.
+
+    Raises:
+        DatabaseError: If the lookup query fails.
+    """
+    ensure_invalidation_listener()
+    key = _cache_key(api_key)
+    info = _cache.get_local(key)
+    if info is not None:
+        return info
+    info = await asyncio.to_thread(_cache.get, key)
+    if info is not None:
+        return info
+
+    token = await asyncio.to_thread(_cache.load_token, key)
+    try:
+        row = (await db.execute(_store_auth_query(api_key))).one_or_none()
+    except Exception as e:
+        logger.error(f"Error loading merchant store by API key: {e}", exc_info=True)
+        raise DatabaseError(f"Error loading merchant store by API key: {e}") from e
+
+    if row is None:
+        return None
+    info = StoreAuthInfo(**row._asdict())
+    await asyncio.to_thread(_remember, key, info, token)
+    return info
+
+
+def _evict_keys(keys: Iterable[str]) -> None:
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    _cache.invalidate(*keys)
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        # Only the hashes travel over the channel
+        client.publish(API_KEY_EVENTS_CHANNEL, json.dumps({"keys": keys}))
+    except RedisError as e:
+        logger.error(f"Failed to broadcast API key invalidation: {e}", exc_info=True)
+
+
+def invalidate_store_auth(*api_keys: str) -> None:
+    """Evicts the cached projection for the given API keys from Redis and from every process."""
+    _evict_keys(_cache_key(k) for k in api_keys if k)
+
+
+def invalidate_stores(*store_ids: int) -> None:
+    """Evicts every cached projection of the given stores, whatever API key it was cached under."""
+    _evict_keys(_keys_for_stores(store_id for store_id in store_ids if store_id))
+
+
+def _handle_invalidation(raw: str) -> None:
+    try:
+        keys: List[str] = json.loads(raw).get("keys", [])
+    except (ValueError, AttributeError):
+        logger.warning("Dropping malformed API key invalidation")
+        return
+    metrics.increment("api_key_invalidations_received_total")
+    _cache.invalidate_local(*keys)
+
+
+class _InvalidationListener(threading.Thread):
+    """Daemon thread applying invalidations published by other processes to the local tier."""
+
+    def __init__(self):
+        super().__init__(name="api-key-invalidations", daemon=True)
+
+    def run(self) -> None:
+        backoff = 1.0
+        while True:
+            client = get_redis_client()
+            if client is None:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(API_KEY_EVENTS_CHANNEL)
+                # Messages sent while disconnected are lost; start from a clean local tier
+                _cache.clear_local()
+                logger.info(f"API key cache subscribed to '{API_KEY_EVENTS_CHANNEL}'")
+                backoff = 1.0
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        _handle_invalidation(message["data"])
+            except (RedisError, OSError) as e:
+                logger.error(f"API key cache listener lost Redis subscription: {e}; retrying in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+_listener: Optional[_InvalidationListener] = None
+_listener_lock = threading.Lock()
+
+
+def ensure_invalidation_listener() -> None:
+    """Starts the listener on first use in this process (also after a fork, e.g. Celery prefork)."""
+    global _listener
+    if not REDIS_URL or (_listener is not None and _listener.is_alive()):
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = _InvalidationListener()
+            _listener.start()
+
+
+# --- Invalidation on store changes --- #
+
+def _pending(session: Session) -> Dict[str, Set]:
+    return session.info.setdefault(_PENDING_KEY, {"api_keys": set(), "store_ids": set()})
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_stores(session: Session, flush_context) -> None:
+    """Remembers API keys of stores whose auth-relevant fields changed in this flush."""
+    pending = _pending(session)["api_keys"]
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, MerchantStore):
+            continue
+        state = inspect(obj)
+        key_history = state.attrs.public_api_key.history
+        changed = obj in session.deleted or any(
+            state.attrs[attr].history.has_changes() for attr in _INVALIDATING_ATTRS
+        )
+        if not changed:
+            continue
+        # Old key (rotation) and current key both have to go
+        pending.update(k for k in key_history.deleted if k)
+        pending.update(k for k in key_history.unchanged if k)
+        pending.update(k for k in key_history.added if k)
+
+
+def _collect_bulk_store_changes(session: Session, objects, changed) -> None:
+    """Same for rows written by `update_where` / `update_object_db` (no unit-of-work history)."""
+    if changed is None or not changed.intersection(_INVALIDATING_ATTRS):
+        # Inserted stores: unknown keys are never cached
+        return
+    pending = _pending(session)
+    for obj in objects:
+        if isinstance(obj, MerchantStore):
+            pending["api_keys"].add(obj.public_api_key)
+            # The old key is gone from the refreshed object; the store index still has it
+            pending["store_ids"].add(obj.id)
+
+
+register_bulk_write_listener(_collect_bulk_store_changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    keys = {_cache_key(k) for k in pending["api_keys"] if k}
+    keys.update(_keys_for_stores(pending["store_ids"]))
+    if keys:
+        logger.debug(f"Invalidating {len(keys)} cached API key(s) after commit")
+        _evict_keys(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
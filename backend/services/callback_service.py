@@ -17,8 +17,7 @@ try:
     # !! Need worker task if sending callbacks asynchronously !!
     # from backend.worker.app import celery_app # Example
     # !! Need DB session if fetching data within task !!
-    # from backend.database.utils import get_db_session 
-    from backend.database.utils import get_object_or_none
+    # from backend.database.utils import get_db_session (imported lazily: it creates the engines)
     from backend.utils.exceptions import NotificationError, ConfigurationError
 except ImportError as e:
      raise ImportError(f"Could not import required modules for CallbackService: {e}")
@@ -50,25 +49,26 @@ def _prepare_callback_payload(order: Any) -> Dict[str, Any]: # Accept OrderHisto
     # TODO: Define the exact payload structure required by merchants
     # Include relevant order details like ID, merchant's order ID (if provided),
     # status, amount, currency, customer_id, timestamps etc.
+    # The merchant's own order id is stored as client_id
     if isinstance(order, OrderHistory):
         return {
             "order_id": order.id,
             "incoming_order_id": order.incoming_order_id,
-            "merchant_order_id": order.incoming_order.merchant_order_id if order.incoming_order else None, # Example access
+            "merchant_order_id": order.client_id,
             "status": str(order.status), # Ensure string representation
-            "amount": str(order.amount),
-            "currency_code": order.currency.code if order.currency else None, # Example access
-            "customer_id": order.incoming_order.customer_id if order.incoming_order else None,
-            "completed_at": order.completed_at.isoformat() if order.completed_at else None,
+            "amount": str(order.amount_fiat),
+            "currency_code": order.fiat.currency_code if order.fiat else None,
+            "customer_id": order.customer_id,
+            "completed_at": order.updated_at.isoformat() if order.status == "completed" and order.updated_at else None,
             # Add other necessary fields
         }
     elif isinstance(order, IncomingOrder):
          return {
             "incoming_order_id": order.id,
-            "merchant_order_id": order.merchant_order_id, # Example access
+            "merchant_order_id": order.client_id,
             "status": str(order.status),
-            "amount": str(order.amount),
-            "currency_code": order.currency.code if order.currency else None, # Example access
+            "amount": str(order.amount_fiat),
+            "currency_code": order.fiat_currency.currency_code if order.fiat_currency else None,
             "customer_id": order.customer_id,
             "created_at": order.created_at.isoformat() if order.created_at else None,
             # Add other necessary fields based on when callback is sent
@@ -81,12 +81,18 @@ def _prepare_callback_payload(order: Any) -> Dict[str, Any]: # Accept OrderHisto
 # def send_merchant_callback_task(self, order_id: int, order_model_name: str):
 async def send_merchant_callback(
     order: Any, # Pass the loaded OrderHistory or IncomingOrder object
-    merchant_store: MerchantStore # Pass the loaded MerchantStore object
+    merchant_store: MerchantStore, # Pass the loaded MerchantStore object
+    client: Optional[httpx.AsyncClient] = None
 ):
     """Sends a callback notification to the merchant's configured URL.
     
     This function (or a Celery task wrapping it) should be called after
     significant order status changes.
+
+    Args:
+        order: The loaded OrderHistory or IncomingOrder object.
+        merchant_store: The loaded MerchantStore object (provides the signing secret).
+        client: Optional shared httpx.AsyncClient whose connection pool is reused.
     """
     
     # 1. Check if Callback URL is configured
@@ -107,31 +113,52 @@ async def send_merchant_callback(
     if not payload:
         return # Error already logged
 
-    # 4. Generate Signature
+    # 4. Sign and send
+    await post_signed_callback(callback_url, payload, secret_key, order_id_log=getattr(order, 'id', 'N/A'), client=client)
+
+async def post_signed_callback(
+    callback_url: str,
+    payload: Dict[str, Any],
+    secret_key: str,
+    order_id_log: Any = 'N/A',
+    client: Optional[httpx.AsyncClient] = None
+) -> None:
+    """Signs a prepared callback payload and POSTs it to the merchant.
+
+    Args:
+        callback_url: Merchant endpoint to deliver to.
+        payload: The callback body (see _prepare_callback_payload).
+        secret_key: Store secret used for the HMAC signature.
+        order_id_log: Order identifier used only for log messages.
+        client: Optional shared httpx.AsyncClient. When omitted a client with
+            CALLBACK_TIMEOUT_SECONDS is opened for this single request.
+
+    Raises:
+        NotificationError: On timeout, connection error or a non-2xx response.
+    """
+    # 1. Generate Signature
     signature = _generate_signature(payload, secret_key)
 
-    # 5. Prepare Headers
+    # 2. Prepare Headers
     headers = {
         'Content-Type': 'application/json',
         'X-JivaPay-Signature': signature
         # Add other headers if needed (e.g., User-Agent)
     }
-    
-    order_id_log = getattr(order, 'id', 'N/A')
+
     logger.info(f"Attempting to send callback for Order ID {order_id_log} to URL: {callback_url}")
 
-    # 6. Send HTTP POST Request (using httpx for async)
+    # 3. Send HTTP POST Request (using httpx for async)
     try:
-        async with httpx.AsyncClient(timeout=CALLBACK_TIMEOUT_SECONDS) as client:
-            response = await client.post(
-                callback_url,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status() # Raise exception for 4xx/5xx responses
-            
-            logger.info(f"Callback sent successfully for Order ID {order_id_log}. Merchant server responded with status: {response.status_code}")
-            # TODO: Potentially log merchant response body if needed for debugging
+        if client is not None:
+            response = await client.post(callback_url, headers=headers, json=payload)
+        else:
+            async with httpx.AsyncClient(timeout=CALLBACK_TIMEOUT_SECONDS) as own_client:
+                response = await own_client.post(callback_url, headers=headers, json=payload)
+        response.raise_for_status() # Raise exception for 4xx/5xx responses
+
+        logger.info(f"Callback sent successfully for Order ID {order_id_log}. Merchant server responded with status: {response.status_code}")
+        # TODO: Potentially log merchant response body if needed for debugging
 
     except httpx.TimeoutException as e:
         logger.error(f"Callback timeout for Order ID {order_id_log} to URL {callback_url}. Error: {e}")
@@ -7,8 +7,7 @@ Provides a function to check orders against fraud rules.
 import logging
 from enum import Enum
 from sqlalchemy.orm import Session
-from decimal import Decimal
-from backend.utils.config_loader import get_typed_config_value
+from backend.utils.config_loader import get_setting
 
 from backend.database.db import IncomingOrder
 from backend.utils.exceptions import FraudDetectedError
@@ -39,14 +38,9 @@ def check_incoming_order(
         FraudDetectedError: For explicit deny or manual review triggers.
     """
     logger.info(f"Running fraud check for IncomingOrder ID: {incoming_order.id}")
-    # Fetch thresholds from config
-    try:
-        manual_threshold = get_typed_config_value("FRAUD_MANUAL_REVIEW_THRESHOLD", db_session, Decimal, default=None)
-        deny_threshold = get_typed_config_value("FRAUD_DENY_THRESHOLD", db_session, Decimal, default=None)
-    except Exception as e:
-        logger.warning(f"Could not load fraud thresholds: {e}. Defaulting to allow.")
-        manual_threshold = None
-        deny_threshold = None
+    # Fetch thresholds from the config snapshot (unset -> None -> allow)
+    manual_threshold = get_setting("FRAUD_MANUAL_REVIEW_THRESHOLD")
+    deny_threshold = get_setting("FRAUD_DENY_THRESHOLD")
     amount = getattr(incoming_order, 'amount_fiat', None)
     # Deny if above deny threshold
     if deny_threshold is not None and amount is not None and amount > deny_threshold:
@@ -1,8 +1,16 @@
 """Service handling the logic for Gateway API requests."""
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import os
+import re
+import uuid
+from decimal import Decimal
+from typing import Dict, Any, Optional, List
+from pydantic import ValidationError
+from sqlalchemy import select, insert
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.database.db import OrderHistory
 
@@ -10,7 +18,7 @@ from backend.database.db import OrderHistory
 try:
     # !! Models needed: MerchantStore, IncomingOrder !!
     from backend.database.db import MerchantStore, IncomingOrder
-    from backend.database.utils import get_object_or_none, create_object
+    from backend.database.utils import get_object_or_none, create_object, create_objects_bulk_async
     # !! Need Schemas !!
     # from backend.shemas_enums.gateway import GatewayInitRequest # Specific schemas?
     from backend.shemas_enums.order import IncomingOrderCreate # Reusing for now
@@ -18,11 +26,17 @@ try:
     # from backend.services import order_service
     # !! Need Order Status Manager !!
     from backend.services import order_status_manager
-    # !! Need S3 client !!
-    # from backend.utils.s3_client import upload_file
+    from backend.services.api_key_cache import get_store_auth, get_store_auth_async, StoreAuthInfo
+    from backend.services.audit_logger import log_event
+    from backend.services.order_events import publish_status_events
+    from backend.services.order_status_cache import build_incoming_projection, get_status_projection_by_client_id_async
+    from backend.services.rate_book import current_rate_book, convert_fiat_to_crypto
+    from backend.utils.s3_client import generate_presigned_post, head_object, object_url
+    from backend.config.settings import settings
     from backend.utils.exceptions import (
         AuthenticationError, AuthorizationError, ConfigurationError, 
-        OrderProcessingError, DatabaseError, JivaPayException, S3Error
+        OrderProcessingError, DatabaseError, JivaPayException, S3Error,
+        OrderNotFound, OrderValidationError, InvalidOrderStatus
     )
     from backend.worker.tasks import process_order_task
 except ImportError as e:
@@ -30,14 +44,23 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
-def _get_merchant_store_by_api_key(api_key: Optional[str], db: Session) -> MerchantStore:
-    """Authenticates and retrieves the merchant store based on API key."""
-    if not api_key:
-        raise AuthenticationError("API key is missing.")
-    
-    # Secure API key lookup using public_api_key field
-    store = get_object_or_none(db, MerchantStore, public_api_key=api_key)
-    
+BULK_INIT_MAX_ITEMS = int(os.getenv("BULK_INIT_MAX_ITEMS", "500"))
+
+# Direct-to-storage receipt uploads
+RECEIPT_UPLOAD_TTL_SECONDS = int(os.getenv("RECEIPT_UPLOAD_TTL_SECONDS", "900"))
+RECEIPT_MAX_BYTES = int(os.getenv("RECEIPT_MAX_BYTES", str(10 * 1024 * 1024)))
+RECEIPT_CONTENT_TYPES = frozenset(
+    os.getenv("RECEIPT_CONTENT_TYPES", "image/jpeg,image/png,image/webp,application/pdf").split(",")
+)
+
+# Columns returned by the bulk insert (what GatewayInitResponse needs)
+_BULK_RETURNING = (
+    IncomingOrder.id, IncomingOrder.store_id, IncomingOrder.order_type, IncomingOrder.status,
+    IncomingOrder.amount_fiat, IncomingOrder.fiat_currency_id, IncomingOrder.target_method_id,
+    IncomingOrder.customer_id, IncomingOrder.client_id, IncomingOrder.created_at,
+)
+
+def _check_store_access(store: Optional[StoreAuthInfo]) -> StoreAuthInfo:
     if not store:
         raise AuthenticationError("Invalid API key.")
     if not store.access:
@@ -46,6 +69,82 @@ def _get_merchant_store_by_api_key(api_key: Optional[str], db: Session) -> Merch
     logger.debug(f"Authenticated merchant store ID: {store.id} using API key.")
     return store
 
+def _get_merchant_store_by_api_key(api_key: Optional[str], db: Session) -> StoreAuthInfo:
+    """Authenticates the merchant store by API key.
+
+    Returns the cached auth/settings projection of the store (see api_key_cache),
+    not the ORM object; load MerchantStore explicitly where the full row is needed.
+    """
+    if not api_key:
+        raise AuthenticationError("API key is missing.")
+    # Secure API key lookup using public_api_key field (cached)
+    return _check_store_access(get_store_auth(api_key, db))
+
+async def _get_merchant_store_by_api_key_async(api_key: Optional[str], db: AsyncSession) -> StoreAuthInfo:
+    """Async variant of `_get_merchant_store_by_api_key`."""
+    if not api_key:
+        raise AuthenticationError("API key is missing.")
+    return _check_store_access(await get_store_auth_async(api_key, db))
+
+def _validate_init_request(merchant_store: StoreAuthInfo, request_data: IncomingOrderCreate, direction: str) -> None:
+    """Validates an init request against the store settings.
+
+    Raises:
+        AuthorizationError: If the direction is disabled for the store.
+        OrderValidationError: If a required parameter is missing or the amount is out of limits.
+    """
+    if direction == "PAYIN" and not merchant_store.pay_in_enabled:
+         raise AuthorizationError(f"Pay-In is not enabled for store {merchant_store.id}")
+    if direction == "PAYOUT" and not merchant_store.pay_out_enabled:
+         raise AuthorizationError(f"Pay-Out is not enabled for store {merchant_store.id}")
+    if merchant_store.gateway_require_customer_id_param and not request_data.customer_id:
+        raise OrderValidationError("Customer ID is required for this merchant.")
+    if not (merchant_store.lower_limit <= request_data.amount <= merchant_store.upper_limit):
+        raise OrderValidationError(
+            f"Amount {request_data.amount} is outside the store limits "
+            f"[{merchant_store.lower_limit}, {merchant_store.upper_limit}]."
+        )
+    # TODO: Check currency/payment method compatibility with store
+    logger.debug(f"Request validation passed for Store ID: {merchant_store.id}")
+
+def _incoming_order_values(
+    merchant_store: StoreAuthInfo,
+    request_data: IncomingOrderCreate,
+    direction: str
+) -> Dict[str, Any]:
+    """Maps a gateway request onto IncomingOrder column values.
+
+    The rate comes from the in-memory rate book (no I/O). Without a fresh quote
+    for the pair it is left at 0 and resolved during processing.
+    """
+    order_type = 'pay_in' if direction == "PAYIN" else 'pay_out'
+    exchange_rate, amount_crypto = Decimal('0'), None
+    quote = current_rate_book().get_by_ids(merchant_store.crypto_currency_id, request_data.currency_id)
+    if quote is not None and quote.is_fresh():
+        # The customer buys crypto on pay-in and sells it on pay-out
+        exchange_rate = quote.buy_rate if order_type == 'pay_in' else quote.sell_rate
+        amount_crypto = convert_fiat_to_crypto(request_data.amount, exchange_rate)
+    return {
+        'merchant_id': merchant_store.merchant_id,
+        'store_id': merchant_store.id,
+        'gateway_id': None, # StoreGateway binding is not part of the init request yet
+        'target_method_id': request_data.payment_method_id,
+        'fiat_currency_id': request_data.currency_id,
+        'crypto_currency_id': merchant_store.crypto_currency_id,
+        'amount_fiat': request_data.amount,
+        'amount_crypto': amount_crypto,
+        'exchange_rate': exchange_rate,
+        # Commission is resolved during processing; the column is NOT NULL
+        'store_commission': Decimal('0'),
+        'order_type': order_type,
+        'customer_id': request_data.customer_id,
+        'client_id': request_data.client_id,
+        'return_url': request_data.return_url,
+        'callback_url': request_data.callback_url,
+        'status': 'new',
+        'retry_count': 0,
+    }
+
 def handle_init_request(
     api_key: Optional[str],
     request_data: IncomingOrderCreate, # Or specific GatewayInitRequest schema
@@ -56,49 +155,159 @@ def handle_init_request(
 
     - Identifies merchant.
     - Validates request against store settings.
-    - Creates the IncomingOrder record.
+    - Creates and commits the IncomingOrder record.
+    - Enqueues it for processing (after the commit, so the worker always finds the row).
     """
     # 1. Identify Merchant
     merchant_store = _get_merchant_store_by_api_key(api_key, db)
     logger.info(f"Handling {direction} init request for Store ID: {merchant_store.id}")
 
     # 2. Validate Request Data against Store Settings
-    # TODO: Implement validation
-    # - Check if merchant_store allows this direction (payin_enabled/payout_enabled)
-    # - Check if request has required params based on store settings (gateway_require_customer_id, etc.)
-    # - Check currency/payment method compatibility with store
-    # - Raise ConfigurationError or OrderProcessingError (4xx) if validation fails
-    if direction == "PAYIN" and not merchant_store.payin_enabled: # Assuming flags exist
-         raise AuthorizationError(f"Pay-In is not enabled for store {merchant_store.id}")
-    if direction == "PAYOUT" and not merchant_store.payout_enabled:
-         raise AuthorizationError(f"Pay-Out is not enabled for store {merchant_store.id}")
-    # Example check for required param:
-    # if merchant_store.gateway_require_customer_id and not request_data.customer_id:
-    #     raise OrderProcessingError("Customer ID is required for this merchant.", status_code=400)
-    logger.debug(f"Request validation passed (placeholder) for Store ID: {merchant_store.id}")
+    _validate_init_request(merchant_store, request_data, direction)
 
     # 3. Create IncomingOrder record
     try:
-        order_data = request_data.dict(exclude_unset=True)
-        order_data.update({
-            'merchant_id': merchant_store.merchant_id,
-            'store_id': merchant_store.id,
-            'gateway_id': merchant_store.id, # Use the store's configured gateway record if applicable
-            'status': 'new',
-            'retry_count': 0
-        })
+        order_data = _incoming_order_values(merchant_store, request_data, direction)
         created_order = create_object(db, IncomingOrder, order_data)
+        db.commit()
         logger.info(f"Created IncomingOrder ID {created_order.id} for Store ID {merchant_store.id}")
-        # Immediately enqueue the order for processing to achieve real-time handling
-        process_order_task.delay(created_order.id)
-        return created_order
     except Exception as e:
+        db.rollback()
         msg = f"Failed to create IncomingOrder for Store {merchant_store.id}: {e}"
         logger.error(msg, exc_info=True)
         if isinstance(e, DatabaseError):
             raise
         raise OrderProcessingError(msg) from e
 
+    # 4. Immediately enqueue the order for processing to achieve real-time handling
+    try:
+        process_order_task.delay(created_order.id)
+    except Exception as e:
+        # Order is already committed and stays in 'new'; re-enqueue it manually
+        logger.error(f"Failed to enqueue IncomingOrder {created_order.id}: {e}", exc_info=True)
+    return created_order
+
+async def handle_init_request_async(
+    api_key: Optional[str],
+    request_data: IncomingOrderCreate,
+    direction: str, # "PAYIN" or "PAYOUT"
+    db: AsyncSession
+) -> IncomingOrder:
+    """Async variant of `handle_init_request` on the asyncpg engine.
+
+    Commits the new IncomingOrder before enqueueing it, so the worker always
+    finds the row. The Celery publish is blocking and runs in a worker thread.
+    """
+    merchant_store = await _get_merchant_store_by_api_key_async(api_key, db)
+    logger.info(f"Handling {direction} init request for Store ID: {merchant_store.id}")
+    _validate_init_request(merchant_store, request_data, direction)
+
+    try:
+        # One INSERT ... RETURNING: id and server defaults come back without a refresh
+        [created_order] = await create_objects_bulk_async(
+            db, IncomingOrder, [_incoming_order_values(merchant_store, request_data, direction)]
+        )
+        await db.commit()
+        logger.info(f"Created IncomingOrder ID {created_order.id} for Store ID {merchant_store.id}")
+    except Exception as e:
+        await db.rollback()
+        msg = f"Failed to create IncomingOrder for Store {merchant_store.id}: {e}"
+        logger.error(msg, exc_info=True)
+        raise DatabaseError(msg) from e
+
+    try:
+        await asyncio.to_thread(process_order_task.delay, created_order.id)
+    except Exception as e:
+        # Order is already committed and stays in 'new'; re-enqueue it manually
+        logger.error(f"Failed to enqueue IncomingOrder {created_order.id}: {e}", exc_info=True)
+    return created_order
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+def _enqueue_orders(order_ids: List[int]) -> None:
+    """Publishes processing tasks for all orders over one broker connection."""
+    with process_order_task.app.producer_or_acquire() as producer:
+        for order_id in order_ids:
+            process_order_task.apply_async((order_id,), producer=producer)
+
+async def handle_bulk_init_request_async(
+    api_key: Optional[str],
+    items: List[Dict[str, Any]],
+    direction: str, # "PAYIN" or "PAYOUT"
+    db: AsyncSession
+) -> List[Dict[str, Any]]:
+    """Creates a batch of IncomingOrders for one store.
+
+    - Authenticates once for the whole batch.
+    - Validates every item separately; invalid items are reported, not inserted.
+    - Inserts the valid items with a single multi-row INSERT ... RETURNING.
+    - Enqueues all created orders over a single broker connection.
+
+    Returns:
+        One dict per input item, in request order: index, success and either
+        the created order columns ('order') or an 'error' message.
+
+    Raises:
+        OrderValidationError: If the batch is empty or larger than BULK_INIT_MAX_ITEMS.
+        DatabaseError: If the insert fails (no item is created in that case).
+    """
+    if not items or len(items) > BULK_INIT_MAX_ITEMS:
+        raise OrderValidationError(f"A bulk request must contain 1-{BULK_INIT_MAX_ITEMS} orders.")
+    merchant_store = await _get_merchant_store_by_api_key_async(api_key, db)
+    logger.info(f"Handling bulk {direction} init request ({len(items)} items) for Store ID: {merchant_store.id}")
+
+    results: List[Dict[str, Any]] = []
+    rows: List[Dict[str, Any]] = []
+    row_positions: List[int] = []
+    for index, item in enumerate(items):
+        try:
+            request_data = IncomingOrderCreate.parse_obj(item)
+            _validate_init_request(merchant_store, request_data, direction)
+        except ValidationError as e:
+            results.append({'index': index, 'success': False, 'error': _format_validation_error(e)})
+            continue
+        except JivaPayException as e:
+            results.append({'index': index, 'success': False, 'error': e.message})
+            continue
+        row_positions.append(len(results))
+        results.append({'index': index, 'success': True})
+        rows.append(_incoming_order_values(merchant_store, request_data, direction))
+
+    if not rows:
+        return results
+
+    try:
+        # executemany + RETURNING is sent as multi-row INSERT ... VALUES ... RETURNING
+        # batches; sort_by_parameter_order keeps RETURNING rows aligned with `rows`
+        created = (await db.execute(
+            insert(IncomingOrder).returning(*_BULK_RETURNING, sort_by_parameter_order=True),
+            rows,
+        )).mappings().all()
+        # The Core INSERT bypasses the bulk-write listeners: flag the write so the
+        # client's next reads stick to the primary (read-your-writes)
+        db.sync_session.info["has_writes"] = True
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        msg = f"Failed to create {len(rows)} IncomingOrders for Store {merchant_store.id}: {e}"
+        logger.error(msg, exc_info=True)
+        raise DatabaseError(msg) from e
+
+    for position, row in zip(row_positions, created):
+        results[position]['order'] = dict(row)
+    order_ids = [row['id'] for row in created]
+    logger.info(f"Created {len(order_ids)} IncomingOrders in bulk for Store ID {merchant_store.id}")
+    # Core INSERT bypasses the session listeners: write the status cache through explicitly
+    await asyncio.to_thread(publish_status_events, [build_incoming_projection(row) for row in created])
+
+    try:
+        await asyncio.to_thread(_enqueue_orders, order_ids)
+    except Exception as e:
+        # Orders are already committed and stay in 'new'; re-enqueue them manually
+        logger.error(f"Failed to enqueue bulk IncomingOrders {order_ids}: {e}", exc_info=True)
+    return results
+
 def get_order_status(order_identifier: str, db: Session) -> Any: # Return type depends on desired response schema
     """Retrieves the status details for a given order identifier."""
     logger.debug(f"Getting status for order identifier: {order_identifier}")
@@ -114,27 +323,178 @@ def get_order_status(order_identifier: str, db: Session) -> Any: # Return type d
             return order
     except ValueError:
         pass
-    raise OrderProcessingError(f"Order not found: {order_identifier}", status_code=404)
+    raise OrderNotFound(f"Order not found: {order_identifier}", order_id=order_identifier)
+
+async def get_order_status_async(order_identifier: str, db: AsyncSession) -> Any:
+    """Async variant of `get_order_status`."""
+    logger.debug(f"Getting status for order identifier: {order_identifier}")
+    try:
+        order = (await db.execute(
+            select(OrderHistory).where(OrderHistory.hash_id == order_identifier)
+        )).scalar_one_or_none()
+        if order:
+            return order
+        if order_identifier.isdigit():
+            order = await db.get(IncomingOrder, int(order_identifier))
+            if order:
+                return order
+    except Exception as e:
+        logger.error(f"Error retrieving order {order_identifier}: {e}", exc_info=True)
+        raise DatabaseError(f"Database error while retrieving order {order_identifier}: {e}") from e
+    raise OrderNotFound(f"Order not found: {order_identifier}", order_id=order_identifier)
+
+async def get_order_status_by_client_id_async(api_key: Optional[str], client_id: str, db: AsyncSession) -> Dict[str, Any]:
+    """Status projection of the order the store behind `api_key` created with `client_id`.
+
+    Merchant order ids are only unique per store, so the lookup needs the API key.
+    """
+    merchant_store = await _get_merchant_store_by_api_key_async(api_key, db)
+    projection = await get_status_projection_by_client_id_async(merchant_store.id, client_id, db)
+    if projection is None:
+        raise OrderNotFound(f"Order not found: {client_id}", order_id=client_id)
+    return projection
 
 def handle_client_confirmation(
     order_identifier: str, 
     uploaded_url: Optional[str], 
     db: Session
-) -> None:
-    """Handles the client confirmation action from the gateway."""
+) -> OrderHistory:
+    """Handles the client confirmation action from the gateway.
+
+    The receipt (if any) is already uploaded by the router; only the DB part
+    of the confirmation runs here.
+    """
     logger.info(f"Handling client confirmation for order identifier: {order_identifier}, receipt URL: {uploaded_url}")
     # 1. Retrieve OrderHistory
     oh = get_object_or_none(db, OrderHistory, hash_id=order_identifier)
     if not oh:
-        raise OrderProcessingError(f"Order not found: {order_identifier}", status_code=404)
-    # 2. Permission: merchant
-    # Actor not identified here; assume system actor for gateway
-    from backend.utils.exceptions import AuthorizationError
+        raise OrderNotFound(f"Order not found: {order_identifier}", order_id=order_identifier)
+    # 2. Permission: actor not identified here; assume system actor for gateway
     # 3. Call status manager
-    updated = order_status_manager.confirm_payment_by_client(
-        order_id=oh.id,
-        receipt=uploaded_url.encode('utf-8'),
-        filename=uploaded_url.split('/')[-1],
-        db_session=db
+    updated = order_status_manager.apply_client_confirmation(oh.id, uploaded_url, db)
+    log_event(
+        user_id=None,
+        action='confirm_payment_by_client',
+        target_entity='OrderHistory',
+        target_id=oh.id,
+        details={'receipt_url': uploaded_url}
     )
-    return updated 
\ No newline at end of file
+    return updated
+
+async def handle_client_confirmation_async(
+    order_identifier: str,
+    uploaded_url: Optional[str],
+    db: AsyncSession
+) -> OrderHistory:
+    """Async variant of `handle_client_confirmation`.
+
+    The status transition reuses the sync `apply_client_confirmation` through
+    `AsyncSession.run_sync`; the audit log write (own sync session) runs in a thread.
+    """
+    logger.info(f"Handling client confirmation for order identifier: {order_identifier}, receipt URL: {uploaded_url}")
+    order_id = (await db.execute(
+        select(OrderHistory.id).where(OrderHistory.hash_id == order_identifier)
+    )).scalar_one_or_none()
+    if order_id is None:
+        raise OrderNotFound(f"Order not found: {order_identifier}", order_id=order_identifier)
+    try:
+        updated = await db.run_sync(
+            lambda session: order_status_manager.apply_client_confirmation(order_id, uploaded_url, session)
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    await asyncio.to_thread(
+        log_event,
+        user_id=None,
+        action='confirm_payment_by_client',
+        target_entity='OrderHistory',
+        target_id=order_id,
+        details={'receipt_url': uploaded_url}
+    )
+    return updated
+
+
+def _receipt_key_prefix(order_id: int) -> str:
+    return f"receipts/{order_id}/"
+
+
+async def _get_order_awaiting_receipt_async(order_identifier: str, db: AsyncSession) -> int:
+    row = (await db.execute(
+        select(OrderHistory.id, OrderHistory.status).where(OrderHistory.hash_id == order_identifier)
+    )).one_or_none()
+    if row is None:
+        raise OrderNotFound(f"Order not found: {order_identifier}", order_id=order_identifier)
+    if row.status != 'assigned':
+        raise InvalidOrderStatus(
+            f"Order {order_identifier} is not awaiting a payment confirmation.",
+            order_id=order_identifier, current_status=row.status
+        )
+    return row.id
+
+
+async def issue_receipt_upload_async(
+    order_identifier: str,
+    filename: str,
+    content_type: str,
+    db: AsyncSession
+) -> Dict[str, Any]:
+    """Issues a POST policy for uploading a receipt straight to S3.
+
+    The object key is generated here under the order's prefix, so the client can
+    only write a new object for this order; the receipt bytes never pass through
+    the API process. Signing is local (no S3 round trip).
+
+    Returns:
+        Dict matching `ReceiptUploadTicket`.
+
+    Raises:
+        OrderNotFound, InvalidOrderStatus, OrderValidationError, S3Error
+    """
+    order_id = await _get_order_awaiting_receipt_async(order_identifier, db)
+    if content_type not in RECEIPT_CONTENT_TYPES:
+        raise OrderValidationError(f"Unsupported receipt type '{content_type}'.", order_id=order_identifier)
+    safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename))[-100:] or "receipt"
+    key = f"{_receipt_key_prefix(order_id)}{uuid.uuid4().hex}-{safe_name}"
+    try:
+        post = generate_presigned_post(
+            settings.S3_BUCKET_NAME, key, content_type, RECEIPT_MAX_BYTES, RECEIPT_UPLOAD_TTL_SECONDS
+        )
+    except Exception as e:
+        raise S3Error(f"Could not issue receipt upload for order {order_identifier}.", original_exception=e) from e
+    logger.info(f"Issued receipt upload for order {order_identifier}: {key}")
+    return {
+        'upload_url': post['url'],
+        'fields': post['fields'],
+        'object_key': key,
+        'expires_in': RECEIPT_UPLOAD_TTL_SECONDS,
+        'max_bytes': RECEIPT_MAX_BYTES,
+    }
+
+
+async def complete_receipt_upload_async(
+    order_identifier: str,
+    object_key: str,
+    db: AsyncSession
+) -> OrderHistory:
+    """Confirms the payment once the client has uploaded the receipt to S3.
+
+    Checks that the object belongs to the order and exists (HEAD only, no
+    download), then records it as the client receipt via the regular
+    client confirmation path (UploadedDocument + status transition).
+    """
+    order_id = await _get_order_awaiting_receipt_async(order_identifier, db)
+    if not object_key.startswith(_receipt_key_prefix(order_id)) or ".." in object_key:
+        raise OrderValidationError("Receipt object does not belong to this order.", order_id=order_identifier)
+    try:
+        meta = await asyncio.to_thread(head_object, settings.S3_BUCKET_NAME, object_key)
+    except Exception as e:
+        raise S3Error(f"Could not verify receipt upload for order {order_identifier}.", original_exception=e) from e
+    if meta is None:
+        raise OrderValidationError("Receipt has not been uploaded yet.", order_id=order_identifier)
+    if meta.get('ContentLength', 0) > RECEIPT_MAX_BYTES:
+        raise OrderValidationError("Receipt exceeds the maximum size.", order_id=order_identifier)
+    receipt_url = object_url(settings.S3_BUCKET_NAME, object_key)
+    return await handle_client_confirmation_async(order_identifier, receipt_url, db)
+
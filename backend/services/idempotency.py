@@ -0,0 +1,198 @@
+"""Idempotency-Key support for gateway init requests, backed by Redis.
+
+A request carrying `Idempotency-Key` first claims the key with a short-lived
+in-flight record. When it succeeds, the record is replaced by the response,
+which is kept for `IDEMPOTENCY_TTL_SECONDS` and replayed to retries without
+touching the database. Claiming and reading happen in one Redis round trip.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from redis import RedisError
+
+try:
+    from backend.utils.redis_client import get_async_redis_client
+    from backend.utils.exceptions import (
+        JivaPayException, IdempotencyConflict, IdempotencyKeyReused, IdempotencyUnavailable
+    )
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for idempotency: {e}")
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_REPLAY_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# Must exceed the longest init request; a crashed request frees its key after this
+IDEMPOTENCY_LOCK_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_TTL_SECONDS", "60"))
+# When Redis is down: proceed without deduplication (true) or reject with 503 (false)
+IDEMPOTENCY_FAIL_OPEN = os.getenv("IDEMPOTENCY_FAIL_OPEN", "false").lower() in ("1", "true", "yes")
+# Storing the response is retried: once the in-flight claim expires, a retry would run the request again
+IDEMPOTENCY_COMPLETE_ATTEMPTS = int(os.getenv("IDEMPOTENCY_COMPLETE_ATTEMPTS", "4"))
+IDEMPOTENCY_COMPLETE_RETRY_DELAY_SECONDS = float(os.getenv("IDEMPOTENCY_COMPLETE_RETRY_DELAY_SECONDS", "0.1"))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+_KEY_PREFIX = "idem:"
+
+# Claim the key if free, otherwise return the current record (single round trip)
+_CLAIM_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then return current end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+
+# Replace/delete the record only while we still own the in-flight claim
+_OWNER_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then return 0 end
+if cjson.decode(current)['token'] ~= ARGV[1] then return 0 end
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    body: Any
+
+
+@dataclass(frozen=True)
+class IdempotencyClaim:
+    """Handle returned to the request that owns an Idempotency-Key."""
+    redis_key: str
+    token: str
+    fingerprint: str
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of the request payload, used to detect key reuse with other data."""
+    canonical = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _redis_key(api_key: str, scope: str, idempotency_key: str) -> str:
+    # Keys are scoped per merchant credential and endpoint; raw API keys never reach Redis
+    owner = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+    return f"{_KEY_PREFIX}{owner}:{scope}:{idempotency_key}"
+
+
+async def begin(
+    api_key: str,
+    scope: str,
+    idempotency_key: str,
+    fingerprint: str
+) -> tuple[Optional[IdempotencyClaim], Optional[StoredResponse]]:
+    """Claims `idempotency_key` or returns the response stored for it.
+
+    Returns:
+        (claim, None) if the caller now owns the key and must call `complete` or `release`;
+        (None, stored) if a finished response should be replayed;
+        (None, None) if Redis is unavailable and IDEMPOTENCY_FAIL_OPEN is set.
+
+    Raises:
+        JivaPayException: If the key is empty or too long (400).
+        IdempotencyConflict: If the same key is still in flight.
+        IdempotencyKeyReused: If the key was used with a different payload.
+        IdempotencyUnavailable: If Redis is unavailable and fail-open is disabled.
+    """
+    if not idempotency_key or len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise JivaPayException(f"{IDEMPOTENCY_HEADER} must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters.", status_code=400)
+
+    redis_key = _redis_key(api_key or "", scope, idempotency_key)
+    token = uuid.uuid4().hex
+    record = json.dumps({"state": "in_flight", "token": token, "fp": fingerprint})
+    try:
+        client = get_async_redis_client()
+        if client is None:
+            raise RedisError("REDIS_URL is not configured")
+        current = await client.eval(_CLAIM_SCRIPT, 1, redis_key, record, IDEMPOTENCY_LOCK_TTL_SECONDS)
+    except RedisError as e:
+        metrics.increment("idempotency_requests_total", outcome="unavailable")
+        if IDEMPOTENCY_FAIL_OPEN:
+            logger.warning(f"Idempotency store unavailable, proceeding without deduplication: {e}")
+            return None, None
+        logger.error(f"Idempotency store unavailable: {e}")
+        raise IdempotencyUnavailable(original_exception=e) from e
+
+    if current is None:
+        metrics.increment("idempotency_requests_total", outcome="claimed")
+        return IdempotencyClaim(redis_key, token, fingerprint), None
+
+    existing = json.loads(current)
+    if existing.get("fp") != fingerprint:
+        metrics.increment("idempotency_requests_total", outcome="mismatch")
+        raise IdempotencyKeyReused()
+    if existing.get("state") != "completed":
+        metrics.increment("idempotency_requests_total", outcome="in_flight")
+        raise IdempotencyConflict()
+    metrics.increment("idempotency_requests_total", outcome="replayed")
+    return None, StoredResponse(existing["status_code"], existing["body"])
+
+
+async def complete(claim: Optional[IdempotencyClaim], response: StoredResponse) -> bool:
+    """Stores the response for replay, retrying Redis errors with backoff.
+
+    Failures are logged, not raised: the request already succeeded and committed.
+
+    Returns:
+        True if the response is stored (or there was no claim).
+    """
+    if claim is None:
+        return True
+    record = json.dumps({
+        "state": "completed",
+        "token": claim.token,
+        "fp": claim.fingerprint,
+        "status_code": response.status_code,
+        "body": response.body,
+    }, default=str)
+    delay = IDEMPOTENCY_COMPLETE_RETRY_DELAY_SECONDS
+    for attempt in range(1, IDEMPOTENCY_COMPLETE_ATTEMPTS + 1):
+        try:
+            client = get_async_redis_client()
+            if client is None:
+                raise RedisError("REDIS_URL is not configured")
+            stored = await client.eval(
+                _OWNER_SCRIPT, 1, claim.redis_key, claim.token, record, IDEMPOTENCY_TTL_SECONDS
+            )
+        except RedisError as e:
+            if attempt < IDEMPOTENCY_COMPLETE_ATTEMPTS:
+                logger.warning(f"Failed to store idempotent response for {claim.redis_key} (attempt {attempt}): {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+                continue
+            # A retry after the claim expires creates the order again
+            metrics.increment("idempotency_complete_failures_total")
+            logger.error(f"Failed to store idempotent response for {claim.redis_key} after {attempt} attempts: {e}")
+            return False
+        if not stored:
+            metrics.increment("idempotency_complete_failures_total")
+            logger.warning(f"Idempotency claim expired before completion for {claim.redis_key}")
+            return False
+        return True
+    return False
+
+
+async def release(claim: Optional[IdempotencyClaim]) -> None:
+    """Frees the key after a failed request so the client can retry it."""
+    if claim is None:
+        return
+    try:
+        await get_async_redis_client().eval(_OWNER_SCRIPT, 1, claim.redis_key, claim.token, "", 0)
+    except RedisError as e:
+        # The lock still expires after IDEMPOTENCY_LOCK_TTL_SECONDS
+        logger.error(f"Failed to release idempotency key {claim.redis_key}: {e}")
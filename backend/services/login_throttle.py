@@ -0,0 +1,152 @@
+"""Failed-login throttling per account and per client address.
+
+Checked before any password hashing, so credential stuffing is refused with a
+couple of Redis reads instead of burning a bcrypt verification per attempt.
+Counters live in Redis (shared by every API process) with a local fallback
+when Redis is unavailable; they expire LOGIN_FAILURE_WINDOW_SECONDS after the
+last failure, and a successful login clears the account counter.
+
+The per-address counter needs the real client address. Behind a reverse
+proxy, list the proxies in TRUSTED_PROXIES (addresses or CIDRs, comma
+separated): for requests arriving from one of them the address is taken from
+X-Forwarded-For (the right-most entry that is not a trusted proxy). Without
+it the peer address is used as is, so either set TRUSTED_PROXIES or run
+uvicorn with `--proxy-headers --forwarded-allow-ips=<proxy>`; otherwise every
+client shares the proxy's counter. X-Forwarded-For from untrusted peers is
+ignored, since clients can send any value.
+"""
+
+import hashlib
+import ipaddress
+import logging
+import os
+import threading
+from typing import List, Optional, Tuple, Union
+
+from cachetools import TTLCache
+from redis import RedisError
+
+try:
+    from backend.utils.redis_client import get_redis_client
+    from backend.utils.exceptions import LoginThrottled
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for login_throttle: {e}")
+
+logger = logging.getLogger(__name__)
+
+LOGIN_MAX_FAILURES_PER_ACCOUNT = int(os.getenv("LOGIN_MAX_FAILURES_PER_ACCOUNT", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "30"))
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "900"))
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+
+_REDIS_PREFIX = "login_fail:"
+_local_failures: TTLCache = TTLCache(maxsize=100_000, ttl=LOGIN_FAILURE_WINDOW_SECONDS)
+_local_lock = threading.Lock()
+
+_Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _parse_networks(spec: str) -> List[_Network]:
+    networks: List[_Network] = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.error(f"Ignoring invalid TRUSTED_PROXIES entry '{entry}'")
+    return networks
+
+
+_trusted_networks = _parse_networks(TRUSTED_PROXIES)
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_networks)
+
+
+def resolve_client_ip(peer: Optional[str], forwarded_for: Optional[str]) -> Optional[str]:
+    """Client address for throttling: `peer`, or the X-Forwarded-For hop behind the trusted proxies."""
+    if not peer or not forwarded_for or not _is_trusted(peer):
+        return peer
+    # Each proxy appends the address it received the request from; walk back past our own proxies
+    for hop in reversed([part.strip() for part in forwarded_for.split(",")]):
+        if hop and not _is_trusted(hop):
+            return hop
+    return peer
+
+
+def _keys(account: str, client_ip: Optional[str]) -> List[Tuple[str, int]]:
+    """(counter key, limit) pairs; accounts are hashed so emails never end up in Redis keys."""
+    account_hash = hashlib.sha256(account.strip().lower().encode("utf-8")).hexdigest()
+    keys = [(f"{_REDIS_PREFIX}acct:{account_hash}", LOGIN_MAX_FAILURES_PER_ACCOUNT)]
+    if client_ip:
+        keys.append((f"{_REDIS_PREFIX}ip:{client_ip}", LOGIN_MAX_FAILURES_PER_IP))
+    return keys
+
+
+def check_login_allowed(account: str, client_ip: Optional[str]) -> None:
+    """Refuses the attempt if the account or the address has too many recent failures.
+
+    Raises:
+        LoginThrottled: With `retry_after` set to the remaining window in seconds.
+    """
+    keys = _keys(account, client_ip)
+    counts: List[int] = []
+    client = get_redis_client()
+    if client is not None:
+        try:
+            counts = [int(value or 0) for value in client.mget([key for key, _ in keys])]
+        except RedisError as e:
+            logger.warning(f"Redis MGET failed for login throttling, using local counters: {e}")
+    if not counts:
+        with _local_lock:
+            counts = [_local_failures.get(key, 0) for key, _ in keys]
+
+    for (key, limit), count in zip(keys, counts):
+        if count >= limit:
+            scope = "account" if ":acct:" in key else "ip"
+            metrics.increment("login_throttled_total", scope=scope)
+            retry_after = LOGIN_FAILURE_WINDOW_SECONDS
+            if client is not None:
+                try:
+                    retry_after = max(1, client.ttl(key))
+                except RedisError:
+                    pass
+            raise LoginThrottled(retry_after=retry_after)
+
+
+def record_login_failure(account: str, client_ip: Optional[str]) -> None:
+    """Counts a failed attempt against the account and the address."""
+    keys = [key for key, _ in _keys(account, client_ip)]
+    metrics.increment("login_failures_total")
+    client = get_redis_client()
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key in keys:
+                pipe.incr(key)
+                pipe.expire(key, LOGIN_FAILURE_WINDOW_SECONDS)
+            pipe.execute()
+            return
+        except RedisError as e:
+            logger.warning(f"Redis INCR failed for login throttling, using local counters: {e}")
+    with _local_lock:
+        for key in keys:
+            _local_failures[key] = _local_failures.get(key, 0) + 1
+
+
+def record_login_success(account: str) -> None:
+    """Clears the account's failure counter (the address counter keeps running)."""
+    key = _keys(account, None)[0][0]
+    with _local_lock:
+        _local_failures.pop(key, None)
+    client = get_redis_client()
+    if client is not None:
+        try:
+            client.delete(key)
+        except RedisError as e:
+            logger.warning(f"Redis DELETE failed for login throttling: {e}")
@@ -0,0 +1,325 @@
+"""Cold archive of finished orders in Parquet files.
+
+Completed/canceled orders older than ORDER_ARCHIVE_AFTER_DAYS are moved out of
+Postgres in batches together with their balance history rows, uploaded
+document records and the originating incoming order. Each batch is written as
+one zstd-compressed Parquet file per table, grouped by the order's month:
+
+    <ORDER_ARCHIVE_URI>/<table>/month=YYYY-MM/<first_order_id>-<last_order_id>.parquet
+
+The rows are deleted only after all files of the batch have been written. If
+the delete fails, the next run selects the same orders and overwrites the same
+files, so a batch is never archived twice under different names.
+
+ORDER_ARCHIVE_URI is either a local directory or `s3://bucket/prefix` (the S3
+credentials and endpoint from settings are used). Archived ranges are read
+back with `scan_archive` / `read_archived_orders` without restoring rows.
+
+pyarrow is optional; only this module needs it.
+"""
+
+import logging
+import os
+import posixpath
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, Table, delete, select
+from sqlalchemy.orm import Session
+
+from backend.config.settings import settings
+from backend.database.db import (
+    BalanceStoreHistory,
+    BalanceTraderCryptoHistory,
+    BalanceTraderFiatHistory,
+    IncomingOrder,
+    OrderHistory,
+    UploadedDocument,
+)
+from backend.utils import metrics
+from backend.utils.exceptions import ConfigurationError, S3Error
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:  # Archive is disabled without pyarrow
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+ORDER_ARCHIVE_URI = os.getenv("ORDER_ARCHIVE_URI", "")
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "180"))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "5000"))
+# Upper bound per run so one task does not hold a worker for hours
+ORDER_ARCHIVE_MAX_BATCHES = int(os.getenv("ORDER_ARCHIVE_MAX_BATCHES", "100"))
+ORDER_ARCHIVE_COMPRESSION = os.getenv("ORDER_ARCHIVE_COMPRESSION", "zstd")
+
+ARCHIVABLE_STATUSES = ("completed", "canceled")
+
+ORDERS_TABLE: Table = OrderHistory.__table__
+# Rows archived with each order: table -> column holding the order id
+RELATED_TABLES: Dict[str, Tuple[Table, str]] = {
+    "balance_store_history": (BalanceStoreHistory.__table__, "order_id"),
+    "balance_trader_fiat_history": (BalanceTraderFiatHistory.__table__, "order_id"),
+    "balance_trader_crypto_history": (BalanceTraderCryptoHistory.__table__, "order_id"),
+    "uploaded_documents": (UploadedDocument.__table__, "order_id"),
+}
+INCOMING_TABLE: Table = IncomingOrder.__table__
+ARCHIVED_TABLES: Dict[str, Table] = {
+    ORDERS_TABLE.name: ORDERS_TABLE,
+    INCOMING_TABLE.name: INCOMING_TABLE,
+    **{name: table for name, (table, _) in RELATED_TABLES.items()},
+}
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ConfigurationError("pyarrow is required for the order archive (pip install pyarrow).")
+
+
+def _archive_root() -> Tuple["pafs.FileSystem", str]:
+    """Filesystem and base path for ORDER_ARCHIVE_URI."""
+    _require_pyarrow()
+    if not ORDER_ARCHIVE_URI:
+        raise ConfigurationError("ORDER_ARCHIVE_URI is not set.")
+    if ORDER_ARCHIVE_URI.startswith("s3://"):
+        endpoint = settings.S3_ENDPOINT_URL or ""
+        filesystem = pafs.S3FileSystem(
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            endpoint_override=endpoint.split("://", 1)[-1] or None,
+            scheme="http" if endpoint.startswith("http://") else "https",
+        )
+        return filesystem, ORDER_ARCHIVE_URI[len("s3://"):].rstrip("/")
+    return pafs.LocalFileSystem(), os.path.abspath(ORDER_ARCHIVE_URI)
+
+
+def _arrow_type(column) -> "pa.DataType":
+    column_type = column.type
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Numeric) and column_type.precision is not None:
+        return pa.decimal128(column_type.precision, column_type.scale or 0)
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+
+def arrow_schema(table: Table) -> "pa.Schema":
+    """Arrow schema mirroring the table's columns (unknown types are stored as strings)."""
+    _require_pyarrow()
+    return pa.schema([pa.field(column.name, _arrow_type(column), nullable=column.nullable) for column in table.columns])
+
+
+def _to_arrow(table: Table, rows: Sequence[Dict[str, Any]]) -> "pa.Table":
+    schema = arrow_schema(table)
+    columns = {}
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if pa.types.is_string(field.type):
+            values = [None if value is None else str(value) for value in values]
+        columns[field.name] = values
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def _month_key(value: datetime) -> str:
+    return f"{value:%Y-%m}"
+
+
+def _file_path(root: str, table_name: str, month: str, first_id: int, last_id: int) -> str:
+    return posixpath.join(root, table_name, f"month={month}", f"{first_id}-{last_id}.parquet")
+
+
+def _write_file(filesystem, path: str, table: Table, rows: Sequence[Dict[str, Any]]) -> None:
+    filesystem.create_dir(posixpath.dirname(path), recursive=True)
+    pq.write_table(_to_arrow(table, rows), path, filesystem=filesystem, compression=ORDER_ARCHIVE_COMPRESSION)
+
+
+def _select_batch(db: Session, cutoff: datetime, batch_size: int) -> List[Dict[str, Any]]:
+    orders = ORDERS_TABLE.c
+    statement = (
+        select(ORDERS_TABLE)
+        .where(orders.status.in_(ARCHIVABLE_STATUSES), orders.created_at < cutoff)
+        .order_by(orders.created_at, orders.id)
+        .limit(batch_size)
+        # Parallel runs take disjoint batches
+        .with_for_update(skip_locked=True)
+    )
+    return [dict(row) for row in db.execute(statement).mappings()]
+
+
+def _select_related(db: Session, order_ids: List[int], incoming_ids: List[int]) -> Dict[str, List[Dict[str, Any]]]:
+    related = {}
+    for name, (table, order_column) in RELATED_TABLES.items():
+        statement = select(table).where(table.c[order_column].in_(order_ids)).order_by(table.c.id)
+        related[name] = [dict(row) for row in db.execute(statement).mappings()]
+    statement = select(INCOMING_TABLE).where(INCOMING_TABLE.c.id.in_(incoming_ids)).order_by(INCOMING_TABLE.c.id)
+    related[INCOMING_TABLE.name] = [dict(row) for row in db.execute(statement).mappings()] if incoming_ids else []
+    return related
+
+
+def _delete_batch(db: Session, orders: List[Dict[str, Any]], related: Dict[str, List[Dict[str, Any]]]) -> None:
+    order_ids = [order["id"] for order in orders]
+    # Bounds on the partition key let Postgres prune to the partitions involved
+    oldest, newest = orders[0]["created_at"], orders[-1]["created_at"]
+    for name, (table, order_column) in RELATED_TABLES.items():
+        if related[name]:
+            db.execute(delete(table).where(table.c[order_column].in_(order_ids)))
+    incoming = related[INCOMING_TABLE.name]
+    if incoming:
+        db.execute(delete(INCOMING_TABLE).where(INCOMING_TABLE.c.id.in_([row["id"] for row in incoming])))
+    db.execute(delete(ORDERS_TABLE).where(
+        ORDERS_TABLE.c.id.in_(order_ids),
+        ORDERS_TABLE.c.created_at >= oldest,
+        ORDERS_TABLE.c.created_at <= newest,
+    ))
+
+
+def _write_batch(filesystem, root: str, orders: List[Dict[str, Any]], related: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+    """Writes the batch grouped by order month; related rows follow their order's month."""
+    written = []
+    order_month = {order["id"]: _month_key(order["created_at"]) for order in orders}
+    incoming_month = {order["incoming_order_id"]: order_month[order["id"]] for order in orders if order["incoming_order_id"]}
+    for month, month_orders in groupby(orders, key=lambda order: order_month[order["id"]]):
+        month_orders = list(month_orders)
+        first_id, last_id = month_orders[0]["id"], month_orders[-1]["id"]
+        groups = {ORDERS_TABLE.name: (ORDERS_TABLE, month_orders)}
+        for name, (table, order_column) in RELATED_TABLES.items():
+            groups[name] = (table, [row for row in related[name] if order_month.get(row[order_column]) == month])
+        groups[INCOMING_TABLE.name] = (
+            INCOMING_TABLE, [row for row in related[INCOMING_TABLE.name] if incoming_month.get(row["id"]) == month]
+        )
+        for name, (table, rows) in groups.items():
+            if not rows:
+                continue
+            path = _file_path(root, name, month, first_id, last_id)
+            _write_file(filesystem, path, table, rows)
+            written.append(path)
+    return written
+
+
+def archive_orders(
+    db: Session,
+    older_than_days: int = ORDER_ARCHIVE_AFTER_DAYS,
+    batch_size: int = ORDER_ARCHIVE_BATCH_SIZE,
+    max_batches: int = ORDER_ARCHIVE_MAX_BATCHES,
+    now: Optional[datetime] = None
+) -> int:
+    """
+    Moves finished orders older than `older_than_days` to the archive.
+
+    Each batch is its own transaction: select (FOR UPDATE SKIP LOCKED), write
+    the Parquet files, delete the rows, commit.
+
+    Args:
+        db: Session bound to the primary database.
+        older_than_days: Minimum order age.
+        batch_size: Orders per batch.
+        max_batches: Stop after this many batches (the next run continues).
+        now: Reference time (defaults to the current UTC time).
+
+    Returns:
+        Number of orders archived.
+
+    Raises:
+        ConfigurationError: If pyarrow or ORDER_ARCHIVE_URI is missing.
+        S3Error: If writing the archive files fails; the batch stays in Postgres.
+    """
+    filesystem, root = _archive_root()
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=older_than_days)
+    archived = 0
+    for _ in range(max_batches):
+        orders = _select_batch(db, cutoff, batch_size)
+        if not orders:
+            db.rollback()
+            break
+        order_ids = [order["id"] for order in orders]
+        incoming_ids = [order["incoming_order_id"] for order in orders if order["incoming_order_id"]]
+        related = _select_related(db, order_ids, incoming_ids)
+        try:
+            written = _write_batch(filesystem, root, orders, related)
+        except (OSError, pa.ArrowException) as e:
+            db.rollback()
+            logger.error(f"Failed to write archive batch {order_ids[0]}..{order_ids[-1]}: {e}", exc_info=True)
+            raise S3Error("Failed to write order archive files.", original_exception=e)
+        _delete_batch(db, orders, related)
+        db.commit()
+        archived += len(orders)
+        metrics.increment("order_archive_orders_total", len(orders))
+        logger.info(f"Archived {len(orders)} orders ({order_ids[0]}..{order_ids[-1]}) into {len(written)} file(s).")
+    return archived
+
+
+def _months(start: date, end: date) -> Iterable[str]:
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield f"{year:04d}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def scan_archive(
+    table_name: str,
+    start: datetime,
+    end: datetime,
+    filter: Optional["ds.Expression"] = None,
+    columns: Optional[List[str]] = None
+) -> "pa.Table":
+    """
+    Reads archived rows of `table_name` for orders created in [start, end).
+
+    Only the month directories overlapping the range are listed; `filter` is
+    pushed down to the Parquet row groups. Intended for support lookups and
+    reporting jobs (the result can be handed to pandas/duckdb as is).
+    """
+    if table_name not in ARCHIVED_TABLES:
+        raise ValueError(f"Table '{table_name}' is not archived.")
+    filesystem, root = _archive_root()
+    files = []
+    for month in _months(start.date(), (end - timedelta(microseconds=1)).date()):
+        selector = pafs.FileSelector(posixpath.join(root, table_name, f"month={month}"), allow_not_found=True)
+        files.extend(info.path for info in filesystem.get_file_info(selector) if info.path.endswith(".parquet"))
+    schema = arrow_schema(ARCHIVED_TABLES[table_name])
+    if not files:
+        return schema.empty_table() if columns is None else schema.empty_table().select(columns)
+    dataset = ds.dataset(files, schema=schema, format="parquet", filesystem=filesystem)
+    return dataset.to_table(filter=filter, columns=columns)
+
+
+def read_archived_orders(
+    start: datetime,
+    end: datetime,
+    merchant_id: Optional[int] = None,
+    store_id: Optional[int] = None,
+    trader_id: Optional[int] = None,
+    status: Optional[str] = None,
+    order_id: Optional[int] = None,
+    limit: int = 1000
+) -> List[Dict[str, Any]]:
+    """Archived orders created in [start, end), newest first, as dicts with the OrderHistory columns."""
+    _require_pyarrow()
+    timestamp = pa.timestamp("us", tz="UTC")
+    expression = (ds.field("created_at") >= pa.scalar(start, timestamp)) & (ds.field("created_at") < pa.scalar(end, timestamp))
+    for column, value in (("merchant_id", merchant_id), ("store_id", store_id), ("trader_id", trader_id),
+                          ("status", status), ("id", order_id)):
+        if value is not None:
+            expression = expression & (ds.field(column) == value)
+    table = scan_archive(ORDERS_TABLE.name, start, end, filter=expression)
+    if table.num_rows == 0:
+        return []
+    table = table.take(pc.sort_indices(table, sort_keys=[("created_at", "descending"), ("id", "descending")])[:limit])
+    return table.to_pylist()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from backend.database.engine import SessionLocal
+
+    with SessionLocal() as session:
+        count = archive_orders(session)
+    logger.info(f"Archive run done, {count} order(s) archived.")
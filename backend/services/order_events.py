@@ -0,0 +1,213 @@
+"""Order status change events: published after commit, delivered over Redis pub/sub.
+
+Publishing side (any process - workers, admin API, gateway): session listeners
+collect status changes of OrderHistory / IncomingOrder during flush and publish
+them to Redis once the transaction commits, so subscribers never see a status
+that was rolled back. Commits of an AsyncSession publish from the executor,
+off the event loop.
+
+Subscribing side (async gateway process): a single `OrderStatusBroker` keeps
+one pub/sub connection and fans events out to in-process asyncio queues, so
+thousands of waiting clients cost one Redis subscription and no DB queries.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from cachetools import TTLCache
+from redis import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+try:
+    from backend.database.db import OrderHistory, IncomingOrder
+    from backend.utils.redis_client import get_redis_client, get_async_redis_client
+    from backend.utils import metrics
+    from backend.services import order_status_cache
+    from backend.services.order_status_cache import build_projection
+    from backend.database.utils import register_bulk_write_listener, call_off_loop
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for order_events: {e}")
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_CHANNEL = os.getenv("ORDER_EVENTS_CHANNEL", "order_status_events")
+# Statuses after which no further change is expected; streams close on them
+TERMINAL_STATUSES = frozenset({"completed", "canceled", "failed"})
+
+_PENDING_KEY = "order_events_pending"
+
+
+def publish_status_events(events: List[Dict[str, Any]], committed_at: Optional[float] = None) -> None:
+    """Writes the status cache through and publishes events to Redis.
+
+    Events are status projections (see order_status_cache.build_projection).
+    Delivery is best effort: errors are logged, never raised. Writes through
+    database/utils (`create_objects_bulk`, `update_where`) are collected
+    automatically; call this directly only after committing Core statements
+    that bypass both the unit of work and those helpers.
+
+    Args:
+        events: Projections to publish.
+        committed_at: Commit time stamped on the events; defaults to now.
+    """
+    if not events:
+        return
+    client = get_redis_client()
+    if client is None:
+        return
+    now = committed_at if committed_at is not None else time.time()
+    for evt in events:
+        # Stamp at commit time: the status cache keeps the newest projection per key
+        evt["ts"] = now
+    try:
+        pipe = client.pipeline(transaction=False)
+        order_status_cache.write_projections(events, pipe=pipe)
+        for evt in events:
+            pipe.publish(ORDER_EVENTS_CHANNEL, json.dumps(evt, default=str))
+        pipe.execute()
+        metrics.increment("order_status_events_published_total", value=len(events))
+    except RedisError as e:
+        logger.error(f"Failed to publish {len(events)} order status event(s): {e}")
+
+
+# --- Publishing: session listeners --- #
+
+@event.listens_for(Session, "after_flush")
+def _collect_status_changes(session: Session, flush_context) -> None:
+    pending: Dict[tuple, Dict[str, Any]] = session.info.setdefault(_PENDING_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, (OrderHistory, IncomingOrder)):
+            continue
+        if obj not in session.new and not inspect(obj).attrs.status.history.has_changes():
+            continue
+        # Keep only the last status per order within one transaction
+        pending[(type(obj).__name__, obj.id)] = build_projection(obj)
+
+
+def _collect_bulk_status_changes(session: Session, objects: List[Any], changed: Optional[frozenset]) -> None:
+    # INSERT/UPDATE ... RETURNING helpers in database/utils bypass after_flush
+    if changed is not None and "status" not in changed:
+        return
+    pending: Dict[tuple, Dict[str, Any]] = session.info.setdefault(_PENDING_KEY, {})
+    for obj in objects:
+        if isinstance(obj, (OrderHistory, IncomingOrder)):
+            pending[(type(obj).__name__, obj.id)] = build_projection(obj)
+
+
+register_bulk_write_listener(_collect_bulk_status_changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        # Stamped now, so a publish that runs late in the executor cannot outrank a newer commit
+        call_off_loop(publish_status_events, list(pending.values()), time.time())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- Subscribing: per-process broker --- #
+
+class OrderStatusBroker:
+    """Fans order status events from one Redis subscription out to asyncio queues."""
+
+    def __init__(self, channel: str = ORDER_EVENTS_CHANNEL, last_status_maxsize: int = 100_000, last_status_ttl: int = 3600):
+        self.channel = channel
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Last event seen per key, so late subscribers do not miss a change that just happened
+        self._last: TTLCache = TTLCache(maxsize=last_status_maxsize, ttl=last_status_ttl)
+        self._task: Optional[asyncio.Task] = None
+
+    def last_event(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._last.get(key)
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(), name="order-status-broker")
+
+    async def _listen(self) -> None:
+        backoff = 1.0
+        while True:
+            client = get_async_redis_client()
+            if client is None:
+                logger.warning("REDIS_URL not set; order status broker is idle.")
+                return
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Order status broker subscribed to '{self.channel}'")
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                logger.error(f"Order status broker lost Redis subscription: {e}; retrying in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def _dispatch(self, raw: str) -> None:
+        try:
+            evt = json.loads(raw)
+        except ValueError:
+            logger.warning("Dropping malformed order status event")
+            return
+        metrics.increment("order_status_events_received_total")
+        order_status_cache.remember_local(evt)
+        for key in evt.get("keys", []):
+            self._last[key] = evt
+            for queue in self._subscribers.get(key, ()):
+                try:
+                    queue.put_nowait(evt)
+                except asyncio.QueueFull:
+                    # Slow consumer: it only needs the newest status
+                    queue.get_nowait()
+                    queue.put_nowait(evt)
+
+    @asynccontextmanager
+    async def subscribe(self, key: str, maxsize: int = 16) -> AsyncIterator[asyncio.Queue]:
+        """Registers a queue that receives every event for `key` while the context is open."""
+        self._ensure_started()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.setdefault(key, set()).add(queue)
+        metrics.set_gauge("order_status_subscribers", self.subscriber_count())
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[key]
+            metrics.set_gauge("order_status_subscribers", self.subscriber_count())
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+broker = OrderStatusBroker()
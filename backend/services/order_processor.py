@@ -6,13 +6,13 @@ from decimal import Decimal
 import uuid
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import case, func, select
 
 # Attempt to import models, DB utils, other services, and exceptions
 try:
     # !! Models needed: IncomingOrder, OrderHistory, etc. !!
     from backend.database.db import IncomingOrder, OrderHistory # Add others as needed
-    from backend.database.utils import get_db_session, atomic_transaction, create_object, update_object_db
+    from backend.database.utils import get_db_session, atomic_transaction, create_object, update_object_db, update_where
     from backend.utils.exceptions import (
         RequisiteNotFound, LimitExceeded, OrderProcessingError, DatabaseError, ConfigurationError, FraudDetectedError # Add others
     )
@@ -21,7 +21,9 @@ try:
     from backend.services import requisite_selector, balance_manager, fraud_detector
     from backend.services.fraud_detector import FraudStatus
     # !! Need config loader for retries !!
-    from backend.utils.config_loader import get_typed_config_value
+    from backend.utils.config_loader import get_setting
+    # Registers the session listeners that publish status changes after commit
+    from backend.services import order_events  # noqa: F401
 except ImportError as e:
     raise ImportError(f"Could not import required modules for OrderProcessor: {e}. Ensure models and other services are available.")
 
@@ -43,7 +45,7 @@ def process_incoming_order(incoming_order_id: int):
     logger.info(f"Starting processing for IncomingOrder ID: {incoming_order_id}")
     # 1. Idempotency check: skip if already processed or not in correct status
     with get_db_session() as db_check:
-        existing = db_check.query(OrderHistory).filter(OrderHistory.incoming_order_id == incoming_order_id).one_or_none()
+        existing = db_check.query(OrderHistory.id).filter(OrderHistory.incoming_order_id == incoming_order_id).first()
         if existing:
             logger.warning(f"OrderHistory already exists for IncomingOrder ID {incoming_order_id}. Skipping.")
             return
@@ -70,6 +72,14 @@ def process_incoming_order(incoming_order_id: int):
                 )
                 if not incoming_order:
                     raise OrderProcessingError(f"IncomingOrder not found: {incoming_order_id}")
+                # Re-check under the lock: a redelivered or concurrent task may have processed it meanwhile,
+                # and OrderHistory.incoming_order_id is not unique on the partitioned table
+                if incoming_order.status not in ['new', 'retrying']:
+                    logger.warning(f"IncomingOrder {incoming_order_id} status '{incoming_order.status}' changed before processing. Skipping.")
+                    return
+                if db_main.query(OrderHistory.id).filter(OrderHistory.incoming_order_id == incoming_order_id).first():
+                    logger.warning(f"OrderHistory already exists for IncomingOrder ID {incoming_order_id}. Skipping.")
+                    return
                 # 2.2 Fraud detection
                 fraud_status = FraudStatus.ALLOW
                 try:
@@ -104,6 +114,7 @@ def process_incoming_order(incoming_order_id: int):
                     'merchant_id': incoming_order.merchant_id,
                     'gateway_id': incoming_order.gateway_id,
                     'store_id': incoming_order.store_id,
+                    'client_id': incoming_order.client_id,
                     'method_id': incoming_order.target_method_id,
                     'bank_id': incoming_order.target_bank_id,
                     'crypto_currency_id': incoming_order.crypto_currency_id,
@@ -145,21 +156,18 @@ def process_incoming_order(incoming_order_id: int):
         try:
             with get_db_session() as db_status:
                 with atomic_transaction(db_status):
-                    order_to_update = db_status.query(IncomingOrder).filter_by(id=incoming_order_id).one_or_none()
-                    if not order_to_update:
-                        raise DatabaseError(f"IncomingOrder {incoming_order_id} not found during status update.")
-                    # Determine new status based on retry count
-                    max_retries = get_typed_config_value("MAX_ORDER_RETRIES", db_status, int, default=3)
-                    current_retries = (order_to_update.retry_count or 0)
-                    next_retries = current_retries + 1
-                    new_status = "retrying" if next_retries < max_retries else "failed"
-                    update_data = {
-                        'status': new_status,
+                    # Determine new status based on retry count, in the same UPDATE ... RETURNING
+                    max_retries = get_setting("MAX_ORDER_RETRIES")
+                    next_retries = func.coalesce(IncomingOrder.retry_count, 0) + 1
+                    updated = update_where(db_status, IncomingOrder, {
+                        'status': case((next_retries < max_retries, 'retrying'), else_='failed'),
                         'failure_reason': failure_reason,
                         'retry_count': next_retries,
                         'last_attempt_at': datetime.utcnow()
-                    }
-                    update_object_db(db_status, order_to_update, update_data)
+                    }, IncomingOrder.id == incoming_order_id)
+                    if not updated:
+                        raise DatabaseError(f"IncomingOrder {incoming_order_id} not found during status update.")
+                    new_status = updated[0].status
                     logger.info(f"IncomingOrder {incoming_order_id} status updated to '{new_status}' with reason: {failure_reason}")
         except Exception as status_update_exc:
             logger.critical(
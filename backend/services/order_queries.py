@@ -0,0 +1,189 @@
+"""Read-side queries over OrderHistory / IncomingOrder for the order read models.
+
+The read schemas (shemas_enums/order.py) are filled from column projections
+rather than ORM entities: each query selects only the columns its schema needs,
+labelled with the schema field names, and returns plain `Row` objects. No
+identity map, no relationship loaders, and the IncomingOrder fields of an order
+come from the same statement via an outer join - so a list page is one query
+whatever its size.
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Row, Select, case, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+try:
+    from backend.database.db import IncomingOrder, OrderHistory
+    from backend.database.pagination import keyset_page, split_page
+    from backend.utils.exceptions import DatabaseError, OrderNotFound
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for order_queries: {e}")
+
+logger = logging.getLogger(__name__)
+
+
+def _status_time(status: str):
+    # No per-status timestamps are stored; the last update time while in that status is the closest value
+    return case((OrderHistory.status == status, OrderHistory.updated_at), else_=None)
+
+
+# OrderHistoryRead fields -> OrderHistory (+ its IncomingOrder) columns
+ORDER_HISTORY_READ_COLUMNS = (
+    OrderHistory.id,
+    func.coalesce(OrderHistory.amount_fiat, OrderHistory.total_fiat).label("amount"),
+    OrderHistory.fiat_id.label("currency_id"),
+    OrderHistory.method_id.label("payment_method_id"),
+    OrderHistory.order_type.label("direction"),
+    OrderHistory.customer_id,
+    OrderHistory.client_id,
+    IncomingOrder.return_url,
+    IncomingOrder.callback_url,
+    OrderHistory.store_id.label("merchant_store_id"),
+    OrderHistory.status,
+    OrderHistory.id.label("assigned_order_id"),
+    IncomingOrder.failure_reason,
+    func.coalesce(IncomingOrder.retry_count, 0).label("retry_count"),
+    OrderHistory.created_at,
+    IncomingOrder.last_attempt_at,
+    OrderHistory.requisite_id,
+    OrderHistory.trader_id,
+    OrderHistory.store_commission,
+    OrderHistory.trader_commission,
+    OrderHistory.exchange_rate,
+    OrderHistory.amount_fiat,
+    OrderHistory.amount_crypto,
+    OrderHistory.receipt_url,
+    OrderHistory.trader_receipt_url,
+    OrderHistory.cancellation_reason,
+    _status_time('completed').label("completed_at"),
+    _status_time('canceled').label("canceled_at"),
+    _status_time('disputed').label("disputed_at"),
+)
+
+# IncomingOrderRead fields -> IncomingOrder (+ the OrderHistory assigned to it) columns
+INCOMING_ORDER_READ_COLUMNS = (
+    IncomingOrder.id,
+    func.coalesce(IncomingOrder.amount_fiat, IncomingOrder.amount_crypto).label("amount"),
+    IncomingOrder.fiat_currency_id.label("currency_id"),
+    IncomingOrder.target_method_id.label("payment_method_id"),
+    IncomingOrder.order_type.label("direction"),
+    IncomingOrder.customer_id,
+    IncomingOrder.client_id,
+    IncomingOrder.return_url,
+    IncomingOrder.callback_url,
+    IncomingOrder.store_id.label("merchant_store_id"),
+    IncomingOrder.status,
+    OrderHistory.id.label("assigned_order_id"),
+    IncomingOrder.failure_reason,
+    IncomingOrder.retry_count,
+    IncomingOrder.created_at,
+    IncomingOrder.last_attempt_at,
+)
+
+
+def order_read_statement() -> Select:
+    """SELECT of the OrderHistoryRead columns; add filters/ordering on OrderHistory columns."""
+    return (
+        select(*ORDER_HISTORY_READ_COLUMNS)
+        .select_from(OrderHistory)
+        .outerjoin(IncomingOrder, IncomingOrder.id == OrderHistory.incoming_order_id)
+    )
+
+
+def incoming_order_read_statement() -> Select:
+    """SELECT of the IncomingOrderRead columns; add filters/ordering on IncomingOrder columns."""
+    return (
+        select(*INCOMING_ORDER_READ_COLUMNS)
+        .select_from(IncomingOrder)
+        .outerjoin(OrderHistory, OrderHistory.incoming_order_id == IncomingOrder.id)
+    )
+
+
+def _fetch_one(db: Session, statement: Select, what: str, object_id: int) -> Row:
+    try:
+        row = db.execute(statement).first()
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to read {what} {object_id}: {e}", exc_info=True)
+        raise DatabaseError(f"Database error while reading {what} {object_id}: {e}") from e
+    if row is None:
+        raise OrderNotFound(f"{what} {object_id} not found.")
+    return row
+
+
+def get_order_read(db: Session, order_id: int) -> Row:
+    """
+    OrderHistoryRead projection of one order.
+
+    Raises:
+        OrderNotFound: If the order does not exist.
+        DatabaseError: If the query fails.
+    """
+    statement = order_read_statement().where(OrderHistory.id == order_id)
+    return _fetch_one(db, statement, "Order", order_id)
+
+
+def get_incoming_order_read(db: Session, incoming_order_id: int) -> Row:
+    """
+    IncomingOrderRead projection of one incoming order.
+
+    Raises:
+        OrderNotFound: If the incoming order does not exist.
+        DatabaseError: If the query fails.
+    """
+    statement = incoming_order_read_statement().where(IncomingOrder.id == incoming_order_id)
+    return _fetch_one(db, statement, "IncomingOrder", incoming_order_id)
+
+
+def list_orders_page(
+    db: Session,
+    merchant_id: Optional[int] = None,
+    trader_id: Optional[int] = None,
+    store_id: Optional[int] = None,
+    status: Optional[str] = None,
+    order_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    One page of orders, newest first, for a merchant and/or a trader.
+
+    Uses keyset pagination on (created_at, id) backed by the
+    (merchant_id, created_at, id) / (trader_id, created_at, id) indexes.
+    The created_from/created_to bounds also prune order_history partitions.
+    Rows are OrderHistoryRead projections (see `order_read_statement`).
+
+    Returns:
+        The order rows of the page and the cursor of the next page (None on the last page).
+
+    Raises:
+        InvalidCursor: If `cursor` is malformed.
+        DatabaseError: If the query fails.
+    """
+    statement = order_read_statement()
+    if merchant_id is not None:
+        statement = statement.where(OrderHistory.merchant_id == merchant_id)
+    if trader_id is not None:
+        statement = statement.where(OrderHistory.trader_id == trader_id)
+    if store_id is not None:
+        statement = statement.where(OrderHistory.store_id == store_id)
+    if status:
+        statement = statement.where(OrderHistory.status == status)
+    if order_type:
+        statement = statement.where(OrderHistory.order_type == order_type)
+    if created_from:
+        statement = statement.where(OrderHistory.created_at >= created_from)
+    if created_to:
+        statement = statement.where(OrderHistory.created_at < created_to)
+    statement, limit = keyset_page(statement, OrderHistory.created_at, OrderHistory.id, cursor, limit)
+    try:
+        rows = db.execute(statement).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to list orders (merchant={merchant_id}, trader={trader_id}): {e}", exc_info=True)
+        raise DatabaseError(f"Database error while listing orders: {e}") from e
+    return split_page(rows, limit)
@@ -0,0 +1,237 @@
+"""Compact order status projections cached under every public order identifier.
+
+A projection is a small dict (entity, ids, status, order type, store, timestamp)
+stored in Redis under each identifier a client may use - OrderHistory.hash_id,
+the IncomingOrder id and the merchant's own order id (`client_id`, scoped by
+store, see `client_key`) - so a status read is a single cache hit whatever the
+identifier is. Projections are written through by the order event publisher on
+every committed status change; a DB read only happens on a cache miss.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from redis import RedisError
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    from backend.database.db import OrderHistory, IncomingOrder
+    from backend.utils.redis_client import get_redis_client
+    from backend.utils.tiered_cache import TieredCache
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for order_status_cache: {e}")
+
+logger = logging.getLogger(__name__)
+
+ORDER_STATUS_CACHE_TTL_SECONDS = int(os.getenv("ORDER_STATUS_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Short: other processes learn about changes via the event bus, this only absorbs hot polling
+ORDER_STATUS_LOCAL_TTL_SECONDS = float(os.getenv("ORDER_STATUS_LOCAL_TTL_SECONDS", "2"))
+ORDER_STATUS_LOCAL_MAXSIZE = int(os.getenv("ORDER_STATUS_LOCAL_MAXSIZE", "50000"))
+
+_PREFIX = "order_status:"
+
+_cache = TieredCache(
+    name="order_status",
+    maxsize=ORDER_STATUS_LOCAL_MAXSIZE,
+    ttl=ORDER_STATUS_LOCAL_TTL_SECONDS,
+    redis_ttl=ORDER_STATUS_CACHE_TTL_SECONDS,
+    redis_prefix=_PREFIX,
+)
+
+# Writes a projection under each key unless a newer one is already there. Once an
+# order is assigned, the OrderHistory projection owns the incoming id key.
+_WRITE_SCRIPT = """
+local new = cjson.decode(ARGV[1])
+for _, key in ipairs(KEYS) do
+    local raw = redis.call('GET', key)
+    local write = true
+    if raw then
+        local cur = cjson.decode(raw)
+        if tonumber(cur['ts']) > tonumber(new['ts']) then
+            write = false
+        elseif cur['entity'] == 'order_history' and new['entity'] == 'incoming_order' then
+            write = false
+        end
+    end
+    if write then
+        redis.call('SET', key, ARGV[1], 'EX', ARGV[2])
+    end
+end
+return 1
+"""
+
+
+def client_key(store_id: int, client_id: str) -> str:
+    """Cache key of a merchant order id; only unique within the store that sent it."""
+    return f"client:{store_id}:{client_id}"
+
+
+def order_keys(order: Any) -> List[str]:
+    """Public identifiers of an order: OrderHistory.hash_id, the IncomingOrder id and the store-scoped client_id."""
+    if isinstance(order, OrderHistory):
+        keys = [order.hash_id]
+        if order.incoming_order_id is not None:
+            keys.append(str(order.incoming_order_id))
+    else:
+        keys = [str(order.id)]
+    if order.client_id:
+        keys.append(client_key(order.store_id, order.client_id))
+    return [k for k in keys if k]
+
+
+def build_projection(order: Any, ts: Optional[float] = None) -> Dict[str, Any]:
+    """Builds the status projection of an OrderHistory or IncomingOrder row."""
+    is_history = isinstance(order, OrderHistory)
+    if not is_history:
+        return build_incoming_projection(
+            {
+                "id": order.id, "status": order.status, "order_type": order.order_type,
+                "store_id": order.store_id, "client_id": order.client_id,
+            },
+            ts,
+        )
+    return {
+        "keys": order_keys(order),
+        "entity": "order_history",
+        "order_id": order.id,
+        "incoming_order_id": order.incoming_order_id,
+        "hash_id": order.hash_id,
+        "client_id": order.client_id,
+        "status": order.status,
+        "order_type": order.order_type,
+        "store_id": order.store_id,
+        "ts": ts if ts is not None else time.time(),
+    }
+
+
+def build_incoming_projection(row: Dict[str, Any], ts: Optional[float] = None) -> Dict[str, Any]:
+    """Builds an IncomingOrder projection from column values (e.g. a bulk INSERT ... RETURNING row)."""
+    keys = [str(row["id"])]
+    if row.get("client_id"):
+        keys.append(client_key(row["store_id"], row["client_id"]))
+    return {
+        "keys": keys,
+        "entity": "incoming_order",
+        "order_id": row["id"],
+        "incoming_order_id": row["id"],
+        "hash_id": None,
+        "client_id": row.get("client_id"),
+        "status": row["status"],
+        "order_type": row["order_type"],
+        "store_id": row["store_id"],
+        "ts": ts if ts is not None else time.time(),
+    }
+
+
+def write_projections(projections: Iterable[Dict[str, Any]], pipe=None) -> None:
+    """Writes projections to Redis (newest wins) and to the local tier.
+
+    Args:
+        projections: Projections built by `build_projection`.
+        pipe: Optional Redis pipeline to queue the writes on; executed by the caller.
+    """
+    projections = list(projections)
+    if not projections:
+        return
+    # Incoming orders first, so an OrderHistory from the same transaction takes the shared key
+    projections.sort(key=lambda p: p["entity"] == "order_history")
+    for projection in projections:
+        for key in projection["keys"]:
+            _cache.set_local(key, projection)
+
+    client = pipe if pipe is not None else get_redis_client()
+    if client is None:
+        return
+    try:
+        for projection in projections:
+            keys = [_PREFIX + key for key in projection["keys"]]
+            client.eval(_WRITE_SCRIPT, len(keys), *keys, json.dumps(projection, default=str), ORDER_STATUS_CACHE_TTL_SECONDS)
+    except RedisError as e:
+        logger.error(f"Failed to write {len(projections)} order status projection(s): {e}")
+
+
+def remember_local(projection: Dict[str, Any]) -> None:
+    """Refreshes the in-process tier from an event received over the bus."""
+    for key in projection.get("keys", []):
+        _cache.set_local(key, projection)
+
+
+def _load_sync(order_identifier: str, db: Session) -> Optional[Dict[str, Any]]:
+    # Taken before the query: an event committed while it runs must outrank this read.
+    # A replica may also be up to max_staleness behind.
+    ts = time.time() - db.info.get("max_staleness", 0)
+    order = db.query(OrderHistory).filter(OrderHistory.hash_id == order_identifier).one_or_none()
+    if order is None and order_identifier.isdigit():
+        order = db.get(IncomingOrder, int(order_identifier))
+        if order is not None and order.status == "assigned":
+            # The IncomingOrder id now resolves to its OrderHistory
+            order = db.query(OrderHistory).filter(OrderHistory.incoming_order_id == order.id).one_or_none() or order
+    if order is None:
+        return None
+    return build_projection(order, ts=ts)
+
+
+def _load_by_client_id_sync(store_id: int, client_id: str, db: Session) -> Optional[Dict[str, Any]]:
+    ts = time.time() - db.info.get("max_staleness", 0)
+    # A merchant may reuse its id after a failed attempt: the newest order wins
+    order = (
+        db.query(IncomingOrder)
+        .filter(IncomingOrder.store_id == store_id, IncomingOrder.client_id == client_id)
+        .order_by(IncomingOrder.id.desc())
+        .first()
+    )
+    if order is None:
+        return None
+    if order.status == "assigned":
+        order = db.query(OrderHistory).filter(OrderHistory.incoming_order_id == order.id).first() or order
+    projection = build_projection(order, ts=ts)
+    key = client_key(store_id, client_id)
+    if key not in projection["keys"]:
+        # Histories created before client_id was copied over do not carry it
+        projection["keys"].append(key)
+    return projection
+
+
+def get_status_projection(order_identifier: str, db: Session) -> Optional[Dict[str, Any]]:
+    """Returns the status projection for any public identifier, loading it on a miss."""
+    projection = _cache.get(order_identifier)
+    if projection is not None:
+        return projection
+    projection = _load_sync(order_identifier, db)
+    if projection is not None:
+        write_projections([projection])
+    return projection
+
+
+async def get_status_projection_async(order_identifier: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """Async variant of `get_status_projection`; Redis calls run in a worker thread."""
+    projection = _cache.get_local(order_identifier)
+    if projection is not None:
+        return projection
+    projection = await asyncio.to_thread(_cache.get, order_identifier)
+    if projection is not None:
+        return projection
+    projection = await db.run_sync(lambda session: _load_sync(order_identifier, session))
+    if projection is not None:
+        await asyncio.to_thread(write_projections, [projection])
+    return projection
+
+
+async def get_status_projection_by_client_id_async(store_id: int, client_id: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """Like `get_status_projection_async`, for the merchant's own order id within `store_id`."""
+    key = client_key(store_id, client_id)
+    projection = _cache.get_local(key)
+    if projection is not None:
+        return projection
+    projection = await asyncio.to_thread(_cache.get, key)
+    if projection is not None:
+        return projection
+    projection = await db.run_sync(lambda session: _load_by_client_id_sync(store_id, client_id, session))
+    if projection is not None:
+        await asyncio.to_thread(write_projections, [projection])
+    return projection
@@ -1,5 +1,6 @@
 """Service for managing order status transitions."""
 
+import io
 import logging
 from typing import Optional, Any # Placeholder for User/Actor type
 
@@ -14,13 +15,15 @@ try:
         InvalidOrderStatus, AuthorizationError, DatabaseError, OrderProcessingError
     )
     # !! Need worker task for async balance update !!
-    from backend.worker.tasks import update_balances_task # Assuming this task exists
+    from backend.worker.tasks import update_balance_task
     # !! Need S3 client if handling uploads here !!
     from backend.utils.s3_client import upload_fileobj
     from backend.config.logger import get_logger
     from backend.services.balance_manager import update_balances_for_completed_order
     from backend.config.settings import settings
     from backend.services.audit_logger import log_event
+    # Registers the session listeners that publish status changes after commit
+    from backend.services import order_events  # noqa: F401
 except ImportError as e:
     raise ImportError(f"Could not import required modules for OrderStatusManager: {e}. Ensure models and worker tasks are available.")
 
@@ -42,21 +45,33 @@ VALID_STATUSES_FOR_CLIENT_CONFIRM = ["awaiting_client_confirmation"] # Example
 VALID_STATUSES_FOR_TRADER_CONFIRM = ["awaiting_trader_action", "confirmed_by_client"] # Example
 VALID_STATUSES_FOR_CANCEL = ["pending", "awaiting_client_confirmation", "awaiting_trader_action"] # Example
 
+def _actor_role(actor: Any) -> Optional[str]:
+    """Role name of a User (role relationship) or a Principal (role name)."""
+    role = getattr(actor, 'role', None)
+    return role if isinstance(role, str) or role is None else getattr(role, 'name', None)
+
+def _actor_profile_id(actor: Any, profile: str) -> Optional[int]:
+    """Merchant/trader profile id of a Principal (`<profile>_id`) or a User (`<profile>_profile`)."""
+    profile_id = getattr(actor, f'{profile}_id', None)
+    if profile_id is not None:
+        return profile_id
+    return getattr(getattr(actor, f'{profile}_profile', None), 'id', None)
+
 def _check_permissions(actor: Any, order: OrderHistory, required_role: str) -> None:
     """Placeholder for permission checks."""
-    logger.debug(f"Checking permissions for Actor {getattr(actor, 'id', 'N/A')} (role={getattr(actor, 'role', None)}) on Order {order.id}")
+    logger.debug(f"Checking permissions for Actor {getattr(actor, 'id', 'N/A')} (role={_actor_role(actor)}) on Order {order.id}")
     if not actor:
         raise AuthorizationError("Action requires an authenticated user.")
-    role = getattr(actor.role, 'name', None)
+    role = _actor_role(actor)
     if required_role == 'merchant':
         if role not in ('merchant', 'admin'):
             raise AuthorizationError("Only merchant or admin can perform this action.")
-        if order.merchant_id != getattr(actor.merchant_profile, 'id', None):
+        if order.merchant_id != _actor_profile_id(actor, 'merchant'):
             raise AuthorizationError("Merchant unauthorized for this order.")
     elif required_role == 'trader':
         if role not in ('trader', 'admin'):
             raise AuthorizationError("Only trader or admin can perform this action.")
-        if order.trader_id != getattr(actor.trader_profile, 'id', None):
+        if order.trader_id != _actor_profile_id(actor, 'trader'):
             raise AuthorizationError("Trader unauthorized for this order.")
     elif required_role == 'admin':
         if role != 'admin':
@@ -79,6 +94,49 @@ def _add_uploaded_document(db: Session, order_id: int, actor_id: int, file_url:
         logger.error(f"Failed to save UploadedDocument for order {order_id}: {e}")
         raise DatabaseError(f"Could not save uploaded document: {e}")
 
+def _get_order_for_client_confirmation(db_session: Session, order_id: int) -> OrderHistory:
+    order = db_session.query(OrderHistory).filter_by(id=order_id).one_or_none()
+    if not order:
+        raise InvalidOrderStatus(f"Order with ID {order_id} not found.")
+    if order.status != 'assigned':
+        raise InvalidOrderStatus(f"Order {order_id} is not in 'assigned' status.")
+    return order
+
+def _get_order_for_trader_confirmation(db_session: Session, order_id: int, trader_id: int, lock: bool = False) -> OrderHistory:
+    query = db_session.query(OrderHistory).filter_by(id=order_id)
+    if lock:
+        query = query.with_for_update()
+    order = query.one_or_none()
+    if not order or order.trader_id != trader_id:
+        raise InvalidOrderStatus(f"Order {order_id} not assigned to trader {trader_id}.")
+    if order.status not in ['pending_trader_confirmation', 'pending_client_confirmation']:
+        raise InvalidOrderStatus(f"Order {order_id} is not in confirmation status.")
+    return order
+
+def apply_client_confirmation(
+    order_id: int,
+    receipt_url: Optional[str],
+    db_session: Session
+) -> OrderHistory:
+    """
+    DB part of the client confirmation: validates the status, records the already
+    uploaded receipt and moves the order to 'pending_trader_confirmation'.
+    Does no I/O besides the session, so it can run via AsyncSession.run_sync.
+    """
+    order = _get_order_for_client_confirmation(db_session, order_id)
+    if receipt_url:
+        # Save uploaded document record
+        _add_uploaded_document(db_session, order_id, None, receipt_url, 'client_receipt')
+
+    # Update order fields
+    order.status = 'pending_trader_confirmation'
+    order.payment_details_submitted = True
+    order.receipt_url = receipt_url  # Ensure this column exists in model
+    db_session.add(order)
+    db_session.flush()
+    logger.info(f"Order {order_id} updated to 'pending_trader_confirmation', receipt: {receipt_url}")
+    return order
+
 def confirm_payment_by_client(
     order_id: int,
     receipt: bytes,
@@ -87,28 +145,18 @@ def confirm_payment_by_client(
 ) -> OrderHistory:
     """
     Updates OrderHistory after merchant client confirms payment and uploads receipt.
-    Uploads receipt to S3, updates order status to 'pending_trader_confirmation'.
+    Uploads receipt to S3, updates order status to 'pending_trader_confirmation'
+    and commits.
     """
-    order = db_session.query(OrderHistory).filter_by(id=order_id).one_or_none()
-    if not order:
-        raise InvalidOrderStatus(f"Order with ID {order_id} not found.")
-    if order.status != 'assigned':
-        raise InvalidOrderStatus(f"Order {order_id} is not in 'assigned' status.")
+    _get_order_for_client_confirmation(db_session, order_id)
 
     # Upload receipt to S3
     bucket = settings.S3_BUCKET_NAME
     key = f"receipts/{order_id}/{filename}"
-    receipt_url = upload_fileobj(receipt, bucket, key)
-    # Save uploaded document record
-    _add_uploaded_document(db_session, order_id, None, receipt_url, 'client_receipt')
+    receipt_url = upload_fileobj(io.BytesIO(receipt), bucket, key)
 
-    # Update order fields
-    order.status = 'pending_trader_confirmation'
-    order.payment_details_submitted = True
-    order.receipt_url = receipt_url  # Ensure this column exists in model
-    db_session.add(order)
-    db_session.flush()
-    logger.info(f"Order {order_id} updated to 'pending_trader_confirmation', receipt uploaded: {receipt_url}")
+    with atomic_transaction(db_session):
+        order = apply_client_confirmation(order_id, receipt_url, db_session)
     # Audit log
     log_event(
         user_id=None,
@@ -128,26 +176,34 @@ def confirm_order_by_trader(
 ) -> OrderHistory:
     """
     Confirms order by trader, uploads receipt if needed, updates status and triggers balance update.
+
+    The status change, the document record and the balance update are committed
+    together (by `update_balances_for_completed_order`) or rolled back together.
     """
-    order = db_session.query(OrderHistory).filter_by(id=order_id).one_or_none()
-    if not order or order.trader_id != trader_id:
-        raise InvalidOrderStatus(f"Order {order_id} not assigned to trader {trader_id}.")
-    if order.status not in ['pending_trader_confirmation', 'pending_client_confirmation']:
-        raise InvalidOrderStatus(f"Order {order_id} is not in confirmation status.")
+    _get_order_for_trader_confirmation(db_session, order_id, trader_id)
 
     # Upload receipt for PayOut if provided
     bucket = settings.S3_BUCKET_NAME
     key = f"receipts/{order_id}/{filename}"
-    receipt_url = upload_fileobj(receipt, bucket, key)
-    # Save uploaded document record
-    _add_uploaded_document(db_session, order_id, trader_id, receipt_url, 'trader_receipt')
-    
-    # Update order
-    order.status = 'completed'
-    order.payment_details_submitted = True
-    order.trader_receipt_url = receipt_url  # Ensure this column exists in model
-    db_session.add(order)
-    db_session.flush()
+    receipt_url = upload_fileobj(io.BytesIO(receipt), bucket, key)
+
+    try:
+        # Re-checked under the row lock: a concurrent confirmation must not complete the order twice
+        order = _get_order_for_trader_confirmation(db_session, order_id, trader_id, lock=True)
+        # Save uploaded document record
+        _add_uploaded_document(db_session, order_id, trader_id, receipt_url, 'trader_receipt')
+
+        # Update order
+        order.status = 'completed'
+        order.payment_details_submitted = True
+        order.trader_receipt_url = receipt_url  # Ensure this column exists in model
+        db_session.add(order)
+        db_session.flush()
+    except Exception:
+        db_session.rollback()
+        raise
+    # Commits the pending status change with the balances (rolls everything back on failure)
+    update_balances_for_completed_order(order_id, db_session)
     logger.info(f"Order {order_id} confirmed by trader {trader_id}, receipt uploaded: {receipt_url}")
     # Audit log
     log_event(
@@ -157,8 +213,6 @@ def confirm_order_by_trader(
         target_id=order_id,
         details={'receipt_url': receipt_url}
     )
-    # Trigger balance update asynchronously, here a direct call
-    update_balances_for_completed_order(order_id, db_session)
     return order
 
 def cancel_order(
@@ -174,7 +228,7 @@ def cancel_order(
         if not order:
             raise OrderProcessingError(f"Order not found: {order_id}")
         # Permission: merchant, trader or admin
-        role = getattr(actor.role, 'name', None)
+        role = _actor_role(actor)
         required = 'merchant' if role == 'merchant' else ('trader' if role=='trader' else 'admin')
         _check_permissions(actor, order, required)
         # Status check
@@ -201,7 +255,7 @@ def dispute_order(order_id: int, actor: Any, reason: str, db: Session) -> OrderH
         order = db.query(OrderHistory).filter_by(id=order_id).with_for_update().one_or_none()
         if not order:
             raise OrderProcessingError(f"Order not found: {order_id}")
-        _check_permissions(actor, order, 'support' if getattr(actor.role, 'name', '')=='support' else 'admin')
+        _check_permissions(actor, order, 'support' if _actor_role(actor)=='support' else 'admin')
         if order.status in ['completed', 'canceled', 'failed', 'disputed']:
             raise InvalidOrderStatus(f"Order {order_id} cannot be disputed from status {order.status}.")
         updated = update_object_db(db, order, {'status': 'disputed', 'cancellation_reason': reason})
@@ -0,0 +1,357 @@
+"""Cache of authenticated principals keyed by JWT subject.
+
+Every authenticated merchant/trader/support call resolves the token subject
+to a user and then to the role profile. This module keeps that result - user
+id, role, active flag and profile ids, loaded with a single query - in a
+`TieredCache`, so a cache hit authenticates without touching the database.
+
+Entries are invalidated after commit when a user is deactivated, changes role
+or email, or is deleted, and when a merchant/trader/support profile is added
+or removed (the user is looked up by id after commit). Every cached subject is
+also indexed by user id, so a subject that is no longer the user's email (a
+rename through `update_where`, which keeps no history) is still evicted.
+Invalidations are broadcast on PRINCIPAL_EVENTS_CHANNEL and applied to the
+local tier of every process by a listener thread. Anything else is bounded by
+the cache TTL.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from cachetools import TTLCache
+from redis import RedisError
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+try:
+    from backend.database.db import User, Role, Merchant, Trader, Support
+    from backend.utils.tiered_cache import TieredCache
+    from backend.utils.exceptions import DatabaseError
+    from backend.database.utils import get_db_session, register_bulk_write_listener
+    from backend.utils.redis_client import get_redis_client, REDIS_URL
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for principal_cache: {e}")
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", "10000"))
+PRINCIPAL_CACHE_REDIS_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_REDIS_TTL_SECONDS", "300"))
+PRINCIPAL_CACHE_USE_REDIS = os.getenv("PRINCIPAL_CACHE_USE_REDIS", "true").lower() in ("1", "true", "yes")
+PRINCIPAL_EVENTS_CHANNEL = os.getenv("PRINCIPAL_EVENTS_CHANNEL", "principal_invalidations")
+# Bump when the Principal fields change, so old Redis entries are ignored
+PRINCIPAL_CACHE_VERSION = 1
+
+# User attributes whose change must evict the cached principal
+_INVALIDATING_ATTRS = ("email", "is_active", "role_id")
+_PROFILE_MODELS = (Merchant, Trader, Support)
+_PENDING_KEY = "principal_cache_pending"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only projection of an authenticated user and its role profiles.
+
+    `id` is the user id, so a Principal can stand in for a `User` actor in the
+    status services (see order_status_manager._check_permissions).
+    """
+    id: int
+    email: str
+    role_id: int
+    role: Optional[str]
+    is_active: bool
+    merchant_id: Optional[int] = None
+    trader_id: Optional[int] = None
+    support_id: Optional[int] = None
+
+
+_cache = TieredCache(
+    name="principal",
+    maxsize=PRINCIPAL_CACHE_MAXSIZE,
+    ttl=PRINCIPAL_CACHE_TTL_SECONDS,
+    redis_ttl=PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+    redis_prefix=f"principal:v{PRINCIPAL_CACHE_VERSION}:",
+    use_redis=PRINCIPAL_CACHE_USE_REDIS,
+    serializer=asdict,
+    deserializer=lambda data: Principal(**data),
+)
+
+
+# user id -> cache keys of the subjects cached for that user (this process; Redis holds the shared copy)
+_user_keys: TTLCache = TTLCache(maxsize=PRINCIPAL_CACHE_MAXSIZE, ttl=PRINCIPAL_CACHE_REDIS_TTL_SECONDS)
+_user_keys_lock = threading.Lock()
+
+
+def _cache_key(subject: str) -> str:
+    # Emails never end up in Redis keys in clear text
+    return hashlib.sha256(subject.encode("utf-8")).hexdigest()
+
+
+def _user_index_key(user_id: int) -> str:
+    return f"{_cache.redis_prefix}user:{user_id}"
+
+
+def _remember(key: str, principal: Principal) -> None:
+    """Caches `principal` under `key` and indexes the key by user id."""
+    _cache.set(key, principal)
+    with _user_keys_lock:
+        keys = _user_keys.get(principal.id) or set()
+        _user_keys[principal.id] = keys | {key}
+    client = get_redis_client() if PRINCIPAL_CACHE_USE_REDIS else None
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd(_user_index_key(principal.id), key)
+        pipe.expire(_user_index_key(principal.id), PRINCIPAL_CACHE_REDIS_TTL_SECONDS)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Failed to index cached principal by user id: {e}")
+
+
+def _keys_for_users(user_ids: Iterable[int]) -> Set[str]:
+    """Cache keys indexed for `user_ids`, removing the index entries."""
+    keys: Set[str] = set()
+    user_ids = sorted(set(user_ids))
+    with _user_keys_lock:
+        for user_id in user_ids:
+            keys.update(_user_keys.pop(user_id, None) or ())
+    client = get_redis_client() if PRINCIPAL_CACHE_USE_REDIS else None
+    if client is None or not user_ids:
+        return keys
+    try:
+        pipe = client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.smembers(_user_index_key(user_id))
+        for members in pipe.execute():
+            keys.update(members)
+        client.delete(*(_user_index_key(user_id) for user_id in user_ids))
+    except RedisError as e:
+        logger.warning(f"Failed to read the principal user index: {e}")
+    return keys
+
+
+def _principal_query(subject: str):
+    return (
+        select(
+            User.id,
+            User.email,
+            User.role_id,
+            Role.name.label("role"),
+            User.is_active,
+            Merchant.id.label("merchant_id"),
+            Trader.id.label("trader_id"),
+            Support.id.label("support_id"),
+        )
+        .select_from(User)
+        .outerjoin(Role, Role.id == User.role_id)
+        .outerjoin(Merchant, Merchant.user_id == User.id)
+        .outerjoin(Trader, Trader.user_id == User.id)
+        .outerjoin(Support, Support.user_id == User.id)
+        .where(User.email == subject)
+    )
+
+
+def get_principal(subject: str, db: Session) -> Optional[Principal]:
+    """Returns the principal for a token subject (user email), loading it from the DB on a miss.
+
+    Unknown subjects are not cached, so a newly registered user can log in immediately.
+
+    Raises:
+        DatabaseError: If the lookup query fails.
+    """
+    ensure_invalidation_listener()
+    key = _cache_key(subject)
+    principal = _cache.get(key)
+    if principal is not None:
+        return principal
+
+    try:
+        row = db.execute(_principal_query(subject)).first()
+    except Exception as e:
+        logger.error(f"Error loading principal for token subject: {e}", exc_info=True)
+        raise DatabaseError(f"Error loading principal for token subject: {e}") from e
+
+    if row is None:
+        return None
+    principal = Principal(**row._asdict())
+    _remember(key, principal)
+    return principal
+
+
+def _evict_keys(keys: Iterable[str]) -> None:
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    _cache.invalidate(*keys)
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.publish(PRINCIPAL_EVENTS_CHANNEL, json.dumps({"keys": keys}))
+    except RedisError as e:
+        logger.error(f"Failed to broadcast principal invalidation: {e}", exc_info=True)
+
+
+def invalidate_principal(*subjects: str) -> None:
+    """Evicts the cached principals of the given token subjects (user emails) from Redis and every process."""
+    _evict_keys(_cache_key(s) for s in subjects if s)
+
+
+def invalidate_principals_of_users(*user_ids: int) -> None:
+    """Evicts every cached principal of the given users, whatever subject it was cached under.
+
+    Looks the users' current emails up with a primary session; call after commit.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id})
+    if not user_ids:
+        return
+    keys = _keys_for_users(user_ids)
+    try:
+        with get_db_session() as db:
+            emails = db.execute(select(User.email).where(User.id.in_(user_ids))).scalars().all()
+        keys.update(_cache_key(email) for email in emails if email)
+    except Exception as e:
+        logger.error(f"Failed to look up users {user_ids} for principal invalidation: {e}")
+    _evict_keys(keys)
+
+
+def _handle_invalidation(raw: str) -> None:
+    try:
+        keys: List[str] = json.loads(raw).get("keys", [])
+    except (ValueError, AttributeError):
+        logger.warning("Dropping malformed principal invalidation")
+        return
+    metrics.increment("principal_invalidations_received_total")
+    _cache.invalidate_local(*keys)
+
+
+class _InvalidationListener(threading.Thread):
+    """Daemon thread applying invalidations published by other processes to the local tier."""
+
+    def __init__(self):
+        super().__init__(name="principal-invalidations", daemon=True)
+
+    def run(self) -> None:
+        backoff = 1.0
+        while True:
+            client = get_redis_client()
+            if client is None:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(PRINCIPAL_EVENTS_CHANNEL)
+                # Messages sent while disconnected are lost; start from a clean local tier
+                _cache.clear_local()
+                logger.info(f"Principal cache subscribed to '{PRINCIPAL_EVENTS_CHANNEL}'")
+                backoff = 1.0
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        _handle_invalidation(message["data"])
+            except (RedisError, OSError) as e:
+                logger.error(f"Principal cache listener lost Redis subscription: {e}; retrying in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+_listener: Optional[_InvalidationListener] = None
+_listener_lock = threading.Lock()
+
+
+def ensure_invalidation_listener() -> None:
+    """Starts the listener on first use in this process (also after a fork, e.g. Celery prefork)."""
+    global _listener
+    if not REDIS_URL or (_listener is not None and _listener.is_alive()):
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = _InvalidationListener()
+            _listener.start()
+
+
+# --- Invalidation on user / profile changes --- #
+
+def _user_emails(session: Session, user_id: Optional[int]) -> Set[str]:
+    """Current and pre-flush emails of a user in the identity map (no SQL may run from inside a flush event)."""
+    user = session.identity_map.get(inspect(User).identity_key_from_primary_key((user_id,))) if user_id else None
+    if user is None:
+        return set()
+    history = inspect(user).attrs.email.history
+    return {e for e in (user.email, *history.deleted) if e}
+
+
+def _pending(session: Session) -> Dict[str, Set]:
+    return session.info.setdefault(_PENDING_KEY, {"subjects": set(), "user_ids": set()})
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session: Session, flush_context) -> None:
+    """Remembers subjects (and users whose profiles changed) in this flush."""
+    pending = _pending(session)["subjects"]
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        changed = obj in session.deleted or any(
+            state.attrs[attr].history.has_changes() for attr in _INVALIDATING_ATTRS
+        )
+        if not changed:
+            continue
+        # Old email (renamed subject) and current email both have to go
+        email_history = state.attrs.email.history
+        pending.update(e for e in email_history.deleted if e)
+        pending.update(e for e in email_history.unchanged if e)
+        pending.update(e for e in email_history.added if e)
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, _PROFILE_MODELS):
+            pending.update(_user_emails(session, obj.user_id))
+            # The user may not be loaded in this session: resolved by id after commit
+            _pending(session)["user_ids"].add(obj.user_id)
+
+
+def _collect_bulk_user_changes(session: Session, objects, changed) -> None:
+    """Same for rows written by `create_objects_bulk` / `update_where` (no unit-of-work history)."""
+    pending = _pending(session)
+    for obj in objects:
+        if isinstance(obj, User) and changed is not None and changed.intersection(_INVALIDATING_ATTRS):
+            pending["subjects"].add(obj.email)
+            if "email" in changed:
+                # The old email is gone from the refreshed object; the user index still has its key
+                pending["user_ids"].add(obj.id)
+        elif isinstance(obj, _PROFILE_MODELS) and changed is None:
+            pending["subjects"].update(_user_emails(session, obj.user_id))
+            pending["user_ids"].add(obj.user_id)
+
+
+register_bulk_write_listener(_collect_bulk_user_changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if pending["subjects"]:
+        logger.debug(f"Invalidating {len(pending['subjects'])} cached principal(s) after commit")
+        invalidate_principal(*pending["subjects"])
+    if pending["user_ids"]:
+        invalidate_principals_of_users(*pending["user_ids"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
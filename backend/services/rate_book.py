@@ -0,0 +1,293 @@
+"""In-memory exchange rate book shared by every process.
+
+The book is an immutable snapshot of all current rates, keyed by
+(crypto code, fiat code) and by currency ids. Readers take the module-level
+reference, which is replaced as a whole when a new book arrives, so a reader
+never sees a half-updated book and order creation converts amounts without a
+DB or Redis round trip.
+
+The rate ingestion worker (services/rate_ingestion.py) stores each new book
+in Redis under RATE_BOOK_KEY and publishes it on RATE_BOOK_CHANNEL. Every
+process runs a listener thread that swaps its book on those messages. At
+startup, or after the subscription is lost, the book is reloaded from Redis,
+or from the exchange_rates table if Redis has none.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Optional, Tuple
+
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    from backend.database.db import ExchangeRate, FiatCurrency, CryptoCurrency
+    from backend.database.utils import get_db_session
+    from backend.utils.redis_client import get_redis_client, REDIS_URL
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for rate_book: {e}")
+
+logger = logging.getLogger(__name__)
+
+RATE_BOOK_KEY = os.getenv("RATE_BOOK_KEY", "rates:book")
+RATE_BOOK_CHANNEL = os.getenv("RATE_BOOK_CHANNEL", "rates:book_updates")
+# Quotes older than this are not used for conversions
+RATE_MAX_AGE_SECONDS = float(os.getenv("RATE_MAX_AGE_SECONDS", "900"))
+# Minimum interval between load attempts from the request path while no book is loaded
+RATE_BOOK_RETRY_SECONDS = float(os.getenv("RATE_BOOK_RETRY_SECONDS", "10"))
+
+_CRYPTO_QUANT = Decimal("0.00000001")
+_FIAT_QUANT = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class RateQuote:
+    """Current rate of one crypto/fiat pair (codes as stored in exchange_rates)."""
+    currency: str
+    fiat: str
+    buy_rate: Decimal
+    sell_rate: Decimal
+    median_rate: Decimal
+    source: str
+    updated_at: datetime
+    id: Optional[int] = None
+
+    def is_fresh(self, max_age: float = RATE_MAX_AGE_SECONDS) -> bool:
+        return (datetime.now(timezone.utc) - self.updated_at).total_seconds() <= max_age
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "currency": self.currency,
+            "fiat": self.fiat,
+            "buy_rate": str(self.buy_rate),
+            "sell_rate": str(self.sell_rate),
+            "median_rate": str(self.median_rate),
+            "source": self.source,
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RateQuote":
+        updated_at = datetime.fromisoformat(data["updated_at"])
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return cls(
+            currency=data["currency"],
+            fiat=data["fiat"],
+            buy_rate=Decimal(data["buy_rate"]),
+            sell_rate=Decimal(data["sell_rate"]),
+            median_rate=Decimal(data["median_rate"]),
+            source=data["source"],
+            updated_at=updated_at,
+            id=data.get("id"),
+        )
+
+
+@dataclass(frozen=True)
+class RateBook:
+    """Immutable set of quotes plus the currency id -> code maps needed to look them up by id."""
+    quotes: Dict[Tuple[str, str], RateQuote] = field(default_factory=dict)
+    crypto_codes: Dict[int, str] = field(default_factory=dict)
+    fiat_codes: Dict[int, str] = field(default_factory=dict)
+    built_at: float = 0.0
+
+    def get(self, currency: str, fiat: str) -> Optional[RateQuote]:
+        return self.quotes.get((currency.upper(), fiat.upper()))
+
+    def get_by_ids(self, crypto_currency_id: int, fiat_currency_id: int) -> Optional[RateQuote]:
+        currency = self.crypto_codes.get(crypto_currency_id)
+        fiat = self.fiat_codes.get(fiat_currency_id)
+        if currency is None or fiat is None:
+            return None
+        return self.get(currency, fiat)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "quotes": [quote.to_dict() for quote in self.quotes.values()],
+            "crypto_codes": self.crypto_codes,
+            "fiat_codes": self.fiat_codes,
+            "built_at": self.built_at,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "RateBook":
+        data = json.loads(raw)
+        quotes = [RateQuote.from_dict(item) for item in data.get("quotes", [])]
+        return cls(
+            quotes={(quote.currency.upper(), quote.fiat.upper()): quote for quote in quotes},
+            # JSON object keys are strings
+            crypto_codes={int(k): v for k, v in data.get("crypto_codes", {}).items()},
+            fiat_codes={int(k): v for k, v in data.get("fiat_codes", {}).items()},
+            built_at=data.get("built_at", 0.0),
+        )
+
+
+def load_rate_book_from_db(db: Session) -> RateBook:
+    """Builds a book from the exchange_rates table (three queries)."""
+    quotes: Dict[Tuple[str, str], RateQuote] = {}
+    for rate in db.execute(select(ExchangeRate)).scalars():
+        updated_at = rate.updated_at or datetime.now(timezone.utc)
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        quotes[(rate.currency.upper(), rate.fiat.upper())] = RateQuote(
+            currency=rate.currency,
+            fiat=rate.fiat,
+            buy_rate=rate.buy_rate,
+            sell_rate=rate.sell_rate,
+            median_rate=rate.median_rate,
+            source=rate.source,
+            updated_at=updated_at,
+            id=rate.id,
+        )
+    crypto_codes = dict(db.execute(select(CryptoCurrency.id, CryptoCurrency.currency_code)).tuples().all())
+    fiat_codes = dict(db.execute(select(FiatCurrency.id, FiatCurrency.currency_code)).tuples().all())
+    return RateBook(quotes=quotes, crypto_codes=crypto_codes, fiat_codes=fiat_codes, built_at=time.time())
+
+
+_book = RateBook()
+_loaded = False
+_last_load_attempt: Optional[float] = None
+_load_attempt_lock = threading.Lock()
+
+
+def swap_rate_book(book: RateBook) -> None:
+    """Replaces this process's book (a single reference assignment, atomic for readers)."""
+    global _book, _loaded
+    _book = book
+    _loaded = True
+    metrics.set_gauge("rate_book_pairs", len(book.quotes))
+
+
+def current_rate_book() -> RateBook:
+    """This process's book as it is now; never does I/O (empty until loaded)."""
+    return _book
+
+
+def load_rate_book() -> RateBook:
+    """Loads the shared book from Redis, or from the DB if Redis has none, and installs it."""
+    client = get_redis_client()
+    if client is not None:
+        try:
+            raw = client.get(RATE_BOOK_KEY)
+            if raw:
+                book = RateBook.from_json(raw)
+                swap_rate_book(book)
+                return book
+        except (RedisError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load rate book from Redis, falling back to the DB: {e}")
+    with get_db_session() as db:
+        book = load_rate_book_from_db(db)
+    swap_rate_book(book)
+    return book
+
+
+def get_rate_book() -> RateBook:
+    """The current book, loading it on first use in this process.
+
+    While no book could be loaded, at most one caller per RATE_BOOK_RETRY_SECONDS
+    tries again (the others get the empty book); the listener also reloads on
+    every (re)subscribe, so an outage does not turn each request into a DB query.
+    """
+    global _last_load_attempt
+    ensure_rate_book_listener()
+    if _loaded:
+        return _book
+    now = time.monotonic()
+    if _last_load_attempt is not None and now - _last_load_attempt < RATE_BOOK_RETRY_SECONDS:
+        return _book
+    if not _load_attempt_lock.acquire(blocking=False):
+        return _book
+    try:
+        if not _loaded:
+            _last_load_attempt = now
+            return load_rate_book()
+    except Exception as e:
+        logger.error(f"Failed to load rate book, retrying in {RATE_BOOK_RETRY_SECONDS:.0f}s: {e}")
+    finally:
+        _load_attempt_lock.release()
+    return _book
+
+
+def preload_rate_book() -> None:
+    """Loads the book and starts the listener at process startup. Failures are only logged."""
+    try:
+        get_rate_book()
+    except Exception as e:
+        logger.error(f"Rate book preload failed: {e}")
+
+
+def convert_fiat_to_crypto(amount_fiat: Decimal, rate: Decimal) -> Decimal:
+    """Crypto amount for `amount_fiat` at `rate` (fiat per crypto unit), 8 decimal places."""
+    return (amount_fiat / rate).quantize(_CRYPTO_QUANT, rounding=ROUND_HALF_UP)
+
+
+def convert_crypto_to_fiat(amount_crypto: Decimal, rate: Decimal) -> Decimal:
+    """Fiat amount for `amount_crypto` at `rate`, 2 decimal places."""
+    return (amount_crypto * rate).quantize(_FIAT_QUANT, rounding=ROUND_HALF_UP)
+
+
+class _RateBookListener(threading.Thread):
+    """Daemon thread installing books published by the ingestion worker."""
+
+    def __init__(self):
+        super().__init__(name="rate-book-updates", daemon=True)
+
+    def run(self) -> None:
+        backoff = 1.0
+        while True:
+            client = get_redis_client()
+            if client is None:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(RATE_BOOK_CHANNEL)
+                # Updates sent while disconnected are lost; reload the latest book
+                try:
+                    load_rate_book()
+                except Exception as e:
+                    logger.error(f"Rate book reload after subscribe failed: {e}")
+                logger.info(f"Rate book subscribed to '{RATE_BOOK_CHANNEL}'")
+                backoff = 1.0
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        swap_rate_book(RateBook.from_json(message["data"]))
+                        metrics.increment("rate_book_updates_received_total")
+                    except (ValueError, KeyError) as e:
+                        logger.warning(f"Dropping malformed rate book update: {e}")
+            except (RedisError, OSError) as e:
+                logger.error(f"Rate book listener lost Redis subscription: {e}; retrying in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+_listener: Optional[_RateBookListener] = None
+_listener_lock = threading.Lock()
+
+
+def ensure_rate_book_listener() -> None:
+    """Starts the listener on first use in this process (also after a fork, e.g. Celery prefork)."""
+    global _listener
+    if not REDIS_URL or (_listener is not None and _listener.is_alive()):
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = _RateBookListener()
+            _listener.start()
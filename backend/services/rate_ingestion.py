@@ -0,0 +1,238 @@
+"""Exchange rate ingestion: pulls quotes from pluggable sources and publishes a new rate book.
+
+One run (scheduled by Celery beat, see worker/tasks.py):
+
+1. fetches raw quotes from every configured source (a failing source is skipped),
+2. takes the median price per pair across sources and applies the buy/sell spreads,
+3. upserts the exchange_rates rows in one transaction,
+4. stores the resulting book in Redis and publishes it, so every process
+   swaps its in-memory book (services/rate_book.py).
+
+Sources are configured with RATE_SOURCES, a comma-separated list of
+"<kind>:<argument>" entries: `file:/path/rates.json` or `http:https://...`.
+Both read a JSON list of {"currency", "fiat", "price"} or {"currency", "fiat",
+"bid", "ask"} objects. Other kinds can be added with `register_rate_source`;
+`StaticRateSource` serves fixed quotes, e.g. in tests.
+"""
+
+import json
+import logging
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    from backend.database.db import ExchangeRate
+    from backend.database.utils import get_db_session, atomic_transaction
+    from backend.services.rate_book import (
+        RateBook, RateQuote, RATE_BOOK_KEY, RATE_BOOK_CHANNEL, load_rate_book_from_db, swap_rate_book,
+    )
+    from backend.utils.exceptions import ConfigurationError
+    from backend.utils.redis_client import get_redis_client
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for rate_ingestion: {e}")
+
+logger = logging.getLogger(__name__)
+
+RATE_SOURCES = os.getenv("RATE_SOURCES", "")
+# Spreads around the median price, in basis points (100 = 1%)
+RATE_BUY_SPREAD_BPS = Decimal(os.getenv("RATE_BUY_SPREAD_BPS", "100"))
+RATE_SELL_SPREAD_BPS = Decimal(os.getenv("RATE_SELL_SPREAD_BPS", "100"))
+RATE_SOURCE_TIMEOUT_SECONDS = float(os.getenv("RATE_SOURCE_TIMEOUT_SECONDS", "5"))
+
+_RATE_QUANT = Decimal("0.00000001")
+_BPS = Decimal("10000")
+
+
+@dataclass(frozen=True)
+class RawQuote:
+    """One price for a pair as reported by a source (fiat per crypto unit)."""
+    currency: str
+    fiat: str
+    price: Decimal
+    source: str
+
+
+class RateSource:
+    """Base class for rate sources; `fetch` returns the source's current quotes."""
+    name = "source"
+
+    def fetch(self) -> List[RawQuote]:
+        raise NotImplementedError
+
+
+def _parse_quotes(items: Iterable[dict], source: str) -> List[RawQuote]:
+    quotes: List[RawQuote] = []
+    for item in items:
+        try:
+            if "price" in item:
+                price = Decimal(str(item["price"]))
+            else:
+                price = (Decimal(str(item["bid"])) + Decimal(str(item["ask"]))) / 2
+            if price <= 0:
+                raise ValueError("non-positive price")
+            quotes.append(RawQuote(str(item["currency"]).upper(), str(item["fiat"]).upper(), price, source))
+        except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+            logger.warning(f"Skipping malformed quote from {source}: {item!r} ({e})")
+    return quotes
+
+
+class StaticRateSource(RateSource):
+    """Fixed quotes, e.g. `StaticRateSource({("USDT", "RUB"): "92.5"})` in tests."""
+
+    def __init__(self, prices: Dict[Tuple[str, str], object], name: str = "static"):
+        self.name = name
+        self._items = [{"currency": c, "fiat": f, "price": p} for (c, f), p in prices.items()]
+
+    def fetch(self) -> List[RawQuote]:
+        return _parse_quotes(self._items, self.name)
+
+
+class FileRateSource(RateSource):
+    """Reads quotes from a local JSON file on every fetch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f"file:{os.path.basename(path)}"
+
+    def fetch(self) -> List[RawQuote]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return _parse_quotes(json.load(f), self.name)
+
+
+class HttpRateSource(RateSource):
+    """Fetches the same JSON format from a URL."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.name = f"http:{httpx.URL(url).host}"
+
+    def fetch(self) -> List[RawQuote]:
+        response = httpx.get(self.url, timeout=RATE_SOURCE_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return _parse_quotes(response.json(), self.name)
+
+
+_source_factories: Dict[str, Callable[[str], RateSource]] = {
+    "file": FileRateSource,
+    "http": HttpRateSource,
+}
+
+
+def register_rate_source(kind: str, factory: Callable[[str], RateSource]) -> None:
+    """Makes `<kind>:<argument>` usable in RATE_SOURCES."""
+    _source_factories[kind] = factory
+
+
+def configured_sources(spec: str = RATE_SOURCES) -> List[RateSource]:
+    """Sources listed in RATE_SOURCES.
+
+    Raises:
+        ConfigurationError: For an entry of unknown kind.
+    """
+    sources: List[RateSource] = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, argument = entry.partition(":")
+        factory = _source_factories.get(kind)
+        if factory is None:
+            raise ConfigurationError(f"Unknown rate source kind '{kind}' in RATE_SOURCES")
+        sources.append(factory(argument))
+    return sources
+
+
+def aggregate_quotes(raw_quotes: Sequence[RawQuote], now: Optional[datetime] = None) -> Dict[Tuple[str, str], RateQuote]:
+    """Median price per pair across sources, with RATE_BUY/SELL_SPREAD_BPS applied."""
+    now = now or datetime.now(timezone.utc)
+    by_pair: Dict[Tuple[str, str], List[RawQuote]] = {}
+    for quote in raw_quotes:
+        by_pair.setdefault((quote.currency, quote.fiat), []).append(quote)
+
+    result: Dict[Tuple[str, str], RateQuote] = {}
+    for (currency, fiat), quotes in by_pair.items():
+        median = statistics.median(quote.price for quote in quotes)
+        result[(currency, fiat)] = RateQuote(
+            currency=currency,
+            fiat=fiat,
+            buy_rate=(median * (_BPS + RATE_BUY_SPREAD_BPS) / _BPS).quantize(_RATE_QUANT, rounding=ROUND_HALF_UP),
+            sell_rate=(median * (_BPS - RATE_SELL_SPREAD_BPS) / _BPS).quantize(_RATE_QUANT, rounding=ROUND_HALF_UP),
+            median_rate=median.quantize(_RATE_QUANT, rounding=ROUND_HALF_UP),
+            source=",".join(sorted({quote.source for quote in quotes}))[:255],
+            updated_at=now,
+        )
+    return result
+
+
+def _store_quotes(db: Session, quotes: Dict[Tuple[str, str], RateQuote]) -> None:
+    """Upserts one exchange_rates row per pair (the table has no unique key on the pair)."""
+    existing = {(rate.currency.upper(), rate.fiat.upper()): rate for rate in db.execute(select(ExchangeRate)).scalars()}
+    for pair, quote in quotes.items():
+        values = {
+            "buy_rate": quote.buy_rate,
+            "sell_rate": quote.sell_rate,
+            "median_rate": quote.median_rate,
+            "source": quote.source,
+            "updated_at": quote.updated_at,
+        }
+        rate = existing.get(pair)
+        if rate is None:
+            db.add(ExchangeRate(currency=quote.currency, fiat=quote.fiat, **values))
+        else:
+            for key, value in values.items():
+                setattr(rate, key, value)
+
+
+def publish_rate_book(book: RateBook) -> None:
+    """Stores the book in Redis and announces it to every process (this one included)."""
+    swap_rate_book(book)
+    client = get_redis_client()
+    if client is None:
+        logger.warning("Redis unavailable; the new rate book is only visible in this process.")
+        return
+    raw = book.to_json()
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.set(RATE_BOOK_KEY, raw)
+        pipe.publish(RATE_BOOK_CHANNEL, raw)
+        pipe.execute()
+    except RedisError as e:
+        logger.error(f"Failed to publish rate book: {e}", exc_info=True)
+
+
+def ingest_rates(sources: Optional[Sequence[RateSource]] = None) -> RateBook:
+    """Runs one ingestion round and returns the published book.
+
+    With no usable quotes, nothing is written and the stored rates are republished as they are.
+    """
+    started = time.monotonic()
+    sources = configured_sources() if sources is None else sources
+    raw_quotes: List[RawQuote] = []
+    for source in sources:
+        try:
+            fetched = source.fetch()
+        except Exception as e:
+            metrics.increment("rate_source_failures_total", source=source.name)
+            logger.error(f"Rate source {source.name} failed: {e}")
+            continue
+        metrics.increment("rate_quotes_fetched_total", value=len(fetched), source=source.name)
+        raw_quotes.extend(fetched)
+
+    quotes = aggregate_quotes(raw_quotes)
+    with get_db_session() as db:
+        if quotes:
+            with atomic_transaction(db):
+                _store_quotes(db, quotes)
+        book = load_rate_book_from_db(db)
+    publish_rate_book(book)
+    metrics.observe("rate_ingestion_seconds", time.monotonic() - started)
+    logger.info(f"Ingested {len(raw_quotes)} quotes from {len(sources)} sources into {len(quotes)} pairs.")
+    return book
@@ -0,0 +1,153 @@
+"""Whole reference catalog (banks, payment methods, bank/method combos, currencies) as one snapshot.
+
+Checkout frontends load the catalog once instead of one id at a time. The
+snapshot is serialized and gzip-compressed once per version and then served
+as-is; its version is a hash of the JSON body, used as the ETag.
+
+Each process keeps the current snapshot in memory, builds it at startup
+(`preload_catalog`) and rebuilds it on the next request after a catalog table
+changes - reference_data broadcasts those changes with the CATALOG_KEY pseudo
+key. CATALOG_MAX_AGE_SECONDS bounds staleness if an invalidation is missed.
+Snapshots are always built from the primary: one built on a lagging replica
+right after an invalidation would be kept until the next one.
+Only rows with `access` enabled are included.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    from backend.database.db import BanksTrader, PaymentMethod, AvalibleBankMethod, FiatCurrency
+    from backend.database.utils import get_db_session
+    from backend.services.reference_data import CATALOG_KEY, ensure_invalidation_listener, register_invalidation_listener
+    from backend.utils.exceptions import DatabaseError
+    from backend.utils import metrics
+except ImportError as e:
+    raise ImportError(f"Could not import required modules for reference_catalog: {e}")
+
+logger = logging.getLogger(__name__)
+
+CATALOG_MAX_AGE_SECONDS = float(os.getenv("CATALOG_MAX_AGE_SECONDS", "600"))
+CATALOG_GZIP_LEVEL = int(os.getenv("CATALOG_GZIP_LEVEL", "6"))
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One immutable catalog version, pre-serialized and pre-compressed."""
+    version: str
+    body: bytes
+    gzip_body: bytes
+    built_at: float
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+# Bumped on every catalog invalidation; a snapshot built at an older generation is stale
+_generation = 0
+_snapshot_generation = -1
+_build_lock = threading.Lock()
+
+
+def _rows(db: Session, *columns, where=None) -> List[Dict[str, Any]]:
+    statement = select(*columns)
+    if where is not None:
+        statement = statement.where(where)
+    statement = statement.order_by(columns[0])
+    return [dict(row._mapping) for row in db.execute(statement)]
+
+
+def build_catalog(db: Session) -> Dict[str, List[Dict[str, Any]]]:
+    """Current catalog contents (four small queries, columns only)."""
+    return {
+        "fiat_currencies": _rows(
+            db, FiatCurrency.id, FiatCurrency.currency_code, FiatCurrency.currency_name, FiatCurrency.public_name,
+            where=FiatCurrency.access.is_(True),
+        ),
+        "banks": _rows(
+            db, BanksTrader.id, BanksTrader.fiat_id, BanksTrader.bank_name, BanksTrader.public_name, BanksTrader.interbank,
+            where=BanksTrader.access.is_(True),
+        ),
+        "payment_methods": _rows(
+            db, PaymentMethod.id, PaymentMethod.fiat_id, PaymentMethod.method_name, PaymentMethod.public_name,
+            where=PaymentMethod.access.is_(True),
+        ),
+        "bank_methods": _rows(
+            db, AvalibleBankMethod.id, AvalibleBankMethod.fiat_id, AvalibleBankMethod.bank_id, AvalibleBankMethod.method_id,
+            where=AvalibleBankMethod.access.is_(True),
+        ),
+    }
+
+
+def build_snapshot(db: Session) -> CatalogSnapshot:
+    """Serializes and compresses the catalog once; identical contents give the identical version."""
+    body = json.dumps(build_catalog(db), separators=(",", ":"), sort_keys=True, default=str).encode("utf-8")
+    version = hashlib.sha256(body).hexdigest()[:20]
+    # mtime=0 keeps the compressed bytes deterministic across processes
+    gzip_body = gzip.compress(body, compresslevel=CATALOG_GZIP_LEVEL, mtime=0)
+    return CatalogSnapshot(version=version, body=body, gzip_body=gzip_body, built_at=time.time())
+
+
+def _is_fresh(snapshot: Optional[CatalogSnapshot]) -> bool:
+    return (
+        snapshot is not None
+        and _snapshot_generation == _generation
+        and time.time() - snapshot.built_at < CATALOG_MAX_AGE_SECONDS
+    )
+
+
+def get_catalog_snapshot() -> CatalogSnapshot:
+    """Current snapshot; rebuilt (once, by one thread) only after an invalidation or CATALOG_MAX_AGE_SECONDS.
+
+    Raises:
+        DatabaseError: If the catalog has to be rebuilt and the queries fail.
+    """
+    global _snapshot, _snapshot_generation
+    ensure_invalidation_listener()
+    snapshot = _snapshot
+    if _is_fresh(snapshot):
+        return snapshot
+    with _build_lock:
+        if _is_fresh(_snapshot):
+            return _snapshot
+        generation = _generation
+        try:
+            with get_db_session() as db:
+                snapshot = build_snapshot(db)
+        except Exception as e:
+            logger.error(f"Failed to build reference catalog: {e}", exc_info=True)
+            raise DatabaseError(f"Failed to build reference catalog: {e}") from e
+        if _snapshot is None or snapshot.version != _snapshot.version:
+            logger.info(f"Reference catalog version {snapshot.version} ({len(snapshot.body)} B, {len(snapshot.gzip_body)} B gzip)")
+        _snapshot, _snapshot_generation = snapshot, generation
+        metrics.increment("reference_catalog_builds_total")
+        return snapshot
+
+
+def preload_catalog() -> None:
+    """Builds the snapshot at startup so the first request does not pay for it."""
+    try:
+        get_catalog_snapshot()
+    except Exception as e:
+        logger.error(f"Reference catalog preload failed, it will be built on first request: {e}")
+
+
+def _on_reference_invalidation(keys: List[str], prefixes: List[str]) -> None:
+    global _generation
+    if CATALOG_KEY in keys or prefixes:
+        _generation += 1
+
+
+register_invalidation_listener(_on_reference_invalidation)
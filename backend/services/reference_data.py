@@ -1,135 +1,302 @@
-"""Service for accessing reference data (e.g., banks, currencies) with caching."""
+"""Service for accessing reference data (e.g., banks, currencies) with caching.
 
+Reads go through a `TieredCache`: an in-process LRU in front of Redis, so a
+warm read is a dictionary lookup with no Redis round trip or JSON decoding.
+
+Changes to the underlying rows are collected from the session and, after
+commit, evicted from Redis and broadcast on REFERENCE_EVENTS_CHANNEL. Every
+process runs a small listener thread that drops its local copies on those
+messages, so all processes converge within the pub/sub latency. The local TTL
+only bounds staleness while the listener is disconnected; on reconnect the
+local tier is cleared, since messages may have been missed.
+"""
+
+import json
 import logging
 import os
-import json
-from typing import Optional, Any, Dict
-from redis import Redis, RedisError
+import threading
+import time
+from typing import Optional, Any, Callable, Dict, Iterable, List, Set, Tuple
+
+from redis import RedisError
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 
 # Attempt to import models, DB utils, and exceptions
 try:
-    from backend.database.db import BanksTrader as Bank, FiatCurrency as Currency, PaymentMethod, ExchangeRate
-    from backend.database.utils import get_object_or_none
-    from backend.utils.exceptions import CacheError, DatabaseError, ConfigurationError
+    from backend.database.db import BanksTrader as Bank, FiatCurrency as Currency, PaymentMethod, ExchangeRate, AvalibleBankMethod
+    from backend.database.utils import get_db_session, get_object_or_none, register_bulk_write_listener
+    from backend.utils.exceptions import CacheError, DatabaseError, ConfigurationError, ExchangeRateUnavailable
+    from backend.utils.redis_client import get_redis_client, REDIS_URL
+    from backend.utils.tiered_cache import TieredCache
+    from backend.utils import metrics
+    from backend.services.rate_book import RateQuote, get_rate_book
 except ImportError:
-    from ..database.db import BanksTrader as Bank, FiatCurrency as Currency, PaymentMethod, ExchangeRate
-    from ..database.utils import get_object_or_none
-    from ..utils.exceptions import CacheError, DatabaseError, ConfigurationError
+    from ..database.db import BanksTrader as Bank, FiatCurrency as Currency, PaymentMethod, ExchangeRate, AvalibleBankMethod
+    from ..database.utils import get_db_session, get_object_or_none, register_bulk_write_listener
+    from ..utils.exceptions import CacheError, DatabaseError, ConfigurationError, ExchangeRateUnavailable
+    from ..utils.redis_client import get_redis_client, REDIS_URL
+    from ..utils.tiered_cache import TieredCache
+    from ..utils import metrics
+    from .rate_book import RateQuote, get_rate_book
 
 logger = logging.getLogger(__name__)
 
-# --- Redis Cache Client Configuration --- #
-REDIS_URL = os.getenv("REDIS_URL")
+# --- Cache Configuration --- #
 CACHE_PREFIX = "ref_data:"
-DEFAULT_CACHE_TTL_SECONDS = 3600 # 1 hour default TTL for reference data
+DEFAULT_CACHE_TTL_SECONDS = 3600 # 1 hour default TTL for reference data (Redis tier)
+REFERENCE_CACHE_LOCAL_TTL_SECONDS = float(os.getenv("REFERENCE_CACHE_LOCAL_TTL_SECONDS", "300"))
+REFERENCE_CACHE_MAXSIZE = int(os.getenv("REFERENCE_CACHE_MAXSIZE", "10000"))
+# Unknown ids are cached this long, so id enumeration does not reach the DB on every request
+REFERENCE_NEGATIVE_TTL_SECONDS = float(os.getenv("REFERENCE_NEGATIVE_TTL_SECONDS", "30"))
+REFERENCE_EVENTS_CHANNEL = os.getenv("REFERENCE_EVENTS_CHANNEL", "reference_data_invalidations")
+
+# Pseudo key carried by every change of a catalog table (see services/reference_catalog.py)
+CATALOG_KEY = "catalog"
+
+_PENDING_KEY = "reference_data_pending"
+
+_cache = TieredCache(
+    name="reference_data",
+    maxsize=REFERENCE_CACHE_MAXSIZE,
+    ttl=REFERENCE_CACHE_LOCAL_TTL_SECONDS,
+    redis_ttl=DEFAULT_CACHE_TTL_SECONDS,
+    redis_prefix=CACHE_PREFIX,
+)
 
-redis_client: Optional[Redis] = None
+# --- Invalidation --- #
 
-def get_redis_client() -> Optional[Redis]:
-    """Initializes and returns the Redis client instance, or None if not configured."""
-    global redis_client
-    if redis_client is None:
-        if not REDIS_URL:
-            logger.warning("REDIS_URL not set. Reference data caching is disabled.")
-            return None
+def _cache_keys_for(obj: Any) -> Tuple[Set[str], Set[str]]:
+    """(cache keys, cache key prefixes) affected by a change of `obj`."""
+    if isinstance(obj, Bank):
+        return {f"bank:{obj.id}", CATALOG_KEY}, set()
+    if isinstance(obj, PaymentMethod):
+        return {f"payment_method:{obj.id}", CATALOG_KEY}, set()
+    if isinstance(obj, ExchangeRate):
+        return {f"exchange_rate:{obj.currency.upper()}:{obj.fiat.upper()}"}, set()
+    if isinstance(obj, Currency):
+        # Bank details embed the currency code
+        return {CATALOG_KEY}, {"bank:"}
+    if isinstance(obj, AvalibleBankMethod):
+        return {CATALOG_KEY}, set()
+    return set(), set()
+
+
+# Callbacks (keys, prefixes) run on every invalidation, local or received from another process
+_invalidation_listeners: List[Callable[[List[str], List[str]], None]] = []
+
+
+def register_invalidation_listener(listener: Callable[[List[str], List[str]], None]) -> None:
+    """Registers a callback for reference data invalidations (e.g. to rebuild derived snapshots)."""
+    _invalidation_listeners.append(listener)
+
+
+def _notify_invalidation(keys: List[str], prefixes: List[str]) -> None:
+    for listener in _invalidation_listeners:
         try:
-            # decode_responses=True ensures keys/values are returned as strings
-            redis_client = Redis.from_url(REDIS_URL, decode_responses=True)
-            redis_client.ping() # Check connection
-            logger.info("Redis client for caching initialized successfully.")
-        except RedisError as e:
-            logger.error(f"Failed to initialize Redis client for caching: {e}", exc_info=True)
-            redis_client = None # Ensure it remains None on failure
+            listener(keys, prefixes)
         except Exception as e:
-            logger.error(f"An unexpected error occurred during Redis client initialization: {e}", exc_info=True)
-            redis_client = None
-    return redis_client
+            logger.error(f"Reference invalidation listener {listener} failed: {e}", exc_info=True)
 
-# Initialize on module load (or call explicitly at startup)
-get_redis_client()
 
-# --- Cache Helper Functions --- #
+def invalidate_reference(keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+    """Evicts reference entries from Redis and from the local tier of every process.
 
-def _get_from_cache(key: str) -> Optional[Any]:
-    """Retrieves and deserializes data from Redis cache."""
+    Call after committing changes made outside the ORM session (raw SQL, other
+    services); session changes are handled automatically after commit.
+    """
+    keys, prefixes = sorted(set(keys)), sorted(set(prefixes))
+    if not keys and not prefixes:
+        return
+    _notify_invalidation(keys, prefixes)
+    _cache.invalidate(*keys)
+    if prefixes:
+        _cache.clear_local()
     client = get_redis_client()
-    if not client:
-        return None
+    if client is None:
+        return
     try:
-        cached_data = client.get(f"{CACHE_PREFIX}{key}")
-        if cached_data:
-            logger.debug(f"Cache HIT for key: {key}")
-            return json.loads(cached_data)
-        else:
-            logger.debug(f"Cache MISS for key: {key}")
-            return None
+        for prefix in prefixes:
+            stale = list(client.scan_iter(match=f"{CACHE_PREFIX}{prefix}*", count=500))
+            if stale:
+                client.delete(*stale)
+        client.publish(REFERENCE_EVENTS_CHANNEL, json.dumps({"keys": keys, "prefixes": prefixes}))
     except RedisError as e:
-        logger.error(f"Redis GET error for key '{key}': {e}", exc_info=True)
-        # Optional: report via notifications.report_critical_error(CacheError(...))
-        raise CacheError(f"Failed to get data from cache for key: {key}", original_exception=e)
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error for cached key '{key}': {e}", exc_info=True)
-        # Data is corrupted, treat as miss or raise error?
-        # Let's treat as miss for now, maybe delete the corrupted key?
-        _delete_from_cache(key) # Attempt to delete corrupted data
-        return None
+        logger.error(f"Failed to broadcast reference data invalidation: {e}", exc_info=True)
 
-def _set_to_cache(key: str, value: Any, ttl: int = DEFAULT_CACHE_TTL_SECONDS):
-    """Serializes and stores data in Redis cache with a TTL."""
-    client = get_redis_client()
-    if not client:
-        return
+
+def _handle_invalidation(raw: str) -> None:
     try:
-        serialized_value = json.dumps(value)
-        client.setex(f"{CACHE_PREFIX}{key}", ttl, serialized_value)
-        logger.debug(f"Set cache for key: {key} with TTL: {ttl}s")
-    except RedisError as e:
-        logger.error(f"Redis SETEX error for key '{key}': {e}", exc_info=True)
-        # Optional: report via notifications.report_critical_error(CacheError(...))
-        # Don't raise here, as failure to cache shouldn't break the main flow
-    except (TypeError, OverflowError) as e:
-        logger.error(f"JSON serialization error for key '{key}': {e}", exc_info=True)
-        # Cannot cache this value
-
-def _delete_from_cache(key: str):
-    """Deletes a key from the cache."""
-    client = get_redis_client()
-    if not client:
+        message = json.loads(raw)
+    except ValueError:
+        logger.warning("Dropping malformed reference data invalidation")
         return
-    try:
-        client.delete(f"{CACHE_PREFIX}{key}")
-        logger.debug(f"Deleted cache key: {key}")
-    except RedisError as e:
-        logger.error(f"Redis DELETE error for key '{key}': {e}", exc_info=True)
+    metrics.increment("reference_invalidations_received_total")
+    keys, prefixes = message.get("keys", []), message.get("prefixes", [])
+    _notify_invalidation(keys, prefixes)
+    if prefixes:
+        _cache.clear_local()
+    else:
+        _cache.invalidate_local(*keys)
+
+
+class _InvalidationListener(threading.Thread):
+    """Daemon thread applying invalidations published by other processes to the local tier."""
+
+    def __init__(self):
+        super().__init__(name="reference-data-invalidations", daemon=True)
+
+    def run(self) -> None:
+        backoff = 1.0
+        while True:
+            client = get_redis_client()
+            if client is None:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(REFERENCE_EVENTS_CHANNEL)
+                # Messages sent while disconnected are lost; start from a clean local tier
+                _cache.clear_local()
+                _notify_invalidation([], [""])
+                logger.info(f"Reference data cache subscribed to '{REFERENCE_EVENTS_CHANNEL}'")
+                backoff = 1.0
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        _handle_invalidation(message["data"])
+            except (RedisError, OSError) as e:
+                logger.error(f"Reference data listener lost Redis subscription: {e}; retrying in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+_listener: Optional[_InvalidationListener] = None
+_listener_lock = threading.Lock()
+
+
+def ensure_invalidation_listener() -> None:
+    """Starts the listener on first use in this process (also after a fork, e.g. Celery prefork)."""
+    global _listener
+    if not REDIS_URL or (_listener is not None and _listener.is_alive()):
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = _InvalidationListener()
+            _listener.start()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_reference_changes(session: Session, flush_context) -> None:
+    """Remembers cache keys of reference rows changed in this flush."""
+    pending: Dict[str, Set[str]] = session.info.setdefault(_PENDING_KEY, {"keys": set(), "prefixes": set()})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        keys, prefixes = _cache_keys_for(obj)
+        if isinstance(obj, ExchangeRate):
+            # A renamed pair must evict its old key too
+            state = inspect(obj)
+            for old_currency in state.attrs.currency.history.deleted or [obj.currency]:
+                for old_fiat in state.attrs.fiat.history.deleted or [obj.fiat]:
+                    keys.add(f"exchange_rate:{old_currency.upper()}:{old_fiat.upper()}")
+        pending["keys"].update(keys)
+        pending["prefixes"].update(prefixes)
+
+
+def _collect_bulk_reference_changes(session: Session, objects, changed) -> None:
+    """Same for rows written by `create_objects_bulk` / `update_where`."""
+    pending: Dict[str, Set[str]] = session.info.setdefault(_PENDING_KEY, {"keys": set(), "prefixes": set()})
+    for obj in objects:
+        keys, prefixes = _cache_keys_for(obj)
+        pending["keys"].update(keys)
+        pending["prefixes"].update(prefixes)
+
+
+register_bulk_write_listener(_collect_bulk_reference_changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and (pending["keys"] or pending["prefixes"]):
+        invalidate_reference(pending["keys"], pending["prefixes"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
 
 # --- Service Functions --- #
-# Note: These functions assume Pydantic schemas or dict representations for return values
-# Adjust based on actual model structure and desired return type (e.g., SQLAlchemy objects)
+# Lookups go through `TieredCache.get_or_load`: concurrent misses for a key share
+# one query, hot entries are refreshed shortly before they expire, and unknown
+# ids are remembered for REFERENCE_NEGATIVE_TTL_SECONDS (a row created through
+# the ORM evicts its negative entry on commit like any other change).
+# Return values are plain dicts shared through the local cache tier: treat them as read-only.
+
+def _load_from_primary(db: Session, loader: Callable[..., Any], *args: Any) -> Any:
+    # Loaded values are shared by every process for the whole TTL: a lagging replica would
+    # publish rows older than the invalidation that just evicted them
+    if not db.info.get("replica"):
+        return loader(*args, db)
+    with get_db_session() as primary:
+        return loader(*args, primary)
+
+
+def _load_bank(bank_id: int, db: Session) -> Optional[Dict[str, Any]]:
+    bank = get_object_or_none(db, Bank, id=bank_id)
+    if not bank:
+        return None
+    return {
+        "id": bank.id,
+        "name": bank.public_name or bank.bank_name,
+        "fiat_currency_id": bank.fiat_id,
+        "currency_code": bank.fiat.currency_code if bank.fiat else None,
+        "access": bank.access,
+    }
+
+
+def _load_payment_method(method_id: int, db: Session) -> Optional[Dict[str, Any]]:
+    method = get_object_or_none(db, PaymentMethod, id=method_id)
+    if not method:
+        return None
+    return {
+        "id": method.id,
+        "method_name": method.method_name,
+        "public_name": method.public_name,
+        "access": method.access,
+    }
+
+
+def _load_exchange_rate(currency: str, fiat: str, db: Session) -> Optional[Dict[str, Any]]:
+    rate = get_object_or_none(db, ExchangeRate, currency=currency, fiat=fiat)
+    if not rate:
+        logger.warning(f"Exchange rate not found for {currency}/{fiat}")
+        return None
+    return {
+        "id": rate.id,
+        "currency": rate.currency,
+        "fiat": rate.fiat,
+        "buy_rate": str(rate.buy_rate),
+        "sell_rate": str(rate.sell_rate),
+        "median_rate": str(rate.median_rate),
+        "source": rate.source,
+        "updated_at": rate.updated_at.isoformat() if rate.updated_at else None,
+    }
+
 
 def get_bank_details(bank_id: int, db: Session) -> Optional[Dict[str, Any]]:
     """Gets bank details, using cache first, then DB."""
-    cache_key = f"bank:{bank_id}"
-    cached_details = _get_from_cache(cache_key)
-    if cached_details is not None:
-        return cached_details
-
+    ensure_invalidation_listener()
     try:
-        bank = get_object_or_none(db, Bank, id=bank_id)
-        if bank:
-            bank_details = {
-                "id": bank.id,
-                "name": bank.public_name or bank.bank_name,
-                "fiat_currency_id": bank.fiat_id,
-                "currency_code": bank.fiat.currency_code if bank.fiat else None,
-                "access": bank.access,
-            }
-            _set_to_cache(cache_key, bank_details)
-            return bank_details
-        else:
-            # Cache the fact that it wasn't found? Optional.
-            # _set_to_cache(cache_key, None, ttl=60) # Cache non-existence for 1 min
-            return None
+        return _cache.get_or_load(
+            f"bank:{bank_id}", lambda: _load_from_primary(db, _load_bank, bank_id), negative_ttl=REFERENCE_NEGATIVE_TTL_SECONDS
+        )
     except DatabaseError as e:
         logger.error(f"Database error fetching bank details for id {bank_id}: {e}", exc_info=True)
         raise # Re-raise the DatabaseError
@@ -139,24 +306,12 @@ def get_bank_details(bank_id: int, db: Session) -> Optional[Dict[str, Any]]:
 
 def get_payment_method_details(method_id: int, db: Session) -> Optional[Dict[str, Any]]:
     """Gets payment method details, using cache first, then DB."""
-    cache_key = f"payment_method:{method_id}"
-    cached_details = _get_from_cache(cache_key)
-    if cached_details is not None:
-        return cached_details
-
+    ensure_invalidation_listener()
     try:
-        method = get_object_or_none(db, PaymentMethod, id=method_id)
-        if method:
-            method_details = {
-                "id": method.id,
-                "method_name": method.method_name,
-                "public_name": method.public_name,
-                "access": method.access,
-            }
-            _set_to_cache(cache_key, method_details)
-            return method_details
-        else:
-            return None
+        return _cache.get_or_load(
+            f"payment_method:{method_id}", lambda: _load_from_primary(db, _load_payment_method, method_id),
+            negative_ttl=REFERENCE_NEGATIVE_TTL_SECONDS,
+        )
     except DatabaseError as e:
         logger.error(f"Database error fetching payment method details for id {method_id}: {e}", exc_info=True)
         raise
@@ -165,37 +320,34 @@ def get_payment_method_details(method_id: int, db: Session) -> Optional[Dict[str
         raise DatabaseError(f"Unexpected error fetching payment method details: {e}") from e
 
 
-def get_exchange_rate(crypto_id: int, fiat_id: int, db: Session) -> Optional[Dict[str, Any]]:
-    """Gets exchange rate details, using cache first, then DB."""
-    # Assuming a model `ExchangeRate` exists with crypto_currency_id and fiat_currency_id
-    cache_key = f"exchange_rate:{crypto_id}:{fiat_id}"
-    cached_details = _get_from_cache(cache_key)
-    if cached_details is not None:
-        return cached_details
+def get_exchange_rate(currency: str, fiat: str, db: Session) -> Optional[Dict[str, Any]]:
+    """Gets the current rate of a crypto/fiat pair by currency codes (e.g. "USDT", "RUB").
+
+    Served from the in-memory rate book; pairs it does not know yet, or only with a
+    quote older than RATE_MAX_AGE_SECONDS, fall back to cache, then DB.
 
+    Raises:
+        ExchangeRateUnavailable: If the stored rate is older than RATE_MAX_AGE_SECONDS as well.
+    """
+    currency, fiat = currency.upper(), fiat.upper()
+    quote = get_rate_book().get(currency, fiat)
+    if quote is not None and quote.is_fresh():
+        return quote.to_dict()
+    ensure_invalidation_listener()
     try:
-        rate = get_object_or_none(db, ExchangeRate, crypto_currency_id=crypto_id, fiat_currency_id=fiat_id)
-        if rate:
-            rate_details = {
-                "id": rate.id,
-                "currency": rate.currency,
-                "fiat": rate.fiat,
-                "buy_rate": str(rate.buy_rate),
-                "sell_rate": str(rate.sell_rate),
-                "median_rate": str(rate.median_rate),
-                "source": rate.source,
-                "updated_at": rate.updated_at.isoformat() if rate.updated_at else None,
-            }
-            _set_to_cache(cache_key, rate_details)
-            return rate_details
-        else:
-            logger.warning(f"Exchange rate not found for crypto {crypto_id} and fiat {fiat_id}")
-            return None
+        rate = _cache.get_or_load(
+            f"exchange_rate:{currency}:{fiat}", lambda: _load_from_primary(db, _load_exchange_rate, currency, fiat),
+            negative_ttl=REFERENCE_NEGATIVE_TTL_SECONDS,
+        )
     except DatabaseError as e:
-        logger.error(f"Database error fetching exchange rate for crypto {crypto_id}, fiat {fiat_id}: {e}", exc_info=True)
+        logger.error(f"Database error fetching exchange rate for {currency}/{fiat}: {e}", exc_info=True)
         raise
     except Exception as e:
-        logger.error(f"Unexpected error fetching exchange rate for crypto {crypto_id}, fiat {fiat_id}: {e}", exc_info=True)
+        logger.error(f"Unexpected error fetching exchange rate for {currency}/{fiat}: {e}", exc_info=True)
         raise DatabaseError(f"Unexpected error fetching exchange rate: {e}") from e
+    if rate is not None and not (rate.get("updated_at") and RateQuote.from_dict(rate).is_fresh()):
+        logger.warning(f"Exchange rate for {currency}/{fiat} is stale (updated at {rate.get('updated_at')})")
+        raise ExchangeRateUnavailable(f"Exchange rate for {currency}/{fiat} is out of date, retry later.")
+    return rate
 
-# Add other functions for reference data (e.g., get_currency_details) following the same pattern. 
\ No newline at end of file
+# Add other functions for reference data (e.g., get_currency_details) following the same pattern.
@@ -5,13 +5,18 @@ Provides functions for creating users, retrieving users by email, and authentica
 """
 
 import logging
+from typing import Any, Optional, Type, TypeVar
+
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Session
 
-from backend.config.crypto import hash_password, verify_password
+from backend.config.crypto import hash_password, verify_and_update
 from backend.database.db import User, Role
+from backend.services.login_throttle import check_login_allowed, record_login_failure, record_login_success
 from backend.utils.exceptions import AuthenticationError, AuthorizationError, DatabaseError
 
+AccountType = TypeVar("AccountType")
+
 logger = logging.getLogger(__name__)
 
 def get_user_by_email(session: Session, email: str) -> User | None:
@@ -44,11 +49,45 @@ def create_user(session: Session, email: str, password: str, role_name: str) ->
         raise DatabaseError(f"Error creating user '{email}': {e}") from e
 
 
-def authenticate_user(session: Session, email: str, password: str) -> User:
-    """Authenticate a user by email and password. Returns the User if valid."""
-    user = get_user_by_email(session, email)
-    if not user or not verify_password(password, user.password_hash):
+def authenticate_account(
+    session: Session,
+    model: Type[AccountType],
+    email: str,
+    password: str,
+    client_ip: Optional[str] = None
+) -> AccountType:
+    """
+    Checks email/password against any model with `email` and `password_hash` columns.
+
+    Throttling (services/login_throttle.py) runs before the bcrypt check, and the
+    check itself runs on the bounded hashing pool (config/crypto.py). A hash made
+    with an outdated cost is replaced on the object; the caller commits.
+
+    Raises:
+        LoginThrottled: Too many recent failures for the account or the address.
+        AuthenticationError: Unknown email or wrong password.
+        PasswordHashingBusy: The hashing pool is saturated.
+        DatabaseError: If the lookup fails.
+    """
+    check_login_allowed(email, client_ip)
+    try:
+        account: Any = session.query(model).filter_by(email=email).one_or_none()
+    except Exception as e:
+        logger.error(f"Error retrieving {model.__name__} by email {email}: {e}", exc_info=True)
+        raise DatabaseError(f"Error retrieving {model.__name__} by email {email}: {e}") from e
+    valid, new_hash = verify_and_update(password, account.password_hash) if account else (False, None)
+    if not valid:
+        record_login_failure(email, client_ip)
         raise AuthenticationError("Invalid email or password.")
+    record_login_success(email)
+    if new_hash:
+        account.password_hash = new_hash
+    return account
+
+
+def authenticate_user(session: Session, email: str, password: str, client_ip: Optional[str] = None) -> User:
+    """Authenticate a user by email and password. Returns the User if valid."""
+    user = authenticate_account(session, User, email, password, client_ip)
     if not user.is_active:
         raise AuthorizationError("User account is inactive.")
     logger.info(f"Authenticated user '{email}' successfully.")
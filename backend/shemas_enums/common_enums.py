@@ -6,6 +6,7 @@ class DirectionEnum(str, Enum):
 
 class OrderStatusEnum(str, Enum):
     NEW = 'new'
+    PENDING = 'pending' # OrderHistory right after assignment
     PROCESSING = 'processing'
     ASSIGNED = 'assigned'
     RETRYING = 'retrying'
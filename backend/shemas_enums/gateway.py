@@ -0,0 +1,71 @@
+"""Pydantic schemas for the public Gateway API."""
+
+from pydantic import BaseModel, Field
+from decimal import Decimal
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+class GatewayInitResponse(BaseModel):
+    """Returned by payin/payout init; mirrors the created IncomingOrder."""
+    id: int = Field(..., description="IncomingOrder ID")
+    store_id: int
+    order_type: str = Field(..., description="pay_in or pay_out")
+    status: str
+    amount_fiat: Optional[Decimal] = None
+    fiat_currency_id: int
+    target_method_id: Optional[int] = None
+    customer_id: Optional[str] = None
+    client_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class GatewayBulkInitRequest(BaseModel):
+    """Batch of init requests; items are validated one by one, so a bad item
+    does not reject the whole batch."""
+    orders: List[Dict[str, Any]] = Field(..., min_items=1, description="IncomingOrderCreate-shaped items")
+
+class GatewayBulkItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    success: bool
+    order: Optional[GatewayInitResponse] = None
+    error: Optional[str] = None
+
+class GatewayBulkInitResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[GatewayBulkItemResult]
+
+class OrderStatusProjection(BaseModel):
+    """Compact order status served from the status cache (no full ORM row)."""
+    entity: str = Field(..., description="order_history once assigned, incoming_order before")
+    order_id: int
+    incoming_order_id: Optional[int] = None
+    hash_id: Optional[str] = None
+    client_id: Optional[str] = Field(None, description="Merchant's own order id, if given at init")
+    status: str
+    order_type: str
+    store_id: int
+    ts: float = Field(..., description="Unix time of the status change (or of the DB read)")
+
+class ReceiptUploadRequest(BaseModel):
+    """Asks for a direct-to-storage upload slot for a payment receipt."""
+    filename: str = Field(..., min_length=1, max_length=200)
+    content_type: str = Field(..., description="MIME type of the receipt, e.g. image/png or application/pdf")
+
+class ReceiptUploadTicket(BaseModel):
+    """POST policy for uploading the receipt straight to object storage.
+
+    The client sends a multipart/form-data POST to `upload_url` with all `fields`
+    followed by the file part, then calls the complete endpoint with `object_key`.
+    """
+    upload_url: str
+    fields: Dict[str, str]
+    object_key: str
+    expires_in: int = Field(..., description="Seconds the policy stays valid")
+    max_bytes: int
+
+class ReceiptUploadComplete(BaseModel):
+    object_key: str = Field(..., description="object_key from the upload ticket")
+
@@ -3,7 +3,7 @@
 from pydantic import BaseModel, Field, EmailStr
 from decimal import Decimal
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from .common_enums import DirectionEnum, OrderStatusEnum
 
 # --- Base Schemas (if needed) --- #
@@ -13,6 +13,7 @@ class OrderBase(BaseModel):
     payment_method_id: int = Field(..., description="ID of the payment method")
     direction: DirectionEnum = Field(..., description="Order direction (PAY_IN or PAY_OUT)")
     customer_id: Optional[str] = Field(None, max_length=255, description="Customer identifier from merchant system")
+    client_id: Optional[str] = Field(None, max_length=255, description="Merchant's own order id (unique per store on its side)")
     return_url: Optional[str] = Field(None, max_length=1024, description="URL to redirect user after completion (optional)")
     callback_url: Optional[str] = Field(None, max_length=1024, description="URL for server-to-server notification (optional)")
 
@@ -23,7 +24,12 @@ class IncomingOrderCreate(OrderBase):
     pass
 
 class IncomingOrderRead(OrderBase):
-    """Schema for reading/returning an incoming order."""
+    """Schema for reading/returning an incoming order.
+
+    Filled from the column projections in services/order_queries.py, which label
+    the model columns with these field names (e.g. fiat_id -> currency_id).
+    """
+    payment_method_id: Optional[int] = Field(None, description="ID of the payment method (may be chosen at assignment)")
     id: int
     merchant_store_id: int
     status: OrderStatusEnum = Field(..., description="Current status of the incoming order")
@@ -58,6 +64,11 @@ class OrderHistoryRead(IncomingOrderRead):
         orm_mode = True
         # For Pydantic v2: from_attributes = True
 
+class OrderHistoryPage(BaseModel):
+    """One page of an order list; pass `next_cursor` back as `cursor` for the next page."""
+    items: List[OrderHistoryRead]
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, null on the last page")
+
 # --- Schemas for Status Updates --- #
 class OrderConfirmPayload(BaseModel):
     uploaded_document_url: Optional[str] = Field(None, max_length=1024, description="URL of the uploaded supporting document")
@@ -65,4 +76,29 @@ class OrderConfirmPayload(BaseModel):
 class OrderCancelPayload(BaseModel):
     reason: str = Field(..., min_length=5, max_length=500, description="Reason for cancellation")
 
+class ArchivedOrderRead(BaseModel):
+    """Order row read back from the cold archive (services/order_archive.py)."""
+    id: int
+    hash_id: str
+    incoming_order_id: Optional[int] = None
+    merchant_id: int
+    store_id: int
+    trader_id: int
+    requisite_id: int
+    order_type: str
+    status: str
+    exchange_rate: Decimal
+    total_fiat: Decimal
+    amount_fiat: Optional[Decimal] = None
+    amount_crypto: Optional[Decimal] = None
+    store_commission: Decimal
+    trader_commission: Decimal
+    client_id: Optional[str] = None
+    customer_id: Optional[str] = None
+    receipt_url: Optional[str] = None
+    trader_receipt_url: Optional[str] = None
+    cancellation_reason: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
 # Additional schemas for filters and list responses can be added here 
\ No newline at end of file
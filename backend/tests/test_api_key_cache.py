@@ -0,0 +1,63 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from backend.database.db import MerchantStore
+from backend.services import api_key_cache
+from backend.services.api_key_cache import StoreAuthInfo
+
+
+@pytest.fixture
+def cache(fake_redis, monkeypatch):
+    monkeypatch.setattr(api_key_cache._cache, "_redis", lambda: fake_redis)
+    monkeypatch.setattr(api_key_cache, "get_redis_client", lambda: fake_redis)
+    api_key_cache._cache.clear_local()
+    api_key_cache._store_keys.clear()
+    return api_key_cache._cache
+
+
+def _info(store_id: int = 7) -> StoreAuthInfo:
+    return StoreAuthInfo(
+        id=store_id, merchant_id=1, access=True, pay_in_enabled=True, pay_out_enabled=True,
+        gateway_require_customer_id_param=False, gateway_require_amount_param=False,
+        crypto_currency_id=1, fiat_currency_id=1, lower_limit=Decimal("0"), upper_limit=Decimal("100"),
+    )
+
+
+def _cache_store(api_key: str, info: StoreAuthInfo) -> str:
+    key = api_key_cache._cache_key(api_key)
+    api_key_cache._remember(key, info, api_key_cache._cache.load_token(key))
+    return key
+
+
+def test_rotation_through_update_where_evicts_the_old_key(cache, fake_redis):
+    old_key = _cache_store("old-key", _info())
+    session = SimpleNamespace(info={})
+    # update_where hands over the refreshed object: only the new key is left on it
+    rotated = MerchantStore(id=7, public_api_key="new-key")
+
+    api_key_cache._collect_bulk_store_changes(session, [rotated], frozenset({"public_api_key"}))
+    api_key_cache._invalidate_after_commit(session)
+
+    assert cache.get(old_key) is None
+    assert fake_redis.get(cache.redis_prefix + old_key) is None
+
+
+def test_unrelated_bulk_updates_keep_the_cache(cache):
+    key = _cache_store("key", _info())
+    session = SimpleNamespace(info={})
+
+    api_key_cache._collect_bulk_store_changes(session, [MerchantStore(id=7, public_api_key="key")], frozenset({"store_name"}))
+    api_key_cache._invalidate_after_commit(session)
+
+    assert cache.get(key) == _info()
+
+
+def test_load_racing_an_invalidation_is_not_cached(cache):
+    key = api_key_cache._cache_key("key")
+    token = cache.load_token(key)
+    # The store is deactivated while the projection is being read
+    api_key_cache.invalidate_store_auth("key")
+    api_key_cache._remember(key, _info(), token)
+    assert cache.get(key) is None
@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+import pytest
+
+from backend.utils import config_loader
+from backend.utils.config_loader import ConfigSnapshot, _build_snapshot, get_setting, get_typed_config_value
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    """Installs a snapshot built from the given raw rows, without touching the DB."""
+    monkeypatch.setattr(config_loader, "_ensure_refresher", lambda: None)
+
+    def install(raw):
+        built = _build_snapshot(raw)
+        monkeypatch.setattr(config_loader, "_snapshot", built)
+        monkeypatch.setattr(config_loader, "_refresher_pid", config_loader.os.getpid())
+        return built
+
+    return install
+
+
+def test_values_are_parsed_to_their_registered_types():
+    built = _build_snapshot({
+        "MAX_ORDER_RETRIES": "5",
+        "RATE_LIMIT_DEFAULT": "10/second",
+        "FRAUD_DENY_THRESHOLD": "150000.50",
+        "UNREGISTERED": "kept as is",
+    })
+    assert built.values["MAX_ORDER_RETRIES"] == 5
+    assert built.values["RATE_LIMIT_DEFAULT"] == "10/second"
+    assert built.values["FRAUD_DENY_THRESHOLD"] == Decimal("150000.50")
+    assert built.values["UNREGISTERED"] == "kept as is"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("true", True), ("1", True), ("Yes", True), (" on ", True),
+    ("false", False), ("0", False), ("no", False), ("OFF", False),
+])
+def test_booleans_accept_common_spellings(monkeypatch, raw, expected):
+    monkeypatch.setitem(config_loader._registry, "FEATURE_FLAG", config_loader.SettingSpec("FEATURE_FLAG", bool, False))
+    assert _build_snapshot({"FEATURE_FLAG": raw}).values["FEATURE_FLAG"] is expected
+
+
+def test_invalid_values_are_left_out_of_the_snapshot(monkeypatch):
+    monkeypatch.setitem(config_loader._registry, "FEATURE_FLAG", config_loader.SettingSpec("FEATURE_FLAG", bool, False))
+    built = _build_snapshot({"MAX_ORDER_RETRIES": "three", "FRAUD_DENY_THRESHOLD": "lots", "FEATURE_FLAG": "maybe"})
+    assert built.values == {}
+    # The raw rows stay available as stored
+    assert built.raw["MAX_ORDER_RETRIES"] == "three"
+
+
+def test_version_depends_only_on_the_rows():
+    assert _build_snapshot({"A": "1", "B": "2"}).version == _build_snapshot({"B": "2", "A": "1"}).version
+    assert _build_snapshot({"A": "1"}).version != _build_snapshot({"A": "2"}).version
+
+
+def test_get_setting_falls_back_to_the_registered_default(snapshot):
+    snapshot({"MAX_ORDER_RETRIES": "not a number"})
+    assert get_setting("MAX_ORDER_RETRIES") == 3
+    assert get_setting("RETRY_DELAY_SECONDS") == 60
+    assert get_setting("UNKNOWN_KEY") is None
+
+
+def test_explicit_default_wins_over_the_registered_one(snapshot):
+    snapshot({})
+    assert get_setting("MAX_ORDER_RETRIES", 7) == 7
+
+
+def test_stored_value_wins_over_defaults(snapshot):
+    snapshot({"MAX_ORDER_RETRIES": "9"})
+    assert get_setting("MAX_ORDER_RETRIES", 7) == 9
+
+
+def test_typed_compat_helper(snapshot):
+    snapshot({"MAX_ORDER_RETRIES": "4", "SOME_FLOAT": "0.25", "BROKEN_INT": "x"})
+    assert get_typed_config_value("MAX_ORDER_RETRIES", None, int) == 4
+    assert get_typed_config_value("SOME_FLOAT", None, float) == 0.25
+    assert get_typed_config_value("BROKEN_INT", None, int, default=1) == 1
+    assert get_typed_config_value("MISSING", None, int, default=2) == 2
+
+
+def test_failed_first_load_serves_defaults(monkeypatch):
+    monkeypatch.setattr(config_loader, "_snapshot", None)
+    monkeypatch.setattr(config_loader, "_ensure_refresher", lambda: None)
+
+    def failing_load(db=None):
+        raise ConnectionError("db down")
+
+    monkeypatch.setattr(config_loader, "load_config", failing_load)
+    assert config_loader.config_snapshot() == ConfigSnapshot(version="defaults")
+    assert get_setting("MAX_ORDER_RETRIES") == 3
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+from backend.database import utils
+
+
+def test_call_off_loop_runs_inline_without_a_loop():
+    threads = []
+    utils.call_off_loop(lambda: threads.append(threading.current_thread()))
+    assert threads == [threading.current_thread()]
+
+
+def test_call_off_loop_leaves_the_event_loop_thread():
+    async def main():
+        done = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        threads = []
+
+        def record():
+            threads.append(threading.current_thread())
+            loop.call_soon_threadsafe(done.set)
+
+        utils.call_off_loop(record)
+        await asyncio.wait_for(done.wait(), 5)
+        return threads
+
+    assert asyncio.run(main()) != [threading.current_thread()]
+
+
+def test_recent_write_is_shared_off_the_event_loop(fake_redis, monkeypatch):
+    monkeypatch.setattr(utils, "get_redis_client", lambda: fake_redis)
+    utils._recent_writes.clear()
+    shared = threading.Event()
+    share = utils._share_recent_write
+
+    def tracking_share(key):
+        assert threading.current_thread() is not main_thread
+        share(key)
+        shared.set()
+
+    monkeypatch.setattr(utils, "_share_recent_write", tracking_share)
+    main_thread = threading.current_thread()
+
+    async def commit():
+        token = utils.bind_client_key("api-key")
+        try:
+            utils._mark_recent_write()
+        finally:
+            utils.reset_client_key(token)
+
+    asyncio.run(commit())
+    assert shared.wait(5)
+    token = utils.bind_client_key("api-key")
+    client_key = utils._client_key.get()
+    utils.reset_client_key(token)
+    assert client_key in utils._recent_writes
+    assert fake_redis.exists(utils._RECENT_WRITE_PREFIX + client_key)
@@ -0,0 +1,154 @@
+import asyncio
+import importlib
+import json
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from redis import RedisError
+
+from backend.services import idempotency
+from backend.services.idempotency import StoredResponse
+from backend.utils.exceptions import IdempotencyConflict, IdempotencyKeyReused, IdempotencyUnavailable
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(idempotency, "get_async_redis_client", lambda: client)
+    return client
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_first_request_claims_the_key(redis):
+    claim, stored = run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    assert stored is None
+    record = json.loads(run(redis.get(claim.redis_key)))
+    assert record["state"] == "in_flight"
+    assert "api-key" not in claim.redis_key
+
+
+def test_completed_request_is_replayed(redis):
+    claim, _ = run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    assert run(idempotency.complete(claim, StoredResponse(200, {"id": 7})))
+
+    claim, stored = run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    assert claim is None
+    assert stored == StoredResponse(200, {"id": 7})
+
+
+def test_request_in_flight_conflicts(redis):
+    run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    with pytest.raises(IdempotencyConflict):
+        run(idempotency.begin("api-key", "payin", "k1", "fp"))
+
+
+def test_key_reused_with_another_payload(redis):
+    run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    with pytest.raises(IdempotencyKeyReused):
+        run(idempotency.begin("api-key", "payin", "k1", "other"))
+
+
+def test_keys_are_scoped_per_credential_and_endpoint(redis):
+    run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    assert run(idempotency.begin("other-key", "payin", "k1", "fp"))[0] is not None
+    assert run(idempotency.begin("api-key", "payout", "k1", "fp"))[0] is not None
+
+
+def test_released_key_can_be_retried(redis):
+    claim, _ = run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    run(idempotency.release(claim))
+    assert run(idempotency.begin("api-key", "payin", "k1", "fp"))[0] is not None
+
+
+def test_complete_does_not_overwrite_a_newer_claim(redis):
+    claim, _ = run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    # The claim expired and another request took the key
+    run(redis.delete(claim.redis_key))
+    newer, _ = run(idempotency.begin("api-key", "payin", "k1", "fp"))
+
+    assert not run(idempotency.complete(claim, StoredResponse(200, {"id": 1})))
+    assert json.loads(run(redis.get(newer.redis_key)))["token"] == newer.token
+
+
+def test_complete_retries_redis_errors(redis, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_COMPLETE_RETRY_DELAY_SECONDS", 0)
+    claim, _ = run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    calls = []
+    real_eval = redis.eval
+
+    async def flaky_eval(*args):
+        calls.append(1)
+        if len(calls) < 3:
+            raise RedisError("connection reset")
+        return await real_eval(*args)
+
+    monkeypatch.setattr(redis, "eval", flaky_eval)
+    assert run(idempotency.complete(claim, StoredResponse(200, {"id": 1})))
+    assert len(calls) == 3
+    monkeypatch.setattr(redis, "eval", real_eval)
+    assert run(idempotency.begin("api-key", "payin", "k1", "fp"))[1] == StoredResponse(200, {"id": 1})
+
+
+def test_unavailable_store_fails_closed_by_default(monkeypatch):
+    monkeypatch.setattr(idempotency, "get_async_redis_client", lambda: None)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_FAIL_OPEN", False)
+    with pytest.raises(IdempotencyUnavailable):
+        run(idempotency.begin("api-key", "payin", "k1", "fp"))
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_FAIL_OPEN", True)
+    assert run(idempotency.begin("api-key", "payin", "k1", "fp")) == (None, None)
+
+
+@pytest.fixture
+def gateway_router(redis, monkeypatch):
+    # The router imports the Celery app, which refuses to load without a broker URL
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379/0")
+    return importlib.import_module("backend.api_routers.gateway.router")
+
+
+def _request(key=None):
+    headers = {"X-API-KEY": "api-key"}
+    if key is not None:
+        headers[idempotency.IDEMPOTENCY_HEADER] = key
+    return SimpleNamespace(headers=headers)
+
+
+def test_run_idempotent_produces_once_and_replays(gateway_router):
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        return {"id": len(calls)}
+
+    first = run(gateway_router._run_idempotent(_request("k1"), "payin", {"amount": 1}, produce))
+    replay = run(gateway_router._run_idempotent(_request("k1"), "payin", {"amount": 1}, produce))
+
+    assert first == {"id": 1}
+    assert json.loads(replay.body) == {"id": 1}
+    assert replay.headers[idempotency.IDEMPOTENCY_REPLAY_HEADER] == "true"
+    assert calls == [1]
+
+
+def test_run_idempotent_releases_the_key_on_failure(gateway_router):
+    async def failing():
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        run(gateway_router._run_idempotent(_request("k1"), "payin", {"amount": 1}, failing))
+
+    async def produce():
+        return {"id": 2}
+
+    assert run(gateway_router._run_idempotent(_request("k1"), "payin", {"amount": 1}, produce)) == {"id": 2}
+
+
+def test_run_idempotent_without_header_skips_the_store(gateway_router, monkeypatch):
+    monkeypatch.setattr(idempotency, "get_async_redis_client", lambda: pytest.fail("store used"))
+
+    async def produce():
+        return {"id": 3}
+
+    assert run(gateway_router._run_idempotent(_request(), "payin", {}, produce)) == {"id": 3}
@@ -0,0 +1,31 @@
+import pytest
+
+from backend.services import login_throttle
+from backend.services.login_throttle import resolve_client_ip
+
+
+@pytest.fixture
+def trusted(monkeypatch):
+    monkeypatch.setattr(login_throttle, "_trusted_networks", login_throttle._parse_networks("10.0.0.0/8, 192.168.1.5"))
+
+
+def test_peer_is_used_without_trusted_proxies():
+    assert resolve_client_ip("203.0.113.7", "198.51.100.1") == "203.0.113.7"
+
+
+def test_forwarded_for_from_untrusted_peer_is_ignored(trusted):
+    assert resolve_client_ip("203.0.113.7", "198.51.100.1") == "203.0.113.7"
+
+
+def test_client_is_the_hop_behind_the_trusted_proxies(trusted):
+    # The client forged the first entry; the proxies appended the real address and their own
+    assert resolve_client_ip("10.0.0.2", "1.1.1.1, 198.51.100.9, 192.168.1.5") == "198.51.100.9"
+
+
+def test_only_trusted_hops_fall_back_to_the_peer(trusted):
+    assert resolve_client_ip("10.0.0.2", "10.0.0.3") == "10.0.0.2"
+    assert resolve_client_ip("10.0.0.2", None) == "10.0.0.2"
+
+
+def test_invalid_trusted_proxy_entries_are_skipped():
+    assert [str(n) for n in login_throttle._parse_networks("10.0.0.0/8,nonsense,::1")] == ["10.0.0.0/8", "::1/128"]
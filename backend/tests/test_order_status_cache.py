@@ -0,0 +1,26 @@
+from backend.database.db import IncomingOrder, OrderHistory
+from backend.services.order_status_cache import build_incoming_projection, build_projection, client_key, order_keys
+
+
+def _incoming(id, client_id, status="new", store_id=3):
+    return IncomingOrder(
+        id=id, merchant_id=1, store_id=store_id, fiat_currency_id=1, crypto_currency_id=1, amount_fiat=100,
+        exchange_rate=0, store_commission=0, order_type="pay_in", status=status, client_id=client_id, retry_count=0,
+    )
+
+
+def test_client_id_is_keyed_per_store():
+    assert client_key(3, "m-1") != client_key(4, "m-1")
+    assert order_keys(_incoming(10, "m-1")) == ["10", client_key(3, "m-1")]
+    assert order_keys(_incoming(10, None)) == ["10"]
+
+
+def test_bulk_rows_carry_the_client_key():
+    projection = build_incoming_projection({"id": 10, "status": "new", "order_type": "pay_in", "store_id": 3, "client_id": "m-1"})
+    assert projection["keys"] == ["10", client_key(3, "m-1")]
+    assert projection["client_id"] == "m-1"
+
+
+def test_history_inherits_the_client_key():
+    history = OrderHistory(id=5, hash_id="h", incoming_order_id=10, store_id=3, client_id="m-1", status="pending", order_type="pay_in")
+    assert build_projection(history)["keys"] == ["h", "10", client_key(3, "m-1")]
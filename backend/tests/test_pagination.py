@@ -0,0 +1,109 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+
+from backend.database.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_page, split_page
+from backend.utils.exceptions import InvalidCursor
+
+Base = declarative_base()
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class Row(Base):
+    __tablename__ = "rows"
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def db():
+    # SQLite supports the row-value comparison keyset_page emits
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        # Three rows share each timestamp, so id breaks the ties
+        session.add_all(Row(id=i, created_at=(T0 + timedelta(minutes=i // 3)).replace(tzinfo=None)) for i in range(1, 11))
+        session.commit()
+        yield session
+
+
+def _pages(db, limit, ascending=False):
+    pages, cursor = [], None
+    while True:
+        statement, page_size = keyset_page(select(Row), Row.created_at, Row.id, cursor, limit, ascending=ascending)
+        rows, cursor = split_page(db.scalars(statement).all(), page_size)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(json.dumps({"t": "2026-01-01T00:00:00"}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"t": "yesterday", "i": 1}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"t": "2026-01-01T00:00:00", "i": "x"}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([1, 2]).encode()).decode(),
+])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_tampered_cursor_is_rejected_by_keyset_page():
+    cursor = encode_cursor(T0, 5)
+    with pytest.raises(InvalidCursor):
+        keyset_page(select(Row), Row.created_at, Row.id, cursor[:-3] + "!!!", 10)
+
+
+def test_newest_first_pages_cover_every_row_once(db):
+    pages = _pages(db, limit=4)
+    assert pages == [[10, 9, 8, 7], [6, 5, 4, 3], [2, 1]]
+
+
+def test_oldest_first_pages_cover_every_row_once(db):
+    pages = _pages(db, limit=4, ascending=True)
+    assert pages == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+
+
+def test_equal_timestamps_are_split_by_id(db):
+    # Rows 3, 4 and 5 share a timestamp; a page boundary inside the group must not skip or repeat any
+    statement, limit = keyset_page(select(Row), Row.created_at, Row.id, None, 6)
+    rows, cursor = split_page(db.scalars(statement).all(), limit)
+    assert [row.id for row in rows] == [10, 9, 8, 7, 6, 5]
+    assert decode_cursor(cursor)[1] == 5
+
+    statement, limit = keyset_page(select(Row), Row.created_at, Row.id, cursor, 6)
+    rows, cursor = split_page(db.scalars(statement).all(), limit)
+    assert [row.id for row in rows] == [4, 3, 2, 1]
+    assert cursor is None
+
+
+def test_rows_inserted_while_paging_do_not_shift_pages(db):
+    statement, limit = keyset_page(select(Row), Row.created_at, Row.id, None, 4)
+    _, cursor = split_page(db.scalars(statement).all(), limit)
+    db.add(Row(id=11, created_at=(T0 + timedelta(hours=1)).replace(tzinfo=None)))
+    db.commit()
+
+    statement, limit = keyset_page(select(Row), Row.created_at, Row.id, cursor, 4)
+    assert [row.id for row in split_page(db.scalars(statement).all(), limit)[0]] == [6, 5, 4, 3]
+
+
+def test_page_size_is_clamped():
+    assert keyset_page(select(Row), Row.created_at, Row.id, None, 0)[1] == 1
+    assert keyset_page(select(Row), Row.created_at, Row.id, None, MAX_PAGE_SIZE + 1)[1] == MAX_PAGE_SIZE
+
+
+def test_exact_final_page_has_no_cursor(db):
+    assert _pages(db, limit=5) == [[10, 9, 8, 7, 6], [5, 4, 3, 2, 1]]
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from backend.services import rate_book, reference_data
+from backend.services.rate_book import RateBook, RateQuote
+from backend.services.rate_ingestion import RawQuote, StaticRateSource, aggregate_quotes
+from backend.utils.exceptions import ExchangeRateUnavailable
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _quote(updated_at: datetime, rate: str = "90") -> RateQuote:
+    return RateQuote(
+        currency="USDT", fiat="RUB", buy_rate=Decimal(rate), sell_rate=Decimal(rate), median_rate=Decimal(rate),
+        source="static", updated_at=updated_at, id=1,
+    )
+
+
+def test_static_source_parses_and_normalizes_quotes():
+    quotes = StaticRateSource({("usdt", "rub"): "92.5", ("USDT", "KZT"): 0}).fetch()
+    # Non-positive prices are dropped
+    assert quotes == [RawQuote("USDT", "RUB", Decimal("92.5"), "static")]
+
+
+def test_aggregate_takes_the_median_across_sources(monkeypatch):
+    monkeypatch.setattr("backend.services.rate_ingestion.RATE_BUY_SPREAD_BPS", Decimal("100"))
+    monkeypatch.setattr("backend.services.rate_ingestion.RATE_SELL_SPREAD_BPS", Decimal("50"))
+    raw = (
+        StaticRateSource({("USDT", "RUB"): "90"}, name="a").fetch()
+        + StaticRateSource({("USDT", "RUB"): "100"}, name="b").fetch()
+        + StaticRateSource({("USDT", "RUB"): "95", ("BTC", "RUB"): "6000000"}, name="c").fetch()
+    )
+
+    result = aggregate_quotes(raw, now=NOW)
+
+    usdt = result[("USDT", "RUB")]
+    assert usdt.median_rate == Decimal("95.00000000")
+    assert usdt.buy_rate == Decimal("95.95000000")   # +1%
+    assert usdt.sell_rate == Decimal("94.52500000")  # -0.5%
+    assert usdt.source == "a,b,c"
+    assert usdt.updated_at == NOW
+    assert result[("BTC", "RUB")].source == "c"
+
+
+def test_aggregate_averages_the_middle_pair_for_an_even_count():
+    raw = StaticRateSource({("USDT", "RUB"): "90"}, name="a").fetch() + StaticRateSource({("USDT", "RUB"): "91"}, name="b").fetch()
+    assert aggregate_quotes(raw, now=NOW)[("USDT", "RUB")].median_rate == Decimal("90.50000000")
+
+
+def test_rate_book_json_round_trip():
+    book = RateBook(quotes={("USDT", "RUB"): _quote(NOW)}, crypto_codes={1: "USDT"}, fiat_codes={2: "RUB"}, built_at=1.0)
+    restored = RateBook.from_json(book.to_json())
+    assert restored == book
+    assert restored.get_by_ids(1, 2) == _quote(NOW)
+
+
+def test_quote_freshness():
+    now = datetime.now(timezone.utc)
+    assert _quote(now - timedelta(seconds=10)).is_fresh(max_age=60)
+    assert not _quote(now - timedelta(seconds=120)).is_fresh(max_age=60)
+
+
+@pytest.fixture
+def empty_rate_book(monkeypatch):
+    monkeypatch.setattr(rate_book, "_book", RateBook())
+    monkeypatch.setattr(rate_book, "_loaded", False)
+    monkeypatch.setattr(rate_book, "_last_load_attempt", None)
+    monkeypatch.setattr(rate_book, "ensure_rate_book_listener", lambda: None)
+
+
+def test_get_rate_book_rate_limits_failed_loads(empty_rate_book, monkeypatch):
+    attempts = []
+
+    def failing_load():
+        attempts.append(1)
+        raise ConnectionError("db down")
+
+    monkeypatch.setattr(rate_book, "load_rate_book", failing_load)
+    clock = [100.0]
+    monkeypatch.setattr(rate_book.time, "monotonic", lambda: clock[0])
+
+    for _ in range(5):
+        assert rate_book.get_rate_book() == RateBook()
+    assert len(attempts) == 1
+
+    clock[0] += rate_book.RATE_BOOK_RETRY_SECONDS
+    rate_book.get_rate_book()
+    assert len(attempts) == 2
+
+
+def _serve_rate(monkeypatch, book_quote, stored):
+    monkeypatch.setattr(reference_data, "get_rate_book", lambda: RateBook(quotes={("USDT", "RUB"): book_quote} if book_quote else {}))
+    monkeypatch.setattr(reference_data, "ensure_invalidation_listener", lambda: None)
+    monkeypatch.setattr(reference_data._cache, "get_or_load", lambda key, loader, **kwargs: stored)
+
+
+def test_exchange_rate_is_served_from_a_fresh_book(monkeypatch):
+    fresh = _quote(datetime.now(timezone.utc))
+    _serve_rate(monkeypatch, fresh, None)
+    assert reference_data.get_exchange_rate("usdt", "rub", db=None) == fresh.to_dict()
+
+
+def test_stale_book_quote_falls_back_to_the_stored_rate(monkeypatch):
+    stored = _quote(datetime.now(timezone.utc), rate="91").to_dict()
+    _serve_rate(monkeypatch, _quote(datetime.now(timezone.utc) - timedelta(days=1)), stored)
+    assert reference_data.get_exchange_rate("USDT", "RUB", db=None) == stored
+
+
+def test_stale_stored_rate_is_not_served(monkeypatch):
+    stale = _quote(datetime.now(timezone.utc) - timedelta(days=1))
+    _serve_rate(monkeypatch, stale, stale.to_dict())
+    with pytest.raises(ExchangeRateUnavailable):
+        reference_data.get_exchange_rate("USDT", "RUB", db=None)
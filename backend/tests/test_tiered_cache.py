@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+
+import pytest
+
+from backend.utils import tiered_cache
+from backend.utils.tiered_cache import TieredCache
+
+
+def _local_cache(**kwargs) -> TieredCache:
+    return TieredCache(name="test", maxsize=100, ttl=60, use_redis=False, **kwargs)
+
+
+def _redis_cache(client, **kwargs) -> TieredCache:
+    cache = TieredCache(name="test", maxsize=100, ttl=60, redis_ttl=60, redis_prefix="t:", **kwargs)
+    cache._redis = lambda: client
+    return cache
+
+
+def test_get_or_load_caches_the_loaded_value():
+    cache = _local_cache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"id": 1}
+
+    assert cache.get_or_load("k", loader) == {"id": 1}
+    assert cache.get_or_load("k", loader) == {"id": 1}
+    assert len(calls) == 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = _local_cache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(8)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["value"] * 8
+
+
+def test_loader_error_reaches_every_waiter_and_is_not_cached():
+    cache = _local_cache()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("db down")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_load("k", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(errors) == 2
+    assert cache.get_or_load("k", lambda: "recovered") == "recovered"
+
+
+def test_none_is_cached_only_with_negative_ttl():
+    cache = _local_cache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_load("missing", loader) is None
+    assert cache.get_or_load("missing", loader) is None
+    assert len(calls) == 2
+
+    assert cache.get_or_load("negative", loader, negative_ttl=30) is None
+    assert cache.get_or_load("negative", loader, negative_ttl=30) is None
+    assert len(calls) == 3
+
+
+def test_negative_entry_expires_after_negative_ttl(monkeypatch):
+    cache = _local_cache()
+    now = [1000.0]
+    monkeypatch.setattr(tiered_cache.time, "time", lambda: now[0])
+
+    assert cache.get_or_load("k", lambda: None, negative_ttl=5) is None
+    now[0] += 6
+    assert cache.get_or_load("k", lambda: "created", negative_ttl=5) == "created"
+
+
+def test_load_spanning_a_local_invalidation_is_not_cached():
+    cache = _local_cache()
+
+    def loader():
+        # The row changes (and is invalidated) while it is being read
+        cache.invalidate_local("k")
+        return "old"
+
+    assert cache.get_or_load("k", loader) == "old"
+    assert cache.get_or_load("k", lambda: "new") == "new"
+
+
+def test_load_spanning_a_remote_invalidation_is_not_stored(fake_redis):
+    cache = _redis_cache(fake_redis)
+    other_process = _redis_cache(fake_redis)
+
+    def loader():
+        other_process.invalidate("k")
+        return "old"
+
+    assert cache.get_or_load("k", loader) == "old"
+    assert fake_redis.get("t:k") is None
+    assert cache.get_local("k") is None
+    assert cache.get_or_load("k", lambda: "new") == "new"
+    assert json.loads(fake_redis.get("t:k"))["v"] == "new"
+
+
+def test_value_loaded_by_another_process_is_reused(fake_redis):
+    _redis_cache(fake_redis).get_or_load("k", lambda: "shared")
+    cache = _redis_cache(fake_redis)
+    assert cache.get_or_load("k", lambda: pytest.fail("loaded twice")) == "shared"
+
+
+def test_waiter_ignores_a_non_envelope_value(fake_redis, monkeypatch):
+    monkeypatch.setattr(tiered_cache, "_LOAD_POLL_SECONDS", 0.01)
+    cache = _redis_cache(fake_redis)
+    # Another process holds the load lock and a plain (non get_or_load) value sits in the key
+    fake_redis.set("t:lock:k", "other")
+    fake_redis.set("t:k", json.dumps({"id": 1}))
+
+    assert cache.get_or_load("k", lambda: "loaded") == "loaded"
+
+
+def test_set_if_current_skips_values_invalidated_locally():
+    cache = _local_cache()
+    token = cache.load_token("k")
+    cache.invalidate("k")
+    assert not cache.set_if_current("k", "stale", token)
+    assert cache.get("k") is None
+
+    assert cache.set_if_current("k", "fresh", cache.load_token("k"))
+    assert cache.get("k") == "fresh"
+
+
+def test_set_if_current_skips_values_invalidated_by_another_process(fake_redis):
+    cache = _redis_cache(fake_redis)
+    other = _redis_cache(fake_redis)
+    token = cache.load_token("k")
+    other.invalidate("k")
+
+    assert not cache.set_if_current("k", "stale", token)
+    assert fake_redis.get("t:k") is None
+    assert cache.get("k") is None
@@ -1,84 +1,344 @@
-from sqlalchemy.orm import Session
-from typing import Optional, Type, TypeVar
+"""Runtime configuration from the `configuration_settings` table.
+
+All rows are loaded into one process-wide, immutable snapshot. Reads are a
+dictionary lookup with no session and no query. A background thread replaces
+the snapshot:
+
+- when a change is announced on CONFIG_EVENTS_CHANNEL; commits that touch
+  ConfigurationSetting publish one automatically,
+- every CONFIG_REFRESH_SECONDS, for changes made outside the ORM or while
+  Redis was unavailable.
+
+Known keys are declared in a schema registry (`register_setting`) with their
+type and default. Values are parsed once per snapshot; a value that does not
+parse is logged and replaced by the default.
+"""
+
+import hashlib
 import logging
-from cachetools import TTLCache, cached
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Optional, Type, TypeVar
+
+from redis import RedisError
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
 
 # Attempt to import the model, handle potential circular imports if structure changes
 try:
     from backend.database.db import ConfigurationSetting
+    from backend.database.utils import get_db_session, register_bulk_write_listener
+    from backend.utils.redis_client import get_redis_client
+    from backend.utils import metrics
 except ImportError:
     # This path might be needed if called from scripts outside the main app structure
-    # Or handle potential restructuring later
     from ..database.db import ConfigurationSetting # Adjust relative path if needed
+    from ..database.utils import get_db_session, register_bulk_write_listener
+    from .redis_client import get_redis_client
+    from . import metrics
 
 logger = logging.getLogger(__name__) # Use standard logging
 
 T = TypeVar('T')
 
-# TTL cache for config values (max 128 entries, TTL 300 seconds)
-_config_cache = TTLCache(maxsize=128, ttl=300)
+CONFIG_REFRESH_SECONDS = float(os.getenv("CONFIG_REFRESH_SECONDS", "60"))
+CONFIG_EVENTS_CHANNEL = os.getenv("CONFIG_EVENTS_CHANNEL", "configuration_changes")
+
+_CHANGED_KEY = "configuration_changed"
+_UNSET = object()
+
+# --- Schema registry --- #
+
+def _parse_bool(value: str) -> bool:
+    # Handle boolean conversion flexibly (e.g., 'true', '1', 'yes')
+    lower_val = value.strip().lower()
+    if lower_val in ['true', '1', 'yes', 'on']:
+        return True
+    if lower_val in ['false', '0', 'no', 'off']:
+        return False
+    raise ValueError(f"not a boolean: '{value}'")
+
+
+def _parser_for(value_type: Type[Any]) -> Callable[[str], Any]:
+    if value_type is bool:
+        return _parse_bool
+    return value_type
+
+
+@dataclass(frozen=True)
+class SettingSpec:
+    """Type and default of one configuration key."""
+    key: str
+    type: Type[Any]
+    default: Any = None
+    description: str = ""
+
+    def parse(self, value: str) -> Any:
+        return _parser_for(self.type)(value)
+
+
+_registry: Dict[str, SettingSpec] = {}
+
+
+def register_setting(key: str, value_type: Type[Any], default: Any = None, description: str = "") -> SettingSpec:
+    """Declares a configuration key; call at import time of the module that owns the setting."""
+    spec = SettingSpec(key=key, type=value_type, default=default, description=description)
+    _registry[key] = spec
+    return spec
+
+
+def registered_settings() -> Dict[str, SettingSpec]:
+    return dict(_registry)
+
+
+register_setting("MAX_ORDER_RETRIES", int, 3, "Processing attempts before an incoming order fails")
+register_setting("RETRY_DELAY_SECONDS", int, 60, "Base delay between order processing retries")
+register_setting("RETRY_BACKOFF_FACTOR", int, 2, "Multiplier applied to the retry delay per attempt")
+register_setting("RATE_LIMIT_DEFAULT", str, "100/minute", "Default slowapi limit")
+register_setting("FRAUD_MANUAL_REVIEW_THRESHOLD", Decimal, None, "Fiat amount above which orders need manual review")
+register_setting("FRAUD_DENY_THRESHOLD", Decimal, None, "Fiat amount above which orders are denied")
+
+# --- Snapshot --- #
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """All settings as loaded at one point in time; `version` is a hash of the raw rows."""
+    version: str
+    raw: Dict[str, str] = field(default_factory=dict)
+    values: Dict[str, Any] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+
+def _build_snapshot(raw: Dict[str, str], previous: Optional[ConfigSnapshot] = None) -> ConfigSnapshot:
+    values: Dict[str, Any] = {}
+    for key, value in raw.items():
+        spec = _registry.get(key)
+        if spec is None:
+            values[key] = value
+            continue
+        try:
+            values[key] = spec.parse(value)
+        except (ValueError, TypeError, InvalidOperation) as e:
+            if previous is not None and previous.raw.get(key) == value:
+                continue  # Already reported
+            logger.error(f"Invalid value '{value}' for config key '{key}' ({spec.type.__name__}): {e}. Using default {spec.default!r}.")
+            metrics.increment("config_invalid_values_total", key=key)
+    digest = hashlib.sha256("\n".join(f"{k}={raw[k]}" for k in sorted(raw)).encode("utf-8")).hexdigest()[:16]
+    return ConfigSnapshot(version=digest, raw=raw, values=values, loaded_at=time.time())
+
+
+_snapshot: Optional[ConfigSnapshot] = None
+_load_lock = threading.Lock()
+_reload_requested = threading.Event()
+
+
+def load_config(db: Optional[Session] = None) -> ConfigSnapshot:
+    """Reads every row (one query) and installs the result as the process-wide snapshot.
+
+    Raises:
+        Exception: Whatever the query raises; the previous snapshot stays in place.
+    """
+    global _snapshot
+    if db is None:
+        with get_db_session() as own_db:
+            rows = own_db.execute(select(ConfigurationSetting.key, ConfigurationSetting.value)).tuples().all()
+    else:
+        rows = db.execute(select(ConfigurationSetting.key, ConfigurationSetting.value)).tuples().all()
+    previous = _snapshot
+    snapshot = _build_snapshot(dict(rows), previous)
+    _snapshot = snapshot
+    metrics.increment("config_reloads_total")
+    if previous is None or previous.version != snapshot.version:
+        logger.info(f"Configuration snapshot {snapshot.version} loaded ({len(snapshot.raw)} settings).")
+    return snapshot
+
+
+def config_snapshot(db: Optional[Session] = None) -> ConfigSnapshot:
+    """Current snapshot; the first call in a process loads it (with `db` if given) and starts the refresher."""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and _refresher_pid == os.getpid():
+        return snapshot
+    with _load_lock:
+        if _snapshot is None:
+            try:
+                load_config(db)
+            except Exception as e:
+                # Serve registry defaults until the refresher manages to load
+                logger.error(f"Error loading configuration from database: {e}", exc_info=True)
+                _snapshot = ConfigSnapshot(version="defaults")
+        # Also restarts it in a forked child (e.g. Celery prefork), which inherits the snapshot but not the thread
+        _ensure_refresher()
+    return _snapshot
+
 
-@cached(_config_cache)
-def get_config_value(key: str, db: Session, default: Optional[str] = None) -> Optional[str]:
-    """Fetches a configuration value (as string) from the database.
+def get_setting(key: str, default: Any = _UNSET) -> Any:
+    """Typed value of `key` from the snapshot; no query once the process has loaded it.
+
+    Falls back to `default` if given, else to the registered default (None for unregistered keys).
+    """
+    snapshot = config_snapshot()
+    if key in snapshot.values:
+        return snapshot.values[key]
+    if default is not _UNSET:
+        return default
+    spec = _registry.get(key)
+    return spec.default if spec is not None else None
+
+
+def request_config_reload() -> None:
+    """Asks the refresher to reload now (in this process only)."""
+    _reload_requested.set()
+
+# --- Compatibility helpers (the session argument is only used for the first load) --- #
+
+def get_config_value(key: str, db: Optional[Session] = None, default: Optional[str] = None) -> Optional[str]:
+    """Fetches a configuration value as stored (string), or `default` if the key is not set.
 
     Args:
         key: The unique key of the configuration setting.
-        db: The SQLAlchemy session to use for querying.
-        default: The default value to return if the key is not found or an error occurs.
+        db: Optional session used if this process has not loaded the snapshot yet.
+        default: The default value to return if the key is not found.
 
     Returns:
         The configuration value as a string, or the default value.
     """
-    # TODO: Implement caching (e.g., TTLCache or Redis) to avoid frequent DB queries.
-    try:
-        setting = db.query(ConfigurationSetting).filter(ConfigurationSetting.key == key).one_or_none()
-        if setting:
-            logger.debug(f"Retrieved config key '{key}' from DB: '{setting.value}'")
-            return setting.value
-        else:
-            logger.warning(f"Configuration key '{key}' not found in database. Returning default value: {default}")
-            return default
-    except Exception as e:
-        logger.error(f"Error fetching configuration key '{key}' from database: {e}", exc_info=True)
-        # Fallback to default value on any DB error during lookup
-        return default
+    return config_snapshot(db).raw.get(key, default)
 
-def get_typed_config_value(key: str, db: Session, expected_type: Type[T], default: Optional[T] = None) -> Optional[T]:
-    """Fetches a configuration value from the database and attempts to cast it to the expected type.
+def get_typed_config_value(key: str, db: Optional[Session], expected_type: Type[T], default: Optional[T] = None) -> Optional[T]:
+    """Fetches a configuration value and casts it to the expected type.
 
     Args:
         key: The unique key of the configuration setting.
-        db: The SQLAlchemy session to use for querying.
+        db: Optional session used if this process has not loaded the snapshot yet.
         expected_type: The Python type to cast the value to (e.g., int, float, bool).
         default: The default value of the expected type to return on failure.
 
     Returns:
         The configuration value cast to the expected type, or the default value.
     """
-    value_str = get_config_value(key, db)
+    snapshot = config_snapshot(db)
+    spec = _registry.get(key)
+    if spec is not None and spec.type is expected_type and key in snapshot.values:
+        return snapshot.values[key]
 
+    value_str = snapshot.raw.get(key)
     if value_str is None:
-        return default # Return default if key not found or error in get_config_value
-
+        return default
     try:
-        if expected_type == bool:
-            # Handle boolean conversion flexibly (e.g., 'true', '1', 'yes')
-            lower_val = value_str.lower()
-            if lower_val in ['true', '1', 'yes', 'on']:
-                return True
-            elif lower_val in ['false', '0', 'no', 'off']:
-                return False
-            else:
-                logger.warning(f"Could not convert config value '{value_str}' for key '{key}' to bool. Returning default.")
-                return default
-        else:
-            # Attempt direct type casting
-            return expected_type(value_str)
-    except (ValueError, TypeError) as e:
+        return _parser_for(expected_type)(value_str)
+    except (ValueError, TypeError, InvalidOperation) as e:
         logger.error(f"Failed to cast config value '{value_str}' for key '{key}' to type {expected_type.__name__}: {e}. Returning default.")
         return default
 
-# Example Usage (within a context that has a db session):
-# max_retries = get_typed_config_value("MAX_ORDER_RETRIES", db_session, int, default=5)
-# use_feature_x = get_typed_config_value("USE_FEATURE_X", db_session, bool, default=False) 
\ No newline at end of file
+# --- Change notification --- #
+
+@event.listens_for(Session, "after_flush")
+def _collect_config_changes(session: Session, flush_context) -> None:
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ConfigurationSetting):
+            session.info[_CHANGED_KEY] = True
+            return
+
+
+def _collect_bulk_config_changes(session: Session, objects, changed) -> None:
+    if any(isinstance(obj, ConfigurationSetting) for obj in objects):
+        session.info[_CHANGED_KEY] = True
+
+
+register_bulk_write_listener(_collect_bulk_config_changes)
+
+
+def publish_config_change() -> None:
+    """Tells every process (this one included) to reload its snapshot.
+
+    Call after committing changes made outside the ORM session (raw SQL, migrations).
+    """
+    request_config_reload()
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.publish(CONFIG_EVENTS_CHANNEL, "reload")
+    except RedisError as e:
+        logger.error(f"Failed to publish configuration change; other processes pick it up within {CONFIG_REFRESH_SECONDS:.0f}s: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    if session.info.pop(_CHANGED_KEY, False):
+        publish_config_change()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_CHANGED_KEY, None)
+
+# --- Refresher --- #
+
+class _ConfigRefresher(threading.Thread):
+    """Daemon thread reloading the snapshot on change messages and every CONFIG_REFRESH_SECONDS."""
+
+    def __init__(self):
+        super().__init__(name="config-refresher", daemon=True)
+
+    @staticmethod
+    def _reload() -> None:
+        _reload_requested.clear()
+        try:
+            load_config()
+        except Exception as e:
+            logger.error(f"Configuration reload failed, keeping snapshot {_snapshot.version if _snapshot else None}: {e}")
+
+    def run(self) -> None:
+        while True:
+            pubsub = None
+            client = get_redis_client()
+            try:
+                if client is not None:
+                    pubsub = client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(CONFIG_EVENTS_CHANNEL)
+                # Changes announced while unsubscribed were missed
+                self._reload()
+                next_refresh = time.monotonic() + CONFIG_REFRESH_SECONDS
+                while True:
+                    if pubsub is not None:
+                        message = pubsub.get_message(timeout=1.0)
+                        changed = message is not None and message.get("type") == "message"
+                    else:
+                        changed = _reload_requested.wait(1.0)
+                    if changed or _reload_requested.is_set() or time.monotonic() >= next_refresh:
+                        self._reload()
+                        next_refresh = time.monotonic() + CONFIG_REFRESH_SECONDS
+                        if pubsub is None:
+                            # Try to subscribe again once per interval
+                            break
+            except (RedisError, OSError) as e:
+                logger.error(f"Configuration refresher lost Redis subscription: {e}; retrying")
+                time.sleep(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+_refresher: Optional[_ConfigRefresher] = None
+_refresher_pid: Optional[int] = None
+
+
+def _ensure_refresher() -> None:
+    """Starts the refresher on first use in this process."""
+    global _refresher, _refresher_pid
+    if _refresher_pid != os.getpid() or _refresher is None or not _refresher.is_alive():
+        _refresher = _ConfigRefresher()
+        _refresher.start()
+        _refresher_pid = os.getpid()
+
+# Example Usage:
+# max_retries = get_setting("MAX_ORDER_RETRIES")
+# use_feature_x = get_typed_config_value("USE_FEATURE_X", None, bool, default=False)
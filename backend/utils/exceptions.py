@@ -53,6 +53,18 @@ class InvalidOrderStatus(OrderProcessingError):
         self.current_status = current_status
         self.status_code = 409 # Conflict
 
+class OrderNotFound(OrderProcessingError):
+    """Raised when an order cannot be found by the given identifier."""
+    def __init__(self, message: str = "Order not found.", order_id: int | str | None = None):
+        super().__init__(message, order_id=order_id)
+        self.status_code = 404
+
+class OrderValidationError(OrderProcessingError):
+    """Raised when an order request does not satisfy the store's settings or limits."""
+    def __init__(self, message: str = "Order request is invalid for this store.", order_id: int | str | None = None):
+        super().__init__(message, order_id=order_id)
+        self.status_code = 400
+
 # --- External Service Exceptions --- #
 class NotificationError(JivaPayException):
     """Raised when sending a notification (e.g., Sentry) fails."""
@@ -89,4 +101,42 @@ class FraudDetectedError(OrderProcessingError):
     def __init__(self, message: str = "Potential fraud detected.", reason: str | None = None, order_id: int | str | None = None):
         super().__init__(message, order_id=order_id)
         self.reason = reason
-        self.status_code = 400 # Or perhaps a specific code? 
\ No newline at end of file
+        self.status_code = 400 # Or perhaps a specific code? 
+# --- Idempotency Exceptions --- #
+class IdempotencyConflict(JivaPayException):
+    """Raised when a request with the same Idempotency-Key is still being processed."""
+    def __init__(self, message: str = "A request with this Idempotency-Key is already in progress."):
+        super().__init__(message, status_code=409)
+
+class IdempotencyKeyReused(JivaPayException):
+    """Raised when an Idempotency-Key is reused with a different request payload."""
+    def __init__(self, message: str = "Idempotency-Key was already used with a different request."):
+        super().__init__(message, status_code=422)
+
+class IdempotencyUnavailable(CacheError):
+    """Raised when the idempotency store cannot be reached and requests must not proceed."""
+    def __init__(self, message: str = "Idempotency store is unavailable, retry later.", original_exception: Exception | None = None):
+        super().__init__(message, original_exception=original_exception)
+        self.status_code = 503
+
+class InvalidCursor(JivaPayException):
+    """Raised when a pagination cursor cannot be decoded."""
+    def __init__(self, message: str = "Invalid pagination cursor."):
+        super().__init__(message, status_code=400)
+
+class LoginThrottled(AuthenticationError):
+    """Raised when too many failed logins were made for an account or from an address."""
+    def __init__(self, message: str = "Too many failed login attempts, retry later.", retry_after: int = 60):
+        super().__init__(message)
+        self.status_code = 429
+        self.retry_after = retry_after
+
+class PasswordHashingBusy(JivaPayException):
+    """Raised when the password hashing pool is saturated and the request must be retried."""
+    def __init__(self, message: str = "Authentication is temporarily overloaded, retry later."):
+        super().__init__(message, status_code=503)
+
+class ExchangeRateUnavailable(JivaPayException):
+    """Raised when the only known rate for a pair is older than RATE_MAX_AGE_SECONDS."""
+    def __init__(self, message: str = "No current exchange rate is available, retry later."):
+        super().__init__(message, status_code=503)
@@ -0,0 +1,114 @@
+"""Minimal in-process metrics registry (counters, gauges and summaries).
+
+Services record values here; the metrics router renders them in the Prometheus
+text exposition format so any scraper can collect them without an extra
+client library.
+"""
+
+import threading
+from typing import Dict, Tuple, Any, Callable, List
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_gauges: Dict[str, Dict[LabelKey, float]] = {}
+_summaries: Dict[str, Dict[LabelKey, List[float]]] = {}  # [count, sum, max]
+_collectors: List[Callable[[], None]] = []
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def increment(name: str, value: float = 1.0, **labels: Any) -> None:
+    """Increments a monotonically growing counter."""
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    """Sets a gauge to an absolute value."""
+    with _lock:
+        _gauges.setdefault(name, {})[_labels(labels)] = float(value)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """Records one observation for a summary (exported as _count, _sum and _max)."""
+    key = _labels(labels)
+    with _lock:
+        series = _summaries.setdefault(name, {})
+        stats = series.setdefault(key, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += value
+        stats[2] = max(stats[2], value)
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    """Registers a callback that refreshes gauges right before metrics are read."""
+    with _lock:
+        _collectors.append(collector)
+
+
+def _run_collectors() -> None:
+    for collector in list(_collectors):
+        try:
+            collector()
+        except Exception:
+            # A broken collector must never take down the metrics endpoint
+            pass
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Returns a JSON-friendly copy of all recorded series."""
+    _run_collectors()
+
+    def render(series: Dict[LabelKey, Any]) -> Dict[str, Any]:
+        return {",".join(f"{k}={v}" for k, v in key) or "_": value for key, value in series.items()}
+
+    with _lock:
+        return {
+            "counters": {name: render(series) for name, series in _counters.items()},
+            "gauges": {name: render(series) for name, series in _gauges.items()},
+            "summaries": {
+                name: render({k: {"count": v[0], "sum": v[1], "max": v[2]} for k, v in series.items()})
+                for name, series in _summaries.items()
+            },
+        }
+
+
+def render_prometheus() -> str:
+    """Renders all series in the Prometheus text exposition format."""
+    _run_collectors()
+
+    def fmt(name: str, key: LabelKey, value: float) -> str:
+        if key:
+            labels = ",".join(f'{k}="{v}"' for k, v in key)
+            return f"{name}{{{labels}}} {value}"
+        return f"{name} {value}"
+
+    lines: List[str] = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(fmt(name, key, value) for key, value in series.items())
+        for name, series in sorted(_gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(fmt(name, key, value) for key, value in series.items())
+        for name, series in sorted(_summaries.items()):
+            lines.append(f"# TYPE {name} summary")
+            for key, (count, total, maximum) in series.items():
+                lines.append(fmt(f"{name}_count", key, count))
+                lines.append(fmt(f"{name}_sum", key, total))
+                lines.append(fmt(f"{name}_max", key, maximum))
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Clears all series (used by benchmarks between runs)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _summaries.clear()
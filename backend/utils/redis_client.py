@@ -0,0 +1,70 @@
+"""Shared Redis client used by caches across services."""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from redis import Redis, RedisError
+from redis.asyncio import Redis as AsyncRedis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+# After a failed connection attempt, callers get None until this interval passes
+REDIS_RETRY_INTERVAL_SECONDS = float(os.getenv("REDIS_RETRY_INTERVAL_SECONDS", "5"))
+
+redis_client: Optional[Redis] = None
+async_redis_client: Optional[AsyncRedis] = None
+_last_failure_at: Optional[float] = None
+
+if not REDIS_URL:
+    logger.warning("REDIS_URL not set. Redis-backed caching is disabled.")
+
+
+def get_redis_client() -> Optional[Redis]:
+    """Initializes and returns the Redis client instance, or None if not configured."""
+    global redis_client, _last_failure_at
+    if redis_client is None:
+        if not REDIS_URL:
+            return None
+        if _last_failure_at is not None and time.monotonic() - _last_failure_at < REDIS_RETRY_INTERVAL_SECONDS:
+            return None
+        try:
+            # decode_responses=True ensures keys/values are returned as strings
+            redis_client = Redis.from_url(REDIS_URL, decode_responses=True)
+            redis_client.ping() # Check connection
+            logger.info("Redis client for caching initialized successfully.")
+        except RedisError as e:
+            logger.error(f"Failed to initialize Redis client for caching: {e}", exc_info=True)
+            redis_client = None # Ensure it remains None on failure
+            _last_failure_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"An unexpected error occurred during Redis client initialization: {e}", exc_info=True)
+            redis_client = None
+            _last_failure_at = time.monotonic()
+    return redis_client
+
+
+def get_async_redis_client() -> Optional[AsyncRedis]:
+    """Returns the asyncio Redis client for event-loop code, or None if not configured.
+
+    The client connects lazily, so connection errors surface on the first command.
+    """
+    global async_redis_client
+    if async_redis_client is None and REDIS_URL:
+        async_redis_client = AsyncRedis.from_url(REDIS_URL, decode_responses=True)
+    return async_redis_client
+
+
+def reset_clients() -> None:
+    """Drops the Redis clients without closing their sockets.
+
+    Called in a freshly forked process: the inherited connections belong to the
+    parent, so they are abandoned (not closed) and new ones are created on demand.
+    """
+    global redis_client, async_redis_client, _last_failure_at
+    redis_client = None
+    async_redis_client = None
+    _last_failure_at = None
+
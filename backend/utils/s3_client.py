@@ -1,18 +1,42 @@
 import logging
-from typing import IO
+import os
+from typing import IO, Any, Dict, Optional
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 from backend.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
-# Initialize S3 client
-_s3_client = boto3.client(
-    's3',
-    aws_access_key_id=settings.S3_ACCESS_KEY,
-    aws_secret_access_key=settings.S3_SECRET_KEY,
-    endpoint_url=settings.S3_ENDPOINT_URL
-)
+# "path" for S3-compatible stand-ins (MinIO, LocalStack) that do not resolve bucket subdomains
+S3_ADDRESSING_STYLE = os.getenv("S3_ADDRESSING_STYLE", "auto")
+
+_s3_client = None
+
+
+def get_s3_client():
+    """Returns the S3 client, creating it on first use in this process."""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
+            's3',
+            aws_access_key_id=settings.S3_ACCESS_KEY,
+            aws_secret_access_key=settings.S3_SECRET_KEY,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            config=Config(signature_version='s3v4', s3={'addressing_style': S3_ADDRESSING_STYLE}),
+        )
+    return _s3_client
+
+
+def reset_client() -> None:
+    """Forgets the S3 client (and its connection pool), e.g. after a fork."""
+    global _s3_client
+    _s3_client = None
+
+
+def object_url(bucket: str, key: str) -> str:
+    """URL under which an object is recorded in the DB (same format as `upload_fileobj`)."""
+    return f"{settings.S3_ENDPOINT_URL}/{bucket}/{key}"
 
 
 def upload_fileobj(file_obj: IO, bucket: str, key: str) -> str:
@@ -31,10 +55,71 @@ def upload_fileobj(file_obj: IO, bucket: str, key: str) -> str:
         ClientError: If upload fails.
     """
     try:
-        _s3_client.upload_fileobj(file_obj, Bucket=bucket, Key=key)
-        url = f"{settings.S3_ENDPOINT_URL}/{bucket}/{key}"
+        get_s3_client().upload_fileobj(file_obj, Bucket=bucket, Key=key)
+        url = object_url(bucket, key)
         logger.info(f"Uploaded object to S3: {url}")
         return url
     except (BotoCoreError, ClientError) as e:
         logger.error(f"Failed to upload object to S3: {e}", exc_info=True)
-        raise 
\ No newline at end of file
+        raise
+
+
+def generate_presigned_post(
+    bucket: str,
+    key: str,
+    content_type: str,
+    max_bytes: int,
+    expires_in: int
+) -> Dict[str, Any]:
+    """
+    Issues a POST policy that lets a client upload exactly one object directly to S3.
+
+    The policy pins the key and the Content-Type and limits the body size, so the
+    client cannot write elsewhere in the bucket or upload an arbitrary payload.
+
+    Args:
+        bucket: Name of the target S3 bucket.
+        key: Object key the client may write.
+        content_type: Content-Type the upload must carry.
+        max_bytes: Maximum object size accepted by S3.
+        expires_in: Policy lifetime in seconds.
+
+    Returns:
+        {"url": ..., "fields": {...}} - the form fields must precede the file in the multipart body.
+
+    Raises:
+        ClientError: If the policy cannot be signed.
+    """
+    try:
+        return get_s3_client().generate_presigned_post(
+            Bucket=bucket,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+    except (BotoCoreError, ClientError) as e:
+        logger.error(f"Failed to presign upload for s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
+
+
+def head_object(bucket: str, key: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns object metadata (ContentLength, ContentType, ...) or None if it does not exist.
+
+    Raises:
+        ClientError: For errors other than a missing object.
+    """
+    try:
+        return get_s3_client().head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        logger.error(f"Failed to read metadata of s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
+    except BotoCoreError as e:
+        logger.error(f"Failed to read metadata of s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
@@ -0,0 +1,383 @@
+"""Two-tier cache: bounded in-process TTL/LRU cache in front of an optional shared Redis tier."""
+
+import json
+import logging
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from redis import RedisError
+
+try:
+    from backend.utils.redis_client import get_redis_client
+    from backend.utils import metrics
+except ImportError:
+    from .redis_client import get_redis_client
+    from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# How long a loader may hold the cross-process lock, and how long others wait for its result
+LOAD_LOCK_TIMEOUT_SECONDS = 10.0
+LOAD_WAIT_SECONDS = 2.0
+_LOAD_POLL_SECONDS = 0.05
+# Lifetime of a key's invalidation counter; must exceed the longest load
+GENERATION_TTL_SECONDS = 60
+
+# Stores the entry only if no invalidation bumped the key's generation since the load started
+_SET_IF_GENERATION = """
+local current = redis.call('GET', KEYS[2]) or ''
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+return 1
+"""
+
+
+class _Flight:
+    """One in-progress `get_or_load` call that other threads of this process wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TieredCache:
+    """Caches JSON-serializable values locally and, optionally, in Redis.
+
+    The local tier is a `cachetools.TTLCache` (LRU eviction once `maxsize` is
+    reached) guarded by a lock, so it is safe to share between threads. The
+    Redis tier lets several processes reuse a value loaded by one of them; any
+    Redis error simply degrades the cache to local-only for that call.
+
+    Hits and misses are exported as `cache_hits_total{cache,tier}` and
+    `cache_misses_total{cache}`.
+
+    `get_or_load` additionally protects the loader from stampedes; keys it
+    writes hold an envelope and must only be read through `get_or_load`. A
+    value loaded while the key was invalidated (here or, through Redis, in
+    another process) is returned to its caller but not cached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        redis_ttl: Optional[int] = None,
+        redis_prefix: Optional[str] = None,
+        use_redis: bool = True,
+        serializer: Callable[[Any], Any] = lambda value: value,
+        deserializer: Callable[[Any], Any] = lambda value: value,
+    ):
+        self.name = name
+        self.redis_ttl = redis_ttl
+        self.redis_prefix = redis_prefix or f"cache:{name}:"
+        self.use_redis = use_redis
+        self._serializer = serializer
+        self._deserializer = deserializer
+        self.ttl = ttl
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        # Bumped by every local invalidation; a load spanning one does not cache locally
+        self._epoch = 0
+
+    def _redis(self):
+        return get_redis_client() if self.use_redis else None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns the cached value for `key`, checking the local tier first."""
+        with self._lock:
+            value = self._local.get(key, _MISSING)
+        if value is not _MISSING:
+            metrics.increment("cache_hits_total", cache=self.name, tier="local")
+            return value
+
+        client = self._redis()
+        if client is not None:
+            try:
+                raw = client.get(self.redis_prefix + key)
+            except RedisError as e:
+                logger.warning(f"Redis GET failed for cache '{self.name}': {e}")
+                raw = None
+            if raw is not None:
+                try:
+                    value = self._deserializer(json.loads(raw))
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Dropping undecodable entry in cache '{self.name}': {e}")
+                else:
+                    with self._lock:
+                        self._local[key] = value
+                    metrics.increment("cache_hits_total", cache=self.name, tier="redis")
+                    return value
+
+        metrics.increment("cache_misses_total", cache=self.name)
+        return default
+
+    def get_local(self, key: str, default: Any = None) -> Any:
+        """Checks only the in-process tier; never blocks on Redis.
+
+        Meant for event-loop code, which falls back to `get` in a worker thread.
+        A local miss is not counted, since that `get` call records the outcome.
+        """
+        with self._lock:
+            value = self._local.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        metrics.increment("cache_hits_total", cache=self.name, tier="local")
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Stores `value` in both tiers."""
+        with self._lock:
+            self._local[key] = value
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            data = json.dumps(self._serializer(value), default=str)
+            if self.redis_ttl:
+                client.setex(self.redis_prefix + key, self.redis_ttl, data)
+            else:
+                client.set(self.redis_prefix + key, data)
+        except (RedisError, TypeError) as e:
+            logger.warning(f"Redis SET failed for cache '{self.name}': {e}")
+
+    def load_token(self, key: str) -> Tuple[int, Optional[str]]:
+        """Captures the invalidation state of `key`; take it before reading the value to cache.
+
+        Pass the token to `set_if_current` once the value is loaded.
+        """
+        epoch = self._epoch
+        client = self._redis()
+        if client is None:
+            return epoch, None
+        try:
+            return epoch, client.get(self._generation_key(key)) or ""
+        except RedisError as e:
+            logger.warning(f"Redis GET failed for cache '{self.name}', not storing the load there: {e}")
+            return epoch, None
+
+    def set_if_current(self, key: str, value: Any, token: Tuple[int, Optional[str]]) -> bool:
+        """Stores `value` like `set`, unless `key` was invalidated since `token` was taken.
+
+        Returns whether the value was cached.
+        """
+        data = self._serializer(value)
+        return self._store_if_current(key, value, data, self.redis_ttl or self.ttl, token)
+
+    def _store_if_current(self, key: str, local_value: Any, data: Any, ttl: float, token: Tuple[int, Optional[str]]) -> bool:
+        epoch, generation = token
+        with self._lock:
+            if self._epoch != epoch:
+                # Invalidated while loading: the value may predate the change
+                metrics.increment("cache_stale_loads_total", cache=self.name)
+                return False
+            self._local[key] = local_value
+        client = self._redis()
+        if client is None or generation is None:
+            return True
+        try:
+            stored = client.eval(
+                _SET_IF_GENERATION, 2, self.redis_prefix + key, self._generation_key(key),
+                generation, max(1, math.ceil(ttl)), json.dumps(data, default=str),
+            )
+        except (RedisError, TypeError) as e:
+            logger.warning(f"Redis SET failed for cache '{self.name}': {e}")
+            return True
+        if not stored:
+            # Another process invalidated the key meanwhile
+            self.invalidate_local(key)
+            metrics.increment("cache_stale_loads_total", cache=self.name)
+            return False
+        return True
+
+    def set_local(self, key: str, value: Any) -> None:
+        """Stores `value` in the in-process tier only (e.g. when another process already wrote Redis)."""
+        with self._lock:
+            self._local[key] = value
+
+    def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        negative_ttl: Optional[float] = None,
+        beta: float = 1.0,
+    ) -> Any:
+        """Returns the cached value for `key`, calling `loader()` on a miss.
+
+        - Single flight: concurrent misses in this process share one `loader()`
+          call, and across processes a short Redis lock lets one of them load
+          while the others wait briefly for its result.
+        - Early refresh: an entry is reloaded slightly before it expires, with a
+          probability growing as expiry nears and with how long the load took
+          (XFetch, `beta` scales it); readers keep the old value meanwhile.
+        - Negative caching: a `None` result is cached for `negative_ttl` seconds
+          (not at all if unset), so lookups of missing ids stop reaching the loader.
+
+        Exceptions from `loader` propagate to every caller waiting on that load.
+        """
+        entry = self._get_entry(key)
+        if entry is not None and not self._should_refresh(entry, beta):
+            if entry["v"] is None:
+                metrics.increment("cache_negative_hits_total", cache=self.name)
+            return entry["v"]
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            if entry is not None:
+                # Someone is already refreshing; the current value is still valid
+                return entry["v"]
+            metrics.increment("cache_coalesced_total", cache=self.name)
+            if not flight.done.wait(LOAD_LOCK_TIMEOUT_SECONDS):
+                return self._load(key, loader, negative_ttl)
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._load_once(key, loader, negative_ttl, entry)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    @staticmethod
+    def _valid_entry(entry: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(entry, dict) or "v" not in entry or not isinstance(entry.get("e"), (int, float)):
+            # Not written by get_or_load (e.g. an older format); treat as a miss
+            return None
+        if entry["e"] <= time.time():
+            return None
+        return entry
+
+    def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._valid_entry(self.get(key))
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.redis_prefix}gen:{key}"
+
+    @staticmethod
+    def _should_refresh(entry: Dict[str, Any], beta: float) -> bool:
+        # -log(U) is exponentially distributed: usually small, occasionally large
+        early_by = entry.get("d", 0.0) * beta * -math.log(1.0 - random.random())
+        return time.time() + early_by >= entry["e"]
+
+    def _load_once(self, key: str, loader: Callable[[], Any], negative_ttl: Optional[float], entry: Optional[Dict[str, Any]]) -> Any:
+        """Loads under the cross-process lock, or reuses what the lock holder stores."""
+        client = self._redis()
+        if client is None:
+            return self._load(key, loader, negative_ttl)
+        try:
+            lock = client.lock(f"{self.redis_prefix}lock:{key}", timeout=LOAD_LOCK_TIMEOUT_SECONDS, blocking=False)
+            acquired = lock.acquire()
+        except RedisError as e:
+            logger.warning(f"Redis lock failed for cache '{self.name}', loading without it: {e}")
+            return self._load(key, loader, negative_ttl)
+
+        if acquired:
+            try:
+                return self._load(key, loader, negative_ttl)
+            finally:
+                try:
+                    lock.release()
+                except RedisError:
+                    # Expired while loading; another process may have loaded as well
+                    pass
+
+        if entry is not None:
+            return entry["v"]
+        metrics.increment("cache_coalesced_total", cache=self.name)
+        deadline = time.monotonic() + LOAD_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(_LOAD_POLL_SECONDS)
+            try:
+                raw = client.get(self.redis_prefix + key)
+            except RedisError:
+                break
+            if raw is not None:
+                try:
+                    entry = self._valid_entry(json.loads(raw))
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    break
+                with self._lock:
+                    self._local[key] = entry
+                return entry["v"]
+        return self._load(key, loader, negative_ttl)
+
+    def _load(self, key: str, loader: Callable[[], Any], negative_ttl: Optional[float]) -> Any:
+        token = self.load_token(key)
+        started = time.monotonic()
+        value = loader()
+        elapsed = time.monotonic() - started
+        metrics.increment("cache_loads_total", cache=self.name, result="miss" if value is None else "hit")
+        if value is None:
+            if not negative_ttl:
+                return None
+            ttl = negative_ttl
+        else:
+            ttl = self.redis_ttl or self.ttl
+        entry = {"v": value, "e": time.time() + ttl, "d": elapsed}
+        self._store_if_current(key, entry, entry, ttl, token)
+        return value
+
+    def invalidate(self, *keys: str) -> None:
+        """Removes `keys` from both tiers.
+
+        Also bumps each key's generation in Redis, so loads already in flight
+        anywhere do not store what they read. Other processes keep their local
+        copy until its TTL expires, which is why the local TTL should stay short.
+        """
+        if not keys:
+            return
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                self._local.pop(key, None)
+        client = self._redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.delete(*(self.redis_prefix + key for key in keys))
+                for key in keys:
+                    pipe.incr(self._generation_key(key))
+                    pipe.expire(self._generation_key(key), GENERATION_TTL_SECONDS)
+                pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Redis DELETE failed for cache '{self.name}': {e}")
+        metrics.increment("cache_invalidations_total", value=len(keys), cache=self.name)
+
+    def invalidate_local(self, *keys: str) -> None:
+        """Removes `keys` from the in-process tier only (e.g. on an invalidation message from another process)."""
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                self._local.pop(key, None)
+
+    def clear_local(self) -> None:
+        """Drops every entry from the in-process tier only."""
+        with self._lock:
+            self._epoch += 1
+            self._local.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._local)
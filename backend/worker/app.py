@@ -3,6 +3,10 @@
 import os
 import logging
 from celery import Celery
+from celery.schedules import crontab
+
+# Selects the DB engine profile for task processes (see database/engine.py)
+os.environ.setdefault("SERVICE_ROLE", "worker")
 from kombu import Queue
 
 logger = logging.getLogger(__name__)
@@ -85,9 +89,30 @@ celery_app.conf.update(
     # --- Result Backend Settings --- #
     result_expires=int(os.getenv('CELERY_RESULT_EXPIRES', '3600')), # Keep results for 1 hour by default
 
-    # --- Beat (Scheduler) Settings --- # (removed; using real-time enqueueing instead)
+    # --- Beat (Scheduler) Settings --- #
+    # Orders are enqueued in real time; beat only runs maintenance jobs
+    beat_schedule={
+        'ensure-partitions-daily': {
+            'task': 'backend.worker.tasks.ensure_partitions_task',
+            'schedule': crontab(hour=3, minute=0),
+        },
+        # No-op until ORDER_ARCHIVE_URI is configured
+        'archive-orders-nightly': {
+            'task': 'backend.worker.tasks.archive_orders_task',
+            'schedule': crontab(hour=4, minute=0),
+        },
+        # A run that outlives the next one is dropped rather than queued behind it
+        'refresh-exchange-rates': {
+            'task': 'backend.worker.tasks.refresh_exchange_rates_task',
+            'schedule': float(os.getenv('RATE_REFRESH_SECONDS', '60')),
+            'options': {'expires': float(os.getenv('RATE_REFRESH_SECONDS', '60'))},
+        },
+    },
 )
 
+# Re-create DB/Redis/S3 connections in each forked pool process
+from backend.worker import lifecycle  # noqa: E402,F401
+
 logger.info("Celery application configured.")
 logger.info(f"Broker URL: {celery_app.conf.broker_url}")
 logger.info(f"Include tasks from: {celery_app.conf.include}")
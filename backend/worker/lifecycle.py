@@ -0,0 +1,101 @@
+"""Process lifecycle hooks for Celery prefork workers.
+
+The DB engines, the Redis clients and the S3 client are module-level objects
+that may already exist in the parent when Celery forks its pool processes.
+Sockets inherited across fork are shared with the parent and its siblings, so
+each child drops them right after fork and opens its own. The child also warms
+the new pools before it starts accepting tasks, so the first task does not pay
+for TCP/TLS handshakes and boto3 client construction.
+"""
+
+import logging
+import os
+
+from celery.signals import task_postrun, task_prerun, worker_process_init, worker_process_shutdown, worker_ready
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Set to false to skip warm-up (e.g. when a dependency is expected to be down at start)
+WORKER_WARMUP_ENABLED = os.getenv("WORKER_WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def reset_after_fork() -> None:
+    """Discards connections inherited from the parent process."""
+    from backend.database.engine import all_sync_engines
+    from backend.utils import redis_client, s3_client
+
+    # close=False: leave the parent's sockets alone, only forget them in this process
+    for sync_engine in all_sync_engines():
+        sync_engine.dispose(close=False)
+    redis_client.reset_clients()
+    s3_client.reset_client()
+
+
+def warm_up() -> None:
+    """Opens one DB connection, pings Redis and builds the S3 client. Failures are only logged."""
+    from backend.database.engine import engine
+    from backend.utils.redis_client import get_redis_client
+    from backend.utils.s3_client import get_s3_client
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.warning(f"Worker warm-up: database not reachable: {e}")
+    if get_redis_client() is None:
+        logger.warning("Worker warm-up: Redis not reachable.")
+    try:
+        get_s3_client()
+    except Exception as e:
+        logger.warning(f"Worker warm-up: S3 client not created: {e}")
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs) -> None:
+    reset_after_fork()
+    if WORKER_WARMUP_ENABLED:
+        warm_up()
+    logger.info(f"Worker process {os.getpid()} initialized.")
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs) -> None:
+    from backend.database.engine import engine
+
+    engine.dispose()
+
+
+@worker_ready.connect
+def _on_worker_ready(**kwargs) -> None:
+    # Partitions must exist before beat's first daily run (e.g. right after a month boundary)
+    from backend.worker.tasks import ensure_partitions_task
+
+    ensure_partitions_task.delay()
+
+
+# SQL accounting per task (database/query_stats.py); keyed by task id
+_task_query_stats = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **kwargs) -> None:
+    from backend.database.query_stats import start_tracking
+
+    _task_query_stats[task_id] = start_tracking(task.name if task else "unknown")
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, **kwargs) -> None:
+    from backend.database.query_stats import report, stop_tracking
+
+    entry = _task_query_stats.pop(task_id, None)
+    if entry is None:
+        return
+    stats, token = entry
+    try:
+        stop_tracking(token)
+    except ValueError:
+        # Token from another context (e.g. non-prefork pools); the stats are still valid
+        pass
+    report(stats, kind="celery")
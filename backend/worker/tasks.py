@@ -8,12 +8,17 @@ from datetime import datetime, timedelta
 try:
     from backend.worker.app import celery_app
     from backend.services import order_processor
-    from backend.database.utils import get_db_session # Needed for config_loader
+    from backend.database.utils import get_db_session
     from backend.utils.exceptions import DatabaseError, CacheError, OrderProcessingError # Add specific retryable errors
-    from backend.utils.config_loader import get_typed_config_value
+    from backend.utils.config_loader import get_setting
     from backend.utils.notifications import report_critical_error
     from backend.database.db import IncomingOrder
     from backend.services.balance_manager import update_balances_for_completed_order
+    from backend.database.engine import engine
+    from backend.database.partitioning import ensure_partitions
+    from backend.database.engine import SessionLocal
+    from backend.services.order_archive import ORDER_ARCHIVE_URI, archive_orders
+    from backend.services.rate_ingestion import ingest_rates
 except ImportError as e:
     raise ImportError(f"Could not import required modules for Celery tasks: {e}")
 
@@ -48,20 +53,11 @@ def process_order_task(self, incoming_order_id: int):
     """
     logger.info(f"[Task ID: {self.request.id}] Received task to process IncomingOrder ID: {incoming_order_id}")
 
-    # --- Get Retry Configuration from DB --- #
-    # This requires a DB session *outside* the main order processing logic's transaction
-    max_retries = 3 # Default
-    retry_delay_base = 60 # Default delay in seconds (e.g., 1 minute)
-    try:
-        with get_db_session() as db_config:
-            max_retries = get_typed_config_value("MAX_ORDER_RETRIES", db_config, int, default=3)
-            # We'll use Celery's countdown for delay, backoff factor is implicit in increasing countdown
-            retry_delay_base = get_typed_config_value("RETRY_DELAY_SECONDS", db_config, int, default=60)
-            logger.debug(f"[Task ID: {self.request.id}] Retry config: max_retries={max_retries}, retry_delay_base={retry_delay_base}s")
-    except Exception as config_err:
-        # Log error but proceed with defaults, maybe report?
-        logger.error(f"[Task ID: {self.request.id}] Failed to load retry config from DB: {config_err}. Using defaults.", exc_info=True)
-        # report_critical_error(config_err, context_message="Failed to load retry config in Celery task")
+    # --- Get Retry Configuration (process-wide snapshot, no DB session) --- #
+    max_retries = get_setting("MAX_ORDER_RETRIES")
+    # We'll use Celery's countdown for delay, backoff factor is implicit in increasing countdown
+    retry_delay_base = get_setting("RETRY_DELAY_SECONDS")
+    logger.debug(f"[Task ID: {self.request.id}] Retry config: max_retries={max_retries}, retry_delay_base={retry_delay_base}s")
 
     try:
         # Call the main order processing logic
@@ -127,6 +123,32 @@ def update_balance_task(self, order_id: int):
         # Retry the task with default retry policy
         raise self.retry(exc=e)
 
+@celery_app.task(name="backend.worker.tasks.ensure_partitions_task")
+def ensure_partitions_task():
+    """Creates upcoming monthly partitions; idempotent, scheduled daily and on worker start."""
+    with engine.begin() as connection:
+        created = ensure_partitions(connection)
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+@celery_app.task(name="backend.worker.tasks.archive_orders_task")
+def archive_orders_task():
+    """Moves old completed/canceled orders to the Parquet archive (bounded batches per run)."""
+    if not ORDER_ARCHIVE_URI:
+        logger.info("ORDER_ARCHIVE_URI is not set; skipping order archival.")
+        return 0
+    with SessionLocal() as db:
+        archived = archive_orders(db)
+    logger.info(f"Archived {archived} orders.")
+    return archived
+
+@celery_app.task(name="backend.worker.tasks.refresh_exchange_rates_task")
+def refresh_exchange_rates_task():
+    """Pulls quotes from RATE_SOURCES, stores them and publishes the new rate book."""
+    book = ingest_rates()
+    return len(book.quotes)
+
 # Task to poll incoming orders and enqueue processing tasks
 # @celery_app.task(name="backend.worker.tasks.poll_new_orders_task")
 # def poll_new_orders_task():